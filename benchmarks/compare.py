@@ -0,0 +1,46 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Usage:
+    python benchmarks/compare.py benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import json
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=1.10,
+                        help='ratio of medians above which a benchmark counts as a regression')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"Baseline:  {baseline['commit'][:12]} ({baseline['timestamp']})")
+    print(f"Candidate: {candidate['commit'][:12]} ({candidate['timestamp']})\n")
+
+    regressions = 0
+    for name, result in candidate['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            print(f"{name:<45} new")
+            continue
+        old = baseline['benchmarks'][name]['median']
+        new = result['median']
+        ratio = new / old if old else float('inf')
+        flag = ''
+        if ratio > args.threshold:
+            flag = '  <-- regression'
+            regressions += 1
+        print(f"{name:<45} {old * 1000:10.3f} ms -> {new * 1000:10.3f} ms  x{ratio:.2f}{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
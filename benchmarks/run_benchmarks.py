@@ -0,0 +1,278 @@
+"""
+Benchmark suite for routing, inference, data generation and training.
+
+Every workload is synthetic with a fixed seed and OpenRouteService calls are stubbed,
+so runs are reproducible offline. Results are written as JSON to benchmarks/results/
+and can be compared across commits with benchmarks/compare.py.
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py                 # quick suite
+    python benchmarks/run_benchmarks.py --full          # include the 600k patient run
+    python benchmarks/run_benchmarks.py -k routing      # only benchmarks matching 'routing'
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'datasets', 'patient'))
+os.chdir(ROOT)
+
+import predict_hospital
+import train_model
+import generate_patient_ml
+from predict_hospital import DistanceCalculator, HospitalPredictor
+from utilities.contraction_hierarchy import ContractionHierarchy, synthetic_city
+
+SEED = 42
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+BENCHMARKS = []
+
+
+def benchmark(name, repeat=5, number=1, full_only=False):
+    """Register a benchmark. The function receives the shared context and runs one operation."""
+    def decorator(func):
+        BENCHMARKS.append({'name': name, 'func': func, 'repeat': repeat, 'number': number, 'full_only': full_only})
+        return func
+    return decorator
+
+
+class StubResponse:
+    """Minimal stand-in for the OpenRouteService directions response."""
+
+    status_code = 200
+    text = ''
+
+    def __init__(self, distance_km):
+        self.distance_km = distance_km
+
+    def json(self):
+        return {'routes': [{'summary': {'distance': self.distance_km * 1000,
+                                        'duration': self.distance_km / 30 * 3600}}]}
+
+
+def stub_ors_post(url, headers=None, json=None, **kwargs):
+    """Answer a directions request with a road distance derived from haversine."""
+    (lon1, lat1), (lon2, lat2) = json['coordinates']
+    distance = DistanceCalculator().haversine_distance([lat1, lon1], [lat2, lon2]) * 1.3
+    return StubResponse(distance)
+
+
+def random_points(rng, count):
+    bbox = HospitalPredictor.MARIKINA_BBOX
+    return np.column_stack([
+        rng.uniform(bbox['lat_min'], bbox['lat_max'], count),
+        rng.uniform(bbox['lon_min'], bbox['lon_max'], count)
+    ])
+
+
+def random_incidents(rng, count):
+    conditions = generate_patient_ml.CONDITIONS
+    incidents = []
+    for lat, lon in random_points(rng, count):
+        severity = rng.choice(HospitalPredictor.VALID_SEVERITIES)
+        incidents.append({'latitude': float(lat), 'longitude': float(lon),
+                          'severity': str(severity), 'condition': str(rng.choice(conditions[severity]))})
+    return incidents
+
+
+def build_context():
+    """Prepare the shared synthetic workload: a trained model and a loaded predictor."""
+    rng = np.random.default_rng(SEED)
+    patients_df, _ = generate_patient_ml.generate_patients(num_patients=6000, seed=SEED)
+    X, y, pipeline = train_model.encode_features(patients_df.dropna(subset=['hospital_id']))
+
+    predictor = HospitalPredictor()
+    predictor.model = train_model.train(X, y)
+    predictor.feature_pipeline = pipeline
+    predictor.hospitals = generate_patient_ml.REFERENCE.hospital_frame()
+    predictor.distance_calculator = DistanceCalculator()
+    predictor.ems_bases = generate_patient_ml.EMS_BASES
+
+    incident = random_incidents(rng, 1)[0]
+    location = [incident['latitude'], incident['longitude']]
+    hospital_info = []
+    for _, hospital in predictor.hospitals.iterrows():
+        distance, travel_time, is_road = predictor.distance_calculator.get_route_info(location, hospital['location'])
+        hospital_info.append((hospital['ID'], distance, travel_time, not is_road))
+
+    return {
+        'rng': rng,
+        'X': X,
+        'y': y,
+        'predictor': predictor,
+        'points': random_points(rng, 1000),
+        'incident': incident,
+        'closest_ems_base': predictor.get_closest_ems_base(location),
+        'hospital_info': hospital_info,
+        'batch': random_incidents(rng, 1000),
+        'ors_calculator': DistanceCalculator(api_key='benchmark-stub')
+    }
+
+
+@benchmark('routing.haversine_distance', number=1000)
+def bench_haversine(ctx):
+    points = ctx['points']
+    calculator = ctx['predictor'].distance_calculator
+    for i in range(len(points) - 1):
+        calculator.haversine_distance(points[i], points[i + 1])
+
+
+@benchmark('routing.haversine_matrix_1000x16', number=10)
+def bench_haversine_matrix(ctx):
+    ctx['predictor'].distance_calculator.haversine_matrix(ctx['points'], ctx['points'][:16])
+
+
+@benchmark('routing.get_route_info_stubbed_ors', number=100)
+def bench_route_info(ctx):
+    points = ctx['points']
+    calculator = ctx['ors_calculator']
+    for i in range(100):
+        calculator.get_route_info(points[i], points[i + 1])
+
+
+def city_hierarchy(ctx):
+    """Contraction hierarchy of a 10k node synthetic city, built on first use."""
+    if 'city_ch' not in ctx:
+        ctx['city_ch'] = ContractionHierarchy.build(synthetic_city(10000, seed=SEED))
+        rng = np.random.default_rng(SEED)
+        ctx['city_patients'] = ctx['city_ch'].coords[rng.integers(10000, size=100)]
+        ctx['city_sites'] = ctx['city_ch'].coords[rng.integers(10000, size=16)]
+    return ctx['city_ch']
+
+
+@benchmark('routing.ch_build_2500', repeat=3)
+def bench_ch_build_small(ctx):
+    ContractionHierarchy.build(synthetic_city(2500, seed=SEED))
+
+
+@benchmark('routing.ch_build_10k', repeat=1, full_only=True)
+def bench_ch_build(ctx):
+    ContractionHierarchy.build(synthetic_city(10000, seed=SEED))
+
+
+def next_city_patient(ctx):
+    ctx['city_query'] = ctx.get('city_query', -1) + 1
+    return ctx['city_patients'][ctx['city_query'] % len(ctx['city_patients'])][None, :]
+
+
+@benchmark('routing.ch_one_to_many_1x16_10k', number=100)
+def bench_ch_one_to_many(ctx):
+    city_hierarchy(ctx).travel_time_matrix(next_city_patient(ctx), ctx['city_sites'])
+
+
+@benchmark('routing.ch_many_to_one_16x1_10k', number=100)
+def bench_ch_many_to_one(ctx):
+    city_hierarchy(ctx).travel_time_matrix(ctx['city_sites'], next_city_patient(ctx))
+
+
+@benchmark('inference.predict_hospital_single', number=20)
+def bench_predict_single(ctx):
+    incident = ctx['incident']
+    ctx['predictor'].predict_hospital(
+        incident['latitude'], incident['longitude'], incident['severity'], incident['condition'],
+        ctx['closest_ems_base'], ctx['hospital_info']
+    )
+
+
+@benchmark('inference.rank_hospitals_batch_1000', repeat=3)
+def bench_predict_batch(ctx):
+    ctx['predictor'].rank_hospitals_batch(ctx['batch'])
+
+
+@benchmark('generation.generate_patients_6k', repeat=3)
+def bench_generate_small(ctx):
+    generate_patient_ml.generate_patients(num_patients=6000, seed=SEED)
+
+
+@benchmark('generation.generate_patients_600k', repeat=1, full_only=True)
+def bench_generate_full(ctx):
+    generate_patient_ml.generate_patients(num_patients=600000, seed=SEED)
+
+
+@benchmark('training.random_forest_fit_6k', repeat=3)
+def bench_train(ctx):
+    train_model.train(ctx['X'], ctx['y'])
+
+
+def run_benchmark(entry, ctx):
+    """Time `number` calls per round over `repeat` rounds and summarize seconds per call."""
+    timings = []
+    for _ in range(entry['repeat']):
+        start = time.perf_counter()
+        for _ in range(entry['number']):
+            entry['func'](ctx)
+        timings.append((time.perf_counter() - start) / entry['number'])
+    return {
+        'repeat': entry['repeat'],
+        'number': entry['number'],
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'timings': timings
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the EMS benchmark suite.')
+    parser.add_argument('--full', action='store_true', help='include the 600k patient generation run')
+    parser.add_argument('-k', dest='pattern', default='', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<commit>.json)')
+    args = parser.parse_args()
+
+    # Route every OpenRouteService call to the local stub
+    predict_hospital.requests.post = stub_ors_post
+
+    selected = [entry for entry in BENCHMARKS
+                if args.pattern in entry['name'] and (args.full or not entry['full_only'])]
+
+    print("Preparing synthetic workload...")
+    ctx = build_context()
+
+    results = {}
+    for entry in selected:
+        result = run_benchmark(entry, ctx)
+        results[entry['name']] = result
+        print(f"{entry['name']:<45} median {result['median'] * 1000:10.3f} ms  (min {result['min'] * 1000:.3f} ms)")
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'seed': SEED,
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count()
+        },
+        'benchmarks': results
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit[:12]}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
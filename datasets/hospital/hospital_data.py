@@ -1,3 +1,8 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
 import requests
 import pandas as pd
 from time import sleep
@@ -22,7 +27,18 @@ known_hospitals = [
 # Step 2: Acquire Hospital Locations using Overpass API
 OVERPASS_URL = "https://overpass-api.de/api/interpreter"
 MAX_RETRIES = 3
-MARİKİNA_BBOX = {'lat_min': 14.60, 'lat_max': 14.68, 'lon_min': 121.07, 'lon_max': 121.13}
+MARIKINA_BBOX = {'lat_min': 14.60, 'lat_max': 14.68, 'lon_min': 121.07, 'lon_max': 121.13}
+
+# Fetched Overpass responses are stored as cache/<sha1 of url and query>.json
+CACHE_DIR = './cache'
+SNAPSHOT_DIR = './cache/snapshots'
+
+# Tags marking an OSM element as a hospital; the query also matches road signs
+# (destination=hospital), which are not hospitals themselves
+HOSPITAL_TAGS = {'amenity': 'hospital', 'healthcare': 'hospital'}
+
+# Hospitals closer than this (in degrees, about 100m) are treated as duplicates
+DUPLICATE_DISTANCE = 0.001
 
 # Overpass QL query for active hospitals in Marikina City
 overpass_query = """
@@ -42,76 +58,217 @@ area["name"="Marikina"]["boundary"="administrative"]["admin_level"="6"]->.search
 out center;
 """
 
-hospitals = []
-seen_names = set()
-seen_coords = set()
-for attempt in range(MAX_RETRIES):
-    try:
-        response = requests.get(OVERPASS_URL, params={'data': overpass_query}, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        for element in data['elements']:
-            name = element['tags'].get('name', 'Unnamed').strip()
-            lat = element.get('lat') or element.get('center', {}).get('lat')
-            lon = element.get('lon') or element.get('center', {}).get('lon')
-            if lat and lon:
-                lat, lon = float(lat), float(lon)
-                if (MARİKİNA_BBOX['lat_min'] <= lat <= MARİKİNA_BBOX['lat_max'] and
-                    MARİKİNA_BBOX['lon_min'] <= lon <= MARİKİNA_BBOX['lon_max']):
-                    name_lower = name.lower()
-                    coord_key = f"{lat:.6f},{lon:.6f}"
-                    if name_lower in seen_names or coord_key in seen_coords:
-                        continue
-                    seen_names.add(name_lower)
-                    seen_coords.add(coord_key)
-                    hospitals.append({
-                        'name': name,
-                        'latitude': lat,
-                        'longitude': lon,
-                        'Level': None
-                    })
-        break
-    except requests.RequestException as e:
-        print(f"Attempt {attempt + 1}/{MAX_RETRIES} failed: {e}")
-        if attempt < MAX_RETRIES - 1:
-            sleep(2)
+
+def cache_key(url, query):
+    """Content address of an Overpass request."""
+    return hashlib.sha1((url + query).encode('utf-8')).hexdigest()
+
+
+def fetch_overpass(query, offline=False, refresh=False):
+    """
+    Return the Overpass response for query, using the cache/ directory when possible.
+
+    Args:
+        query: Overpass QL query
+        offline: Only read from the cache, never call the API
+        refresh: Ignore any cached response and fetch again
+
+    Returns:
+        Parsed JSON response, or None if it could not be fetched
+    """
+    path = os.path.join(CACHE_DIR, cache_key(OVERPASS_URL, query) + '.json')
+    if os.path.exists(path) and not refresh:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if offline:
+        print(f"No cached Overpass response at {path}")
+        return None
+
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = requests.get(OVERPASS_URL, params={'data': query}, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            return data
+        except requests.RequestException as e:
+            print(f"Attempt {attempt + 1}/{MAX_RETRIES} failed: {e}")
+            if attempt < MAX_RETRIES - 1:
+                sleep(2)
+            else:
+                print("Max retries reached. Using fallback data.")
+    return None
+
+
+def element_key(element):
+    return f"{element['type']}/{element['id']}"
+
+
+def element_digest(element):
+    return hashlib.sha1(json.dumps(element, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_snapshot(name):
+    path = os.path.join(SNAPSHOT_DIR, name + '.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_snapshot(name, snapshot):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, name + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=1, sort_keys=True)
+
+
+def ingest_elements(elements, name, parse_element):
+    """
+    Parse Overpass elements, reprocessing only those that changed since the last snapshot.
+
+    The snapshot stores a digest and the parsed record of every element, so unchanged
+    elements are reused as-is and the differences can be reported.
+
+    Returns:
+        Tuple of (records in element order, diff dict with added/changed/removed keys)
+    """
+    previous = load_snapshot(name)
+    snapshot = {}
+    records = []
+    diff = {'added': [], 'changed': [], 'removed': [], 'unchanged': 0}
+
+    for element in elements:
+        key = element_key(element)
+        digest = element_digest(element)
+        old = previous.get(key)
+        if old is not None and old['digest'] == digest:
+            record = old['record']
+            diff['unchanged'] += 1
         else:
-            print("Max retries reached. Using fallback data.")
-
-# Step 3: Create DataFrame from OSM data
-hospitals_df = pd.DataFrame(hospitals)
-if hospitals_df.empty:
-    print("No hospitals found via Overpass API. Using known hospital list.")
-    hospitals_df = pd.DataFrame(known_hospitals)
-else:
-    # Merge with known hospitals
-    known_df = pd.DataFrame(known_hospitals)
-    known_df['name_lower'] = known_df['name'].str.lower()
-    hospitals_df['name_lower'] = hospitals_df['name'].str.lower()
-    for _, row in known_df.iterrows():
-        if row['name_lower'] not in hospitals_df['name_lower'].values:
-            # Check proximity to avoid duplicates (<100m)
-            if not any(
-                ((row['latitude'] - h['latitude'])**2 + (row['longitude'] - h['longitude'])**2)**0.5 < 0.001
-                for h in hospitals_df.to_dict('records')
-            ):
-                hospitals_df = pd.concat([hospitals_df, pd.DataFrame([{
-                    'name': row['name'],
-                    'latitude': row['latitude'],
-                    'longitude': row['longitude'],
-                    'Level': None
-                }])], ignore_index=True)
-    hospitals_df = hospitals_df.drop(columns=['name_lower'], errors='ignore')
-
-# Deduplicate DataFrame by name and coordinates
-hospitals_df = hospitals_df.drop_duplicates(subset=['name', 'latitude', 'longitude'], keep='first')
-hospitals_df = hospitals_df.reset_index(drop=True)
-
-# Add ID column
-hospitals_df['ID'] = range(1, len(hospitals_df) + 1)
-hospitals_df = hospitals_df[['ID', 'name', 'latitude', 'longitude', 'Level']]
-
-# Save to CSV
-hospitals_df.to_csv("marikina_hospitals.csv", index=False)
-print("Hospital Locations:")
-print(hospitals_df.to_string(index=False))
\ No newline at end of file
+            record = parse_element(element)
+            diff['changed' if old is not None else 'added'].append(key)
+        snapshot[key] = {'digest': digest, 'record': record}
+        if record is not None:
+            records.append(record)
+
+    diff['removed'] = sorted(set(previous) - set(snapshot))
+    save_snapshot(name, snapshot)
+    return records, diff
+
+
+def parse_hospital(element):
+    """Turn an Overpass element into a hospital record, or None if it is not a hospital in Marikina."""
+    tags = element.get('tags', {})
+    if not any(tags.get(key) == value for key, value in HOSPITAL_TAGS.items()):
+        return None
+    name = tags.get('name', 'Unnamed').strip()
+    lat = element.get('lat') or element.get('center', {}).get('lat')
+    lon = element.get('lon') or element.get('center', {}).get('lon')
+    if not (lat and lon):
+        return None
+    lat, lon = float(lat), float(lon)
+    if not (MARIKINA_BBOX['lat_min'] <= lat <= MARIKINA_BBOX['lat_max'] and
+            MARIKINA_BBOX['lon_min'] <= lon <= MARIKINA_BBOX['lon_max']):
+        return None
+    return {'name': name, 'latitude': lat, 'longitude': lon, 'Level': None}
+
+
+class SpatialHash:
+    """Grid of cells sized to the duplicate distance for constant-time proximity checks."""
+
+    def __init__(self, cell_size=DUPLICATE_DISTANCE):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def _cell(self, lat, lon):
+        return int(lat // self.cell_size), int(lon // self.cell_size)
+
+    def add(self, lat, lon):
+        self.cells.setdefault(self._cell(lat, lon), []).append((lat, lon))
+
+    def has_neighbor(self, lat, lon, radius=DUPLICATE_DISTANCE):
+        row, col = self._cell(lat, lon)
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                for other_lat, other_lon in self.cells.get((row + d_row, col + d_col), []):
+                    if ((lat - other_lat) ** 2 + (lon - other_lon) ** 2) ** 0.5 < radius:
+                        return True
+        return False
+
+
+def merge_hospitals(records, fallback):
+    """Drop duplicate OSM hospitals and add known hospitals that OSM is missing."""
+    hospitals = []
+    seen_names = set()
+    seen_coords = set()
+    grid = SpatialHash()
+
+    for record in records:
+        name_lower = record['name'].lower()
+        coord_key = f"{record['latitude']:.6f},{record['longitude']:.6f}"
+        if name_lower in seen_names or coord_key in seen_coords:
+            continue
+        seen_names.add(name_lower)
+        seen_coords.add(coord_key)
+        grid.add(record['latitude'], record['longitude'])
+        hospitals.append(record)
+
+    if not hospitals:
+        print("No hospitals found via Overpass API. Using known hospital list.")
+        return list(fallback)
+
+    for row in fallback:
+        # Check proximity to avoid duplicates (<100m)
+        if row['name'].lower() in seen_names or grid.has_neighbor(row['latitude'], row['longitude']):
+            continue
+        seen_names.add(row['name'].lower())
+        grid.add(row['latitude'], row['longitude'])
+        hospitals.append(dict(row))
+    return hospitals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the Marikina hospital list from OpenStreetMap.')
+    parser.add_argument('--offline', action='store_true', help='only use cached Overpass responses')
+    parser.add_argument('--refresh', action='store_true', help='fetch a new Overpass response even if cached')
+    parser.add_argument('--response', help='ingest this cached Overpass JSON file instead of the hospital query')
+    args = parser.parse_args()
+
+    if args.response:
+        with open(args.response, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        snapshot_name = os.path.splitext(os.path.basename(args.response))[0]
+    else:
+        data = fetch_overpass(overpass_query, offline=args.offline, refresh=args.refresh)
+        snapshot_name = 'hospitals'
+
+    # Without a response, keep the snapshot as is so the next run still diffs against it
+    if data is None:
+        print("No Overpass response available; hospital list not updated.")
+        sys.exit(1)
+
+    records, diff = ingest_elements(data.get('elements', []), snapshot_name, parse_hospital)
+    print(f"Overpass elements: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+          f"{len(diff['removed'])} removed, {diff['unchanged']} unchanged")
+
+    # Step 3: Create DataFrame from OSM data merged with known hospitals
+    hospitals_df = pd.DataFrame(merge_hospitals(records, known_hospitals))
+
+    # Deduplicate DataFrame by name and coordinates
+    hospitals_df = hospitals_df.drop_duplicates(subset=['name', 'latitude', 'longitude'], keep='first')
+    hospitals_df = hospitals_df.reset_index(drop=True)
+
+    # Add ID column
+    hospitals_df['ID'] = range(1, len(hospitals_df) + 1)
+    hospitals_df = hospitals_df[['ID', 'name', 'latitude', 'longitude', 'Level']]
+
+    # Save to CSV
+    hospitals_df.to_csv("marikina_hospitals.csv", index=False)
+    print("Hospital Locations:")
+    print(hospitals_df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,17 @@
+import os
+import sys
 import pandas as pd
 import folium
 from folium.plugins import MarkerCluster
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from utilities.reference_data import load_reference_data
+
 # Load datasets
 patients = pd.read_csv('./datasets/patient/marikina_patients_ml.csv')
-hospitals = pd.read_csv('./datasets/hospital/hospital_dataset (cleaned).csv')
-
-# Use EMS bases directly instead of loading from CSV
-EMS_BASES = [
-    {'base_id': 163, 'base_name': '163 Base - Barangay Hall IVC', 'latitude': 14.6270218, 'longitude': 121.0797032},
-    {'base_id': 166, 'base_name': '166 Base - CHO Office, Barangay Sto.niño', 'latitude': 14.6399746, 'longitude': 121.0965973},
-    {'base_id': 167, 'base_name': '167 Base - Barangay Hall Kalumpang', 'latitude': 14.624179, 'longitude': 121.0933239},
-    {'base_id': 164, 'base_name': '164 Base - DRRMO Building, Barangay Fortune', 'latitude': 14.6628689, 'longitude': 121.1214235},
-    {'base_id': 165, 'base_name': '165 Base - St. Benedict Barangay Nangka', 'latitude': 14.6737274, 'longitude': 121.108795},
-    {'base_id': 169, 'base_name': '169 Base - Pugad Lawin, Barangay Fortune', 'latitude': 14.6584306, 'longitude': 121.1312048}
-]
+reference = load_reference_data()
+hospitals = reference.hospital_frame()
+EMS_BASES = reference.base_records()
 
 # Create map centered on Marikina City
 marikina_center = [14.64, 121.10]  
@@ -36,7 +33,7 @@ for _, row in patients.iterrows():
 # Add hospital locations (red markers)
 for _, row in hospitals.iterrows():
     folium.Marker(
-        location=[row['Latitude'], row['Longtitude']],
+        location=row['location'],
         popup=f"Hospital {row['ID']}: {row['Name']} (Level {row['Level']})",
         icon=folium.Icon(color='red', icon='hospital', prefix='fa')
     ).add_to(m)
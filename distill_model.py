@@ -0,0 +1,172 @@
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datasets', 'patient'))
+import generate_patient_ml
+from train_model import feature_sources
+from utilities.feature_pipeline import FeaturePipeline
+
+FOREST_PATH = './models/hospital_prediction_model.pkl'
+SURROGATE_PATH = './models/hospital_surrogate_model.pkl'
+PIPELINE_PATH = './models/feature_pipeline.json'
+
+# Tree depths tried in order; the shallowest one reaching the target agreement is kept
+DEPTHS = [6, 8, 10, 12, 14, 16, 20, None]
+
+
+def load_pipeline():
+    if os.path.exists(PIPELINE_PATH):
+        return FeaturePipeline.load(PIPELINE_PATH)
+    with open('./models/le_severity.pkl', 'rb') as f:
+        le_severity = pickle.load(f)
+    with open('./models/le_condition.pkl', 'rb') as f:
+        le_condition = pickle.load(f)
+    return FeaturePipeline.from_encoders(le_severity, le_condition)
+
+
+def synthetic_calls(num_samples, seed=7):
+    """Dense random calls across the whole city, all hours and case types, in the dataset's columns."""
+    rng = np.random.default_rng(seed)
+    bbox = generate_patient_ml.MARIKINA_BBOX
+    weights = generate_patient_ml.SEVERITY_WEIGHTS
+    severities = rng.choice(list(weights), num_samples, p=list(weights.values()))
+    conditions = np.empty(num_samples, dtype=object)
+    for severity, choices in generate_patient_ml.CONDITIONS.items():
+        rows = severities == severity
+        conditions[rows] = rng.choice(choices, rows.sum())
+    minutes = rng.integers(0, 24 * 60, num_samples)
+    return pd.DataFrame({
+        'latitude': rng.uniform(bbox['lat_min'], bbox['lat_max'], num_samples),
+        'longitude': rng.uniform(bbox['lon_min'], bbox['lon_max'], num_samples),
+        'severity': severities,
+        'condition': conditions,
+        'Call_Time': np.datetime64(generate_patient_ml.START_TIME.date()) + minutes.astype('timedelta64[m]')
+    })
+
+
+def synthetic_samples(pipeline, num_samples, seed=7, sources=None):
+    """
+    Feature matrix for dense synthetic calls, built by the predictor's serving feature path,
+    so the surrogate is fitted and scored on the inputs it will actually see.
+    """
+    return pipeline.from_calls(synthetic_calls(num_samples, seed), *(sources or feature_sources()))
+
+
+def predictor_for(model):
+    """model.predict taking a feature matrix, naming the columns for models trained on a DataFrame."""
+    if hasattr(model, 'feature_names_in_'):
+        return lambda X: model.predict(pd.DataFrame(X, columns=model.feature_names_in_))
+    return model.predict
+
+
+def teacher_labels(forest, X, chunk_size=50000):
+    """Forest predictions for X, in chunks to bound memory."""
+    predict = predictor_for(forest)
+    return np.concatenate([predict(X[i:i + chunk_size]) for i in range(0, len(X), chunk_size)])
+
+
+def distill(X, y, target_agreement=0.99, depths=DEPTHS, seed=42):
+    """
+    Fit the shallowest decision tree that reproduces the teacher labels on held-out samples.
+
+    When no depth reaches target_agreement, the tree with the best held-out agreement
+    is returned, so the caller must compare the agreement with the target.
+
+    Returns:
+        Tuple of (surrogate, held-out agreement, list of (depth, agreement) tried)
+    """
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=seed)
+    tried = []
+    best, best_agreement = None, -1.0
+    for depth in depths:
+        surrogate = DecisionTreeClassifier(max_depth=depth, random_state=seed)
+        surrogate.fit(X_train, y_train)
+        agreement = float((surrogate.predict(X_test) == y_test).mean())
+        tried.append((depth, agreement))
+        if agreement > best_agreement:
+            best, best_agreement = surrogate, agreement
+        if agreement >= target_agreement:
+            break
+    return best, best_agreement, tried
+
+
+def node_count(model):
+    if hasattr(model, 'estimators_'):
+        return sum(tree.tree_.node_count for tree in model.estimators_)
+    return model.tree_.node_count
+
+
+def time_predictions(model, X, single_calls=200):
+    """Seconds per single-row prediction and per batch prediction of X."""
+    predict = predictor_for(model)
+    start = time.perf_counter()
+    for row in X[:single_calls]:
+        predict(row.reshape(1, -1))
+    single = (time.perf_counter() - start) / single_calls
+    start = time.perf_counter()
+    predict(X)
+    return single, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distill the hospital Random Forest into a single decision tree.')
+    parser.add_argument('--samples', type=int, default=400000, help='synthetic calls labelled by the forest')
+    parser.add_argument('--target', type=float, default=0.99, help='required agreement with the forest')
+    parser.add_argument('--output', default=SURROGATE_PATH)
+    parser.add_argument('--force', action='store_true', help='save the surrogate even if it misses the target')
+    args = parser.parse_args()
+
+    with open(FOREST_PATH, 'rb') as f:
+        forest = pickle.load(f)
+    pipeline = load_pipeline()
+    sources = feature_sources()
+
+    print(f"Generating {args.samples} synthetic calls...")
+    X = synthetic_samples(pipeline, args.samples, sources=sources)
+    y = teacher_labels(forest, X)
+
+    surrogate, agreement, tried = distill(X, y, target_agreement=args.target)
+    for depth, depth_agreement in tried:
+        print(f"max_depth={depth}: {depth_agreement * 100:.2f}% agreement")
+
+    # Agreement on the real dataset's calls, with features built as when serving them
+    history = pd.read_csv('./datasets/patient/marikina_patients_ml.csv')
+    X_history = pipeline.from_calls(history, *sources)
+    history_agreement = float((surrogate.predict(X_history) == teacher_labels(forest, X_history)).mean())
+
+    forest_size = len(pickle.dumps(forest))
+    surrogate_size = len(pickle.dumps(surrogate))
+    forest_single, forest_batch = time_predictions(forest, X_history)
+    surrogate_single, surrogate_batch = time_predictions(surrogate, X_history)
+
+    print("\nDistillation Report:")
+    print(f"Agreement (held-out synthetic, serving features): {agreement * 100:.2f}%")
+    print(f"Agreement (training dataset): {history_agreement * 100:.2f}%")
+    print(f"Tree nodes: {node_count(forest)} -> {node_count(surrogate)}")
+    print(f"Model size: {forest_size / 1024:.0f} KB -> {surrogate_size / 1024:.1f} KB")
+    print(f"Single prediction: {forest_single * 1000:.3f} ms -> {surrogate_single * 1000:.3f} ms")
+    print(f"Batch of {len(X_history)}: {forest_batch * 1000:.1f} ms -> {surrogate_batch * 1000:.1f} ms")
+
+    shortfall = min(agreement, history_agreement)
+    if shortfall < args.target:
+        print(f"\nSurrogate misses the {args.target * 100:.2f}% target "
+              f"({shortfall * 100:.2f}% agreement); try more --samples.")
+        if not args.force:
+            print(f"{args.output} left unchanged (use --force to save it anyway)")
+            sys.exit(1)
+
+    with open(args.output, 'wb') as f:
+        pickle.dump(surrogate, f)
+    print(f"\nSurrogate model saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,40 @@ import time
 import subprocess
 import json
 import os
+import threading
+from datetime import datetime, timedelta
+from utilities.batch_assignment import BatchAssigner
+from utilities.hospital_capacity import HospitalCapacityTracker, to_minutes
+from utilities.metrics import metrics
+from utilities.profiling import profiler
+from utilities.geocoder import OfflineGeocoder
+from utilities.travel_time import SpeedProfile, hour_of, road_distance_estimate
+from utilities.shared_tables import SharedArrays, FlatForestModel, flatten_forest, build_distance_tables, grid_cell
+from utilities import feature_pipeline
+from utilities.feature_pipeline import FeaturePipeline, eligible_hospitals, response_time
+from utilities.prediction_cache import PredictionCache
+from utilities.hedged_routing import Backend, HedgedRouter
+from utilities.road_graph import RoadGraph
+from utilities.contraction_hierarchy import ContractionHierarchy, CH_PATH
+from utilities.polyline_store import PolylineStore, route_key
+from utilities.reference_data import load_reference_data, BASES_PATH
 
 class DistanceCalculator:
     """Handles distance calculations between coordinates using different methods."""
     
-    def __init__(self, api_key=None, average_speed=30):
+    def __init__(self, api_key=None, average_speed=30, speed_profile=None, request_timeout=5,
+                 deadline=None, road_graph=None, route_store=None):
         self.api_key = api_key
-        self.average_speed = average_speed  # km/h
+        self.average_speed = average_speed  # km/h, used when no speed profile is given
+        self.speed_profile = speed_profile
         self.use_road_network = api_key is not None and api_key != "your_api_key_here"
+        self.request_timeout = request_timeout  # seconds per ORS request
+        
+        # With a deadline (seconds), routes are hedged across backends (see route_many)
+        self.deadline = deadline
+        self.road_graph = road_graph
+        self.route_store = route_store
+        self._router = None
     
     def haversine_distance(self, coord1, coord2):
         """Calculate the great-circle distance between two points on Earth in km."""
@@ -27,14 +53,123 @@ class DistanceCalculator:
         c = 2 * atan2(sqrt(a), sqrt(1 - a))
         return R * c
     
-    def get_route_info(self, start_coords, end_coords):
-        """Get road distance and duration between two points using OpenRouteService API."""
+    def haversine_matrix(self, origins, destinations):
+        """Calculate great-circle distances in km between every origin and every destination."""
+        R = 6371
+        origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+        destinations = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+        lat1, lon1 = origins[:, 0][:, None], origins[:, 1][:, None]
+        lat2, lon2 = destinations[:, 0][None, :], destinations[:, 1][None, :]
+        dlat = lat2 - lat1
+        dlon = lon2 - lon1
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        return R * c
+    
+    def estimate_travel_time(self, distance, departure_time=None):
+        """
+        Estimate travel time in minutes for straight-line distance(s).
+        
+        With a speed profile, the speed depends on the hour of departure_time (a datetime,
+        an hour or an array of hours, defaulting to now); otherwise average_speed is used.
+        """
+        if self.speed_profile is not None:
+            return self.speed_profile.travel_time(distance, departure_time)
+        return (distance / self.average_speed) * 60
+    
+    def travel_time_matrix(self, origins, destinations, departure_time=None):
+        """
+        Estimate distance (km) and travel time (minutes) matrices between all points.
+        
+        Uses road distances when the road graph supports matrix queries (a contraction
+        hierarchy), and straight-line distances scaled to an expected road distance (as the
+        dataset generator does) for pairs off the graph.
+        departure_time may be an array with one hour per origin.
+        
+        Returns:
+            Tuple of (distances, times, is_road) matrices; is_road is False for fallbacks
+        """
+        distances = road_distance_estimate(self.haversine_matrix(origins, destinations))
+        if departure_time is not None and np.ndim(hour_of(departure_time)) == 1:
+            departure_time = hour_of(departure_time)[:, None]
+        is_road = np.zeros(distances.shape, dtype=bool)
+        if self.has_matrix_routing():
+            road_km, road_min = self.road_graph.travel_time_matrix(origins, destinations)
+            is_road = ~np.isnan(road_km)
+        if not is_road.any():
+            return distances, self.estimate_travel_time(distances, departure_time), is_road
+        
+        road_km = np.where(is_road, road_km, 0)
+        road_min = self._with_congestion(road_km, np.where(is_road, road_min, 0), departure_time)
+        distances = np.where(is_road, road_km, distances)
+        times = np.where(is_road, road_min, self.estimate_travel_time(distances, departure_time))
+        return distances, times, is_road
+    
+    def get_route_info(self, start_coords, end_coords, departure_time=None):
+        """
+        Get road distance and duration between two points: from the contraction hierarchy
+        when one is loaded, else from the OpenRouteService API.
+        """
+        if self.deadline is not None:
+            route = self.route_many([(start_coords, end_coords)], departure_time)[0]
+            return route['distance'], route['time'], route['is_road_distance']
+        
+        if self.has_matrix_routing():
+            distances, times, is_road = self.travel_time_matrix([start_coords], [end_coords], departure_time)
+            return float(distances[0, 0]), float(times[0, 0]), bool(is_road[0, 0])
+        
         if not self.use_road_network:
             # Calculate using haversine if no API key
-            distance = self.haversine_distance(start_coords, end_coords)
-            time_estimate = (distance / self.average_speed) * 60
-            return distance, time_estimate, False
-            
+            return (*self._haversine_route(start_coords, end_coords, departure_time), False)
+        
+        try:
+            distance_km, duration_min = self._ors_route(start_coords, end_coords, departure_time, self.request_timeout)
+            return distance_km, duration_min, True
+        except Exception as e:
+            print(f"Error getting route information: {e}")
+            # Fall back to haversine
+            return (*self._haversine_route(start_coords, end_coords, departure_time), False)
+    
+    def route_many(self, pairs, departure_time=None):
+        """
+        Route (start, end) pairs within one shared deadline, hedged across backends.
+        
+        Backends, best first: remote (ORS), cache (earlier ORS answers and the route
+        store), graph (offline road graph) and haversine, which always answers.
+        
+        Returns:
+            List of dicts with distance, time, is_road_distance and the winning backend
+        """
+        if self._router is None:
+            self._router = HedgedRouter(self._routing_backends(), deadline=self.deadline)
+        hour = hour_of(departure_time)
+        keys = [(route_key(start, end), hour) for start, end in pairs]
+        return self._router.route_many(pairs, departure_time, keys=keys)
+    
+    def close(self):
+        """Shut down the hedged router's threads, if routing has started."""
+        if self._router is not None:
+            self._router.close()
+            self._router = None
+    
+    def _routing_backends(self):
+        backends = []
+        if self.use_road_network:
+            # A request never outlives the routing budget
+            backends.append(Backend('remote', lambda s, e, t: self._ors_route(s, e, t, self.deadline), remote=True))
+        backends.append(Backend('cache', self._cached_route))
+        if self.road_graph is not None:
+            # A contraction hierarchy answers all pairs of a prediction in one matrix query;
+            # plain Dijkstra on the road graph can be slow, so it stops at the deadline
+            if self.has_matrix_routing():
+                backends.append(Backend('graph', self._graph_route, batch=self._graph_routes))
+            else:
+                backends.append(Backend('graph', self._graph_route, interruptible=True))
+        backends.append(Backend('haversine', self._haversine_route, road_distance=False))
+        return backends
+    
+    def _ors_route(self, start_coords, end_coords, departure_time, timeout):
+        """Road distance (km) and duration (minutes) from ORS; raises on failure."""
         base_url = "https://api.openrouteservice.org/v2/directions/driving-car"
         
         # Format coordinates for ORS API (lon,lat format)
@@ -49,27 +184,74 @@ class DistanceCalculator:
             "coordinates": coordinates
         }
         
+        metrics.increment('ors_requests')
         try:
-            response = requests.post(base_url, headers=headers, json=data)
-            if response.status_code == 200:
-                data = response.json()
-                # Extract distance (in meters) and duration (in seconds)
-                distance_km = data['routes'][0]['summary']['distance'] / 1000
-                duration_min = data['routes'][0]['summary']['duration'] / 60
-                return distance_km, duration_min, True
+            with metrics.timer('ors_request'):
+                response = requests.post(base_url, headers=headers, json=data, timeout=timeout)
+            if response.status_code != 200:
+                raise RuntimeError(f"API error: {response.status_code} {response.text}")
+        except Exception:
+            metrics.increment('ors_errors')
+            raise
+        data = response.json()
+        # Extract distance (in meters) and duration (in seconds)
+        distance_km = data['routes'][0]['summary']['distance'] / 1000
+        duration_min = data['routes'][0]['summary']['duration'] / 60
+        return distance_km, self._with_congestion(distance_km, duration_min, departure_time)
+    
+    def _with_congestion(self, distance_km, free_flow_min, departure_time):
+        """Scale a free-flow road duration to the traffic at departure_time."""
+        if self.speed_profile is None:
+            return free_flow_min
+        road_class = self.speed_profile.road_class_for_road_distance(distance_km)
+        return free_flow_min * self.speed_profile.congestion_factor(departure_time, road_class)
+    
+    def _cached_route(self, start_coords, end_coords, departure_time):
+        remembered = self._router.recall((route_key(start_coords, end_coords), hour_of(departure_time)))
+        if remembered is not None:
+            return remembered
+        if self.route_store is not None:
+            stored = self.route_store.get(start_coords, end_coords)
+            if stored is not None and stored.get('distance') is not None and stored.get('duration') is not None:
+                distance_km = stored['distance'] / 1000
+                return distance_km, self._with_congestion(distance_km, stored['duration'] / 60, departure_time)
+        return None
+    
+    def _graph_route(self, start_coords, end_coords, departure_time, deadline=None):
+        if deadline is None:
+            route = self.road_graph.route(start_coords, end_coords)
+        else:
+            route = self.road_graph.route(start_coords, end_coords, deadline=deadline)
+        if route is None:
+            return None
+        distance_km, free_flow_min = route
+        return distance_km, self._with_congestion(distance_km, free_flow_min, departure_time)
+    
+    def has_matrix_routing(self):
+        """Whether the road graph answers whole distance matrices (a contraction hierarchy)."""
+        return hasattr(self.road_graph, 'travel_time_matrix')
+    
+    def _graph_routes(self, pairs, departure_time):
+        """Graph answers for (start, end) pairs from one matrix query over their distinct ends."""
+        starts = {tuple(start): None for start, _ in pairs}
+        ends = {tuple(end): None for _, end in pairs}
+        start_index = {start: i for i, start in enumerate(starts)}
+        end_index = {end: j for j, end in enumerate(ends)}
+        road_km, road_min = self.road_graph.travel_time_matrix(list(starts), list(ends))
+        answers = []
+        for start, end in pairs:
+            i, j = start_index[tuple(start)], end_index[tuple(end)]
+            if np.isnan(road_km[i, j]):
+                answers.append(None)
             else:
-                print(f"API error: {response.status_code}")
-                print(f"Response details: {response.text}")
-                # Fall back to haversine
-                distance = self.haversine_distance(start_coords, end_coords)
-                time_estimate = (distance / self.average_speed) * 60
-                return distance, time_estimate, False
-        except Exception as e:
-            print(f"Error getting route information: {e}")
-            # Fall back to haversine
-            distance = self.haversine_distance(start_coords, end_coords)
-            time_estimate = (distance / self.average_speed) * 60
-            return distance, time_estimate, False
+                distance_km = float(road_km[i, j])
+                answers.append((distance_km, float(self._with_congestion(distance_km, road_min[i, j], departure_time))))
+        return answers
+    
+    def _haversine_route(self, start_coords, end_coords, departure_time):
+        """Straight-line route scaled to the expected road distance, as in the dataset generator."""
+        distance = float(road_distance_estimate(self.haversine_distance(start_coords, end_coords)))
+        return distance, self.estimate_travel_time(distance, departure_time)
 
 
 class HospitalPredictor:
@@ -91,102 +273,397 @@ class HospitalPredictor:
         'Heart attack', 'Major trauma', 'Stroke'  
     ]
     
-    def __init__(self):
+    # Hospital selection modes
+    SELECTION_MODES = ['model', 'load_aware']
+    
+    # Minimum model probability for a hospital to be considered when re-ranking by load
+    MIN_CANDIDATE_PROBABILITY = 0.1
+    
+    # Serving models: the full Random Forest, or the tree distilled from it by distill_model.py
+    MODEL_PATHS = {
+        'forest': './models/hospital_prediction_model.pkl',
+        'surrogate': './models/hospital_surrogate_model.pkl'
+    }
+    
+    # Data files of the default (Marikina) region; a region can override any of them
+    DATA_PATHS = {
+        'feature_pipeline': './models/feature_pipeline.json',
+        'le_severity': './models/le_severity.pkl',
+        'le_condition': './models/le_condition.pkl',
+        'hospitals': './datasets/hospital/hospital_dataset (cleaned).csv',
+        'ems_bases': BASES_PATH,
+        'road_graph': CH_PATH,
+        'cache_dir': './cache'
+    }
+    
+    # Time-of-day speed profiles; must match generate_patient_ml.USE_SPEED_PROFILES,
+    # which the training data was generated with
+    USE_SPEED_PROFILES = True
+    
+    # Fixed response time components (minutes), shared with training
+    DISPATCH_TIME = feature_pipeline.DISPATCH_TIME
+    ON_SCENE_TIME = feature_pipeline.ON_SCENE_TIME
+    HANDOVER_TIME = feature_pipeline.HANDOVER_TIME
+    
+    def __init__(self, model_variant='forest', bbox=None, paths=None):
+        """
+        Args:
+            model_variant: Serving model, one of MODEL_PATHS
+            bbox: Service area (lat_min, lat_max, lon_min, lon_max); defaults to Marikina
+            paths: Overrides for MODEL_PATHS and DATA_PATHS, e.g. for another region
+        """
+        if model_variant not in self.MODEL_PATHS:
+            raise ValueError(f"Model variant must be one of {', '.join(self.MODEL_PATHS)}")
+        self.bbox = bbox or self.MARIKINA_BBOX
+        self.paths = {**self.MODEL_PATHS, **self.DATA_PATHS, **(paths or {})}
         self.model = None
-        self.le_severity = None
-        self.le_condition = None
+        self.feature_pipeline = None
         self.hospitals = None
         self.ems_bases = None
         self.distance_calculator = None
+        self.capacity_tracker = None
+        self.geocoder = None
+        self.shared_tables = None
+        self.model_path = self.paths[model_variant]
+        self.model_mtime = None
+        self._model_watcher = None
+        self.prediction_cache = PredictionCache()
+        
+    @metrics.timed('load_models_and_data')
+    def load_models_and_data(self, api_key=None, shared_tables=None, routing_deadline=None):
+        """
+        Load all required models and data.
         
-    def load_models_and_data(self, api_key=None):
-        """Load all required models and data."""
+        If shared_tables (a spec from export_shared_tables, or the path of its .json file) is
+        given, the model and distance tables are attached zero-copy instead of loaded.
+        With routing_deadline (seconds), each prediction waits at most that long on routing
+        and takes the best answer from ORS, cached routes, the offline road graph or haversine.
+        """
         try:
             # Load model and encoders
-            with open('./models/hospital_prediction_model.pkl', 'rb') as f:
-                self.model = pickle.load(f)
-
-            with open('./models/le_severity.pkl', 'rb') as f:
-                self.le_severity = pickle.load(f)
+            if shared_tables is not None:
+                self.shared_tables = SharedArrays.attach(shared_tables)
+                self.model = FlatForestModel(self.shared_tables.arrays)
+            else:
+                self.model_mtime = os.path.getmtime(self.model_path)
+                with open(self.model_path, 'rb') as f:
+                    self.model = pickle.load(f)
 
-            with open('./models/le_condition.pkl', 'rb') as f:
-                self.le_condition = pickle.load(f)
+            # Feature pipeline saved by train_model.py; older models only have the encoders
+            if os.path.exists(self.paths['feature_pipeline']):
+                self.feature_pipeline = FeaturePipeline.load(self.paths['feature_pipeline'])
+            else:
+                with open(self.paths['le_severity'], 'rb') as f:
+                    le_severity = pickle.load(f)
+                with open(self.paths['le_condition'], 'rb') as f:
+                    le_condition = pickle.load(f)
+                self.feature_pipeline = FeaturePipeline.from_encoders(le_severity, le_condition)
 
             # Load hospital dataset for distance calculations
-            self.hospitals = pd.read_csv('./datasets/hospital/hospital_dataset (cleaned).csv')
-            self.hospitals['location'] = self.hospitals[['Latitude', 'Longtitude']].values.tolist()
+            reference = self.load_hospitals()
+            
+            # Build the offline landmark index from cached OpenStreetMap data, hospitals and EMS bases
+            self.geocoder = OfflineGeocoder.from_cache(self.paths['cache_dir'], reference)
             
             # Initialize distance calculator
-            self.distance_calculator = DistanceCalculator(api_key=api_key)
+            # Road graph: a prebuilt contraction hierarchy, else the cached roads for deadline routing
+            road_graph = None
+            if self.paths['road_graph'] and os.path.exists(self.paths['road_graph']):
+                road_graph = ContractionHierarchy.load(self.paths['road_graph'])
+            elif routing_deadline is not None:
+                road_graph = RoadGraph.from_cache(self.paths['cache_dir'])
+            self.distance_calculator = DistanceCalculator(
+                api_key=api_key, speed_profile=SpeedProfile.default() if self.USE_SPEED_PROFILES else None,
+                deadline=routing_deadline,
+                road_graph=road_graph, route_store=PolylineStore() if routing_deadline is not None else None
+            )
             
-            # Define EMS bases
-            self.ems_bases = [
-                {'base_id': 163, 'base_name': '163 Base - Barangay Hall IVC', 'latitude': 14.6270218, 'longitude': 121.0797032},
-                {'base_id': 166, 'base_name': '166 Base - CHO Office, Barangay Sto.niño', 'latitude': 14.6399746, 'longitude': 121.0965973},
-                {'base_id': 167, 'base_name': '167 Base - Barangay Hall Kalumpang', 'latitude': 14.624179, 'longitude': 121.0933239},
-                {'base_id': 164, 'base_name': '164 Base - DRRMO Building, Barangay Fortune', 'latitude': 14.6628689, 'longitude': 121.1214235},
-                {'base_id': 165, 'base_name': '165 Base - St. Benedict Barangay Nangka', 'latitude': 14.6737274, 'longitude': 121.108795},
-                {'base_id': 169, 'base_name': '169 Base - Pugad Lawin, Barangay Fortune', 'latitude': 14.6584306, 'longitude': 121.1312048}
-            ]
+            # EMS bases and their fleet, from the compiled reference data
+            self.ems_bases = reference.base_records()
+            self.prediction_cache.invalidate()
             return True
         except Exception as e:
             print(f"Error loading models and data: {e}")
             return False
     
-    def get_closest_ems_base(self, patient_location):
-        """Find the closest EMS base to the patient."""
+    def load_hospitals(self, path=None):
+        """(Re)load the hospital table and the ER capacity tracker built from it; returns the reference data."""
+        reference = load_reference_data(self.paths['ems_bases'], path or self.paths['hospitals'])
+        self.hospitals = reference.hospital_frame()
+        
+        # Track ER occupancy for load-aware hospital selection
+        self.capacity_tracker = HospitalCapacityTracker.from_hospitals(self.hospitals)
+        self.prediction_cache.invalidate()
+        return reference
+    
+    @metrics.timed('get_closest_ems_base')
+    def get_closest_ems_base(self, patient_location, departure_time=None):
+        """Find the closest EMS base to the patient, for a unit leaving at departure_time (default now)."""
         if not self.ems_bases:
             raise ValueError("EMS bases not loaded")
+        
+        if self._use_shared_tables():
+            return self._closest_ems_base_from_tables(patient_location, departure_time)
             
         ems_base_distances = []
         print("\nFinding closest EMS base...")
         
-        for base in self.ems_bases:
-            base_coords = [base['latitude'], base['longitude']]
-            
-            distance, travel_time, is_road_network = self.distance_calculator.get_route_info(
-                base_coords, patient_location
-            )
-            
+        routes = self._routes([[base['latitude'], base['longitude']] for base in self.ems_bases],
+                              patient_location, towards_patient=True, departure_time=departure_time)
+        for base, route in zip(self.ems_bases, routes):
             ems_base_distances.append({
                 'base_id': base['base_id'],
                 'base_name': base['base_name'],
-                'coords': base_coords,
-                'distance': distance,
-                'time': travel_time,
-                'is_road_distance': is_road_network
+                'coords': [base['latitude'], base['longitude']],
+                'distance': route['distance'],
+                'time': route['time'],
+                'is_road_distance': route['is_road_distance'],
+                'routing_backend': route['backend']
             })
         
         # Select the closest EMS base
         closest_ems_base = min(ems_base_distances, key=lambda x: x['time'])
         return closest_ems_base
     
-    def get_hospital_distances(self, patient_location):
-        """Calculate distances from patient to all hospitals."""
+    def assign_ems_batch(self, incidents, units=None):
+        """
+        Assign a window of pending incidents to available EMS units in a single pass.
+        
+        Args:
+            incidents: List of dicts with latitude, longitude and severity
+            units: List of base dicts (base_id, base_name, latitude, longitude), one per
+                available unit. Defaults to one unit at each EMS base.
+        
+        Returns:
+            List with one entry per incident: the assigned EMS base in the same format
+            as get_closest_ems_base, or None if the incident has to wait for the next window.
+        """
+        if not self.ems_bases:
+            raise ValueError("EMS bases not loaded")
+        
+        units = units if units is not None else self.ems_bases
+        assigner = BatchAssigner(self.distance_calculator)
+        assignments, _ = assigner.assign(
+            [[incident['latitude'], incident['longitude']] for incident in incidents],
+            [incident['severity'] for incident in incidents],
+            [[unit['latitude'], unit['longitude']] for unit in units]
+        )
+        
+        results = [None] * len(incidents)
+        for assignment in assignments:
+            unit = units[assignment['unit_index']]
+            results[assignment['incident_index']] = {
+                'base_id': unit['base_id'],
+                'base_name': unit['base_name'],
+                'coords': [unit['latitude'], unit['longitude']],
+                'distance': assignment['distance'],
+                'time': assignment['time'],
+                'is_road_distance': assignment['is_road_distance']
+            }
+        return results
+    
+    @metrics.timed('get_hospital_distances')
+    def get_hospital_distances(self, patient_location, departure_time=None):
+        """Calculate distances from patient to all hospitals, leaving at departure_time (default now)."""
         if self.hospitals is None:
             raise ValueError("Hospital data not loaded")
+        
+        if self._use_shared_tables():
+            return self._hospital_distances_from_tables(patient_location, departure_time)
             
-        hospital_info = []
         print("\nCalculating route information...")
         
-        for idx, hospital in self.hospitals.iterrows():
-            hospital_coords = hospital['location']
-            hospital_id = hospital['ID']
-            
-            distance, travel_time, is_road_network = self.distance_calculator.get_route_info(
-                patient_location, hospital_coords
-            )
-            hospital_info.append((hospital_id, distance, travel_time, not is_road_network))
+        routes = self._routes(self.hospitals['location'].tolist(), patient_location, towards_patient=False,
+                              departure_time=departure_time)
+        return [(hospital_id, route['distance'], route['time'], not route['is_road_distance'], route['backend'])
+                for hospital_id, route in zip(self.hospitals['ID'], routes)]
+    
+    def _routes(self, sites, patient_location, towards_patient, departure_time=None):
+        """
+        Route between the patient and each site, as dicts with distance, time,
+        is_road_distance and backend.
+        
+        With a routing deadline all routes share one hedged request budget. Otherwise a
+        contraction hierarchy, when loaded, answers all of them in a single one-to-many
+        query (sites off the road graph fall back to the straight line); without one they
+        are requested one by one, pausing between ORS calls to avoid rate limiting.
+        """
+        pairs = [(site, patient_location) if towards_patient else (patient_location, site) for site in sites]
+        if self.distance_calculator.deadline is not None:
+            return self.distance_calculator.route_many(pairs, departure_time)
+        if self.distance_calculator.has_matrix_routing():
+            origins, destinations = (sites, [patient_location]) if towards_patient else ([patient_location], sites)
+            distances, times, is_road = self.distance_calculator.travel_time_matrix(origins, destinations, departure_time)
+            if towards_patient:
+                distances, times, is_road = distances.T, times.T, is_road.T
+            return [{
+                'distance': float(distances[0, j]),
+                'time': float(times[0, j]),
+                'is_road_distance': bool(is_road[0, j]),
+                'backend': 'graph' if is_road[0, j] else 'haversine'
+            } for j in range(len(sites))]
+        
+        routes = []
+        for start, end in pairs:
+            distance, travel_time, is_road_network = self.distance_calculator.get_route_info(start, end, departure_time)
+            routes.append({
+                'distance': distance,
+                'time': travel_time,
+                'is_road_distance': is_road_network,
+                'backend': 'remote' if is_road_network else 'haversine'
+            })
             
             # Sleep to avoid rate limiting if many hospitals
-            time.sleep(0.1)
-            
-        return hospital_info
+            if is_road_network and not towards_patient:
+                time.sleep(0.1)
+        return routes
+    
+    def swap_model(self, model):
+        """Replace the serving model; predictions already running keep the old one."""
+        if not hasattr(model, 'predict_proba'):
+            raise ValueError("Model must provide predict_proba")
+        self.model = model
+        self.prediction_cache.invalidate()
+    
+    def reload_model_if_changed(self):
+        """
+        Load the model file again if update_model.py has replaced it. Returns True if swapped.
+        
+        Workers attached to shared tables never reload: their model is the parent's
+        flattened forest, so the parent reloads and exports new tables instead.
+        """
+        if self.shared_tables is not None:
+            return False
+        try:
+            mtime = os.path.getmtime(self.model_path)
+            if mtime == self.model_mtime:
+                return False
+            with open(self.model_path, 'rb') as f:
+                model = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Error reloading model: {e}")
+            return False
+        self.swap_model(model)
+        self.model_mtime = mtime
+        print("Hospital prediction model reloaded.")
+        return True
+    
+    def start_model_watcher(self, interval=30):
+        """Check for an updated model file every interval seconds in a background thread."""
+        if self._model_watcher is not None or self.shared_tables is not None:
+            return
+        stop = threading.Event()
+        
+        def watch():
+            while not stop.wait(interval):
+                self.reload_model_if_changed()
+        
+        thread = threading.Thread(target=watch, name='model-watcher', daemon=True)
+        thread.start()
+        self._model_watcher = (thread, stop)
+    
+    def stop_model_watcher(self):
+        if self._model_watcher is not None:
+            self._model_watcher[1].set()
+            self._model_watcher = None
+    
+    def close(self):
+        """Stop the model watcher and the routing threads; call when done with the predictor."""
+        self.stop_model_watcher()
+        if self.distance_calculator is not None:
+            self.distance_calculator.close()
+    
+    def export_shared_tables(self, path=None):
+        """
+        Place the flattened model and precomputed distance tables in shared memory.
+        
+        Call once in the parent process and keep the returned SharedArrays alive; workers
+        pass its .spec (or the .json file written next to path) to load_models_and_data.
+        """
+        arrays = flatten_forest(self.model)
+        arrays.update(build_distance_tables(
+            self.distance_calculator,
+            self.bbox,
+            [[base['latitude'], base['longitude']] for base in self.ems_bases],
+            self.hospitals['location'].tolist()
+        ))
+        arrays['base_ids'] = np.array([base['base_id'] for base in self.ems_bases])
+        arrays['hospital_ids'] = self.hospitals['ID'].to_numpy()
+        return SharedArrays.create(arrays, path=path)
     
-    def predict_hospital(self, latitude, longitude, severity, condition, closest_ems_base, hospital_info):
-        """Predict the most appropriate hospital."""
-        # Find closest hospital for distance calculation
-        closest_hospital = min(hospital_info, key=lambda x: x[1])
+    def _use_shared_tables(self):
+        """Straight-line tables stand in for routing only when no road network is configured."""
+        return (self.shared_tables is not None and 'base_km' in self.shared_tables.arrays
+                and not self.distance_calculator.use_road_network)
+    
+    def _closest_ems_base_from_tables(self, patient_location, departure_time=None):
+        arrays = self.shared_tables.arrays
+        distances = road_distance_estimate(arrays['base_km'][grid_cell(arrays, *patient_location)])
+        index = int(distances.argmin())
+        base = next(b for b in self.ems_bases if b['base_id'] == arrays['base_ids'][index])
+        return {
+            'base_id': base['base_id'],
+            'base_name': base['base_name'],
+            'coords': [base['latitude'], base['longitude']],
+            'distance': float(distances[index]),
+            'time': float(self.distance_calculator.estimate_travel_time(distances[index], departure_time)),
+            'is_road_distance': False,
+            'routing_backend': 'shared_tables'
+        }
+    
+    def _hospital_distances_from_tables(self, patient_location, departure_time=None):
+        arrays = self.shared_tables.arrays
+        distances = road_distance_estimate(arrays['hospital_km'][grid_cell(arrays, *patient_location)])
+        times = self.distance_calculator.estimate_travel_time(distances, departure_time)
+        return [(hospital_id, float(distances[i]), float(times[i]), True, 'shared_tables')
+                for i, hospital_id in enumerate(arrays['hospital_ids'])]
+    
+    def predict_for_location(self, latitude, longitude, severity, condition, call_time=None):
+        """
+        Route and predict for a raw incident, memoized per snapped location and case type.
+        
+        Hits return the prediction made for an earlier call in the same grid cell and hour
+        (see PredictionCache) without routing or model calls; misses take the normal path.
+        call_time (a datetime) sets the hour the ambulance and the transport leave; it
+        defaults to now.
+        """
+        generation = self.prediction_cache.generation
+        key = self.prediction_cache.key(latitude, longitude, severity, condition, hour_of(call_time))
+        result = self.prediction_cache.get(key)
+        if result is not None:
+            metrics.increment('prediction_cache_hits')
+            return result
+        metrics.increment('prediction_cache_misses')
+        
+        patient_location = [latitude, longitude]
+        call_time = call_time or datetime.now()
+        closest_ems_base = self.get_closest_ems_base(patient_location, call_time)
+        transport_time = call_time + timedelta(
+            minutes=self.DISPATCH_TIME + closest_ems_base['time'] + self.ON_SCENE_TIME)
+        hospital_info = self.get_hospital_distances(patient_location, transport_time)
+        result = self.predict_hospital(latitude, longitude, severity, condition, closest_ems_base, hospital_info,
+                                       call_time=call_time)
+        self.prediction_cache.put(key, result, generation)
+        return result
+    
+    @metrics.timed('predict_hospital')
+    def predict_hospital(self, latitude, longitude, severity, condition, closest_ems_base, hospital_info,
+                         selection_mode='model', call_time=None, k=None):
+        """
+        Predict the most appropriate hospital.
+        
+        With selection_mode='load_aware', the model's candidate hospitals are re-ranked by
+        travel time plus expected ER wait, and the patient is admitted into the capacity
+        tracker. call_time (datetime or minutes) defaults to the current time.
+        With k, the result also holds the top-k 'ranking' (as from rank_hospitals), taken
+        from the same model pass. The chosen hospital always ranks first, so under load_aware
+        a hospital picked for its free ER slot leads the ranking ahead of the model's order.
+        """
+        if selection_mode not in self.SELECTION_MODES:
+            raise ValueError(f"Selection mode must be one of {', '.join(self.SELECTION_MODES)}")
+        
+        # Closest hospital that takes the severity, for the distance feature
+        closest_hospital = self.closest_eligible_hospital(severity, hospital_info)
         distance_to_hospital_km = closest_hospital[1]
 
         # Calculate response time components
@@ -194,29 +671,35 @@ class HospitalPredictor:
         time_to_hospital = closest_hospital[2]
         
         # Fixed time components
-        dispatch_time = 2 
-        on_scene_time = 10  
-        handover_time = 5  
+        dispatch_time = self.DISPATCH_TIME
+        on_scene_time = self.ON_SCENE_TIME
+        handover_time = self.HANDOVER_TIME
 
         # Total response time calculation
-        response_time_min = dispatch_time + time_to_patient + on_scene_time + time_to_hospital + handover_time
+        response_time_min = response_time(time_to_patient, time_to_hospital)
 
-        # Create input DataFrame for model
-        new_patient = pd.DataFrame({
-            'latitude': [latitude],
-            'longitude': [longitude],
-            'severity': [severity],
-            'condition': [condition],
-            'distance_to_hospital_km': [distance_to_hospital_km],
-            'response_time_min': [response_time_min]
-        })
+        # One model snapshot for the whole call, so a concurrent swap_model cannot mix two models
+        model = self.model
 
-        # Preprocess new data
-        new_patient['severity'] = self.le_severity.transform(new_patient['severity'])
-        new_patient['condition'] = self.le_condition.transform(new_patient['condition'])
+        # Encode model input
+        new_patient = self.build_model_input(
+            [latitude], [longitude], [severity], [condition], [distance_to_hospital_km], [response_time_min],
+            model=model
+        )
 
-        # Predict hospital
-        predicted_hospital_id = self.model.predict(new_patient)[0]
+        # Predict hospital; the most probable class is the model's prediction
+        with metrics.timer('model_predict'):
+            probabilities = model.predict_proba(new_patient)[0]
+        predicted_hospital_id = model.classes_[probabilities.argmax()]
+        expected_wait = None
+        
+        if selection_mode == 'load_aware':
+            if call_time is None:
+                call_time = time.time() / 60
+            predicted_hospital_id, expected_wait = self.select_by_load(
+                model, probabilities, predicted_hospital_id, hospital_info, severity, call_time,
+                dispatch_time + time_to_patient + on_scene_time
+            )
         
         # Get hospital info
         hospital_name = self.hospitals[self.hospitals['ID'] == predicted_hospital_id]['Name'].iloc[0]
@@ -241,32 +724,223 @@ class HospitalPredictor:
                 'total_time': response_time_min
             },
             'is_fallback_calculation': predicted_hospital_info[3] if predicted_hospital_info else True,
-            'ems_base': closest_ems_base
+            'routing_backend': predicted_hospital_info[4] if predicted_hospital_info and len(predicted_hospital_info) > 4 else None,
+            'ems_base': closest_ems_base,
+            'expected_wait': expected_wait
         }
+        if k:
+            routes = {info[0]: (info[1], info[2], info[3]) for info in hospital_info}
+            result['ranking'] = self._top_k_hospitals(model, probabilities, routes, time_to_patient, k,
+                                                      first=predicted_hospital_id)
         
         return result
     
+    def hospital_levels(self):
+        """Level of each hospital in table order, or None if the table has no levels."""
+        if 'Level' not in self.hospitals.columns:
+            return None
+        return self.hospitals['Level'].to_numpy()
+    
+    def closest_eligible_hospital(self, severity, hospital_info):
+        """
+        The hospital_info entry closest by distance among the hospitals whose level takes
+        the severity, as FeaturePipeline.from_incidents picks it for the model features.
+        """
+        levels = self.hospital_levels()
+        if levels is None:
+            return min(hospital_info, key=lambda x: x[1])
+        level_of = dict(zip(self.hospitals['ID'], levels))
+        eligible = eligible_hospitals([severity], [level_of.get(info[0], 0) for info in hospital_info])[0]
+        return min((info for info, ok in zip(hospital_info, eligible) if ok), key=lambda x: x[1])
+    
+    def build_model_input(self, latitudes, longitudes, severities, conditions, distances_to_hospital, response_times,
+                          model=None):
+        """Build the encoded float32 model input for one or more patients, for model (default: the serving one)."""
+        if model is None:
+            model = self.model
+        X = self.feature_pipeline.transform(
+            latitudes, longitudes, severities, conditions, distances_to_hospital, response_times
+        )
+        # Models trained on a DataFrame check the column names at predict time
+        if hasattr(model, 'feature_names_in_'):
+            return pd.DataFrame(X, columns=model.feature_names_in_)
+        return X
+    
+    def rank_hospitals(self, latitude, longitude, severity, condition, closest_ems_base, hospital_info, k=3):
+        """
+        Rank the top-k hospitals for a patient by model probability.
+        
+        Distances and times for every candidate come from hospital_info, so falling back to
+        the next hospital needs no further routing calls.
+        
+        Returns:
+            List of ranking dicts (see _top_k_hospitals), best first
+        """
+        closest_hospital = self.closest_eligible_hospital(severity, hospital_info)
+        time_to_patient = closest_ems_base['time']
+        response_time_min = response_time(time_to_patient, closest_hospital[2])
+        
+        model = self.model
+        new_patient = self.build_model_input(
+            [latitude], [longitude], [severity], [condition], [closest_hospital[1]], [response_time_min], model=model
+        )
+        probabilities = model.predict_proba(new_patient)[0]
+        
+        routes = {info[0]: (info[1], info[2], info[3]) for info in hospital_info}
+        return self._top_k_hospitals(model, probabilities, routes, time_to_patient, k)
+    
+    def rank_hospitals_batch(self, incidents, k=3):
+        """
+        Rank the top-k hospitals for many incidents in one vectorized pass.
+        
+        Features come from the shared feature pipeline, using travel time matrices from every
+        incident to every EMS base and hospital, and a single model call for the whole batch.
+        
+        Args:
+            incidents: List of dicts with latitude, longitude, severity and condition, and
+                optionally call_time (a datetime; routes are timed at that hour, else now)
+            k: Number of hospitals to return per incident
+        
+        Returns:
+            List with, for each incident, a dict with the closest 'ems_base' and its 'ranking'
+        """
+        if not incidents:
+            return []
+        
+        base_coords = [[base['latitude'], base['longitude']] for base in self.ems_bases]
+        hospital_ids = self.hospitals['ID'].tolist()
+        
+        model_input, routes = self.feature_pipeline.from_incidents(
+            incidents, self.distance_calculator, base_coords, self.hospitals['location'].tolist(),
+            self.hospital_levels()
+        )
+        model = self.model
+        if hasattr(model, 'feature_names_in_'):
+            model_input = pd.DataFrame(model_input, columns=model.feature_names_in_)
+        base_distances, closest_base = routes['base_km'], routes['closest_base']
+        hospital_distances, hospital_times = routes['hospital_km'], routes['hospital_min']
+        base_road, hospital_road = routes['base_road'], routes['hospital_road']
+        time_to_patient = routes['time_to_patient']
+        
+        with metrics.timer('model_predict_batch'):
+            probabilities = model.predict_proba(model_input)
+        
+        results = []
+        for i in range(len(incidents)):
+            base = self.ems_bases[closest_base[i]]
+            routes = {
+                hospital_id: (hospital_distances[i, j], hospital_times[i, j], not hospital_road[i, j])
+                for j, hospital_id in enumerate(hospital_ids)
+            }
+            results.append({
+                'ems_base': {
+                    'base_id': base['base_id'],
+                    'base_name': base['base_name'],
+                    'coords': [base['latitude'], base['longitude']],
+                    'distance': float(base_distances[i, closest_base[i]]),
+                    'time': float(time_to_patient[i]),
+                    'is_road_distance': bool(base_road[i, closest_base[i]])
+                },
+                'ranking': self._top_k_hospitals(model, probabilities[i], routes, float(time_to_patient[i]), k)
+            })
+        return results
+    
+    def _top_k_hospitals(self, model, probabilities, routes, time_to_patient, k, first=None):
+        """
+        Turn one row of probabilities from model into the top-k ranking entries.
+        
+        first, a hospital ID, is moved to the top ahead of the probability order.
+        """
+        order = np.argsort(probabilities)[::-1]
+        if first is not None and first in model.classes_:
+            first_index = np.flatnonzero(model.classes_ == first)[0]
+            order = np.concatenate([[first_index], order[order != first_index]])
+        order = order[:k]
+        ranking = []
+        for rank, class_index in enumerate(order, start=1):
+            hospital_id = model.classes_[class_index]
+            hospital = self.hospitals[self.hospitals['ID'] == hospital_id].iloc[0]
+            distance, time_to_hospital, is_fallback = routes.get(hospital_id, (None, None, True))
+            eta = None
+            if time_to_hospital is not None:
+                eta = self.DISPATCH_TIME + time_to_patient + self.ON_SCENE_TIME + time_to_hospital
+            ranking.append({
+                'rank': rank,
+                'hospital_id': hospital_id,
+                'hospital_name': hospital['Name'],
+                'hospital_level': hospital['Level'] if 'Level' in self.hospitals.columns else "Unknown",
+                'probability': float(probabilities[class_index]),
+                'distance': None if distance is None else float(distance),
+                'time_to_hospital': None if time_to_hospital is None else float(time_to_hospital),
+                'eta': None if eta is None else float(eta),
+                'is_fallback_calculation': is_fallback
+            })
+        return ranking
+    
+    def select_by_load(self, model, probabilities, predicted_hospital_id, hospital_info, severity, call_time, minutes_before_transport):
+        """
+        Re-rank the model's candidate hospitals by travel time plus expected ER wait.
+        
+        The model's choice is kept while it has a free ER slot. Otherwise every hospital the
+        model considers plausible is scored by arrival delay and the patient is admitted
+        into the best one. probabilities is model's row for this patient, as predict_hospital
+        already computed it.
+        
+        Returns:
+            Tuple of (hospital_id, expected_wait_minutes)
+        """
+        start = to_minutes(call_time)
+        travel_times = {info[0]: info[2] for info in hospital_info}
+        
+        def arrival(hospital_id):
+            return start + minutes_before_transport + travel_times.get(hospital_id, 0)
+        
+        chosen_id = predicted_hospital_id
+        wait = self.capacity_tracker.expected_wait(chosen_id, arrival(chosen_id))
+        
+        if wait > 0:
+            candidates = [
+                hospital_id for hospital_id, probability in zip(model.classes_, probabilities)
+                if probability >= self.MIN_CANDIDATE_PROBABILITY and hospital_id in travel_times
+            ]
+            best_delay = travel_times.get(chosen_id, 0) + wait
+            for hospital_id in candidates:
+                delay = travel_times[hospital_id] + self.capacity_tracker.expected_wait(hospital_id, arrival(hospital_id))
+                if delay < best_delay:
+                    chosen_id, best_delay = hospital_id, delay
+        
+        wait = self.capacity_tracker.admit(chosen_id, arrival(chosen_id), severity)
+        return chosen_id, wait
+    
     def get_user_input(self):
         """Get and validate user input for prediction."""
         print("Enter patient details for hospital prediction:")
 
-        # Get and validate latitude
+        # Get and validate latitude, or a landmark name that gives both coordinates
+        longitude = None
         while True:
+            text = input(f"Latitude ({self.bbox['lat_min']} to {self.bbox['lat_max']}) or landmark name: ")
             try:
-                latitude = float(input(f"Latitude ({self.MARIKINA_BBOX['lat_min']} to {self.MARIKINA_BBOX['lat_max']}): "))
-                if not (self.MARIKINA_BBOX['lat_min'] <= latitude <= self.MARIKINA_BBOX['lat_max']):
-                    print(f"Error: Latitude must be between {self.MARIKINA_BBOX['lat_min']} and {self.MARIKINA_BBOX['lat_max']}.")
+                latitude = float(text)
+                if not (self.bbox['lat_min'] <= latitude <= self.bbox['lat_max']):
+                    print(f"Error: Latitude must be between {self.bbox['lat_min']} and {self.bbox['lat_max']}.")
                     continue
                 break
             except ValueError:
-                print("Error: Latitude must be a number.")
+                place = self.lookup_landmark(text)
+                if place is None:
+                    print("Error: Latitude must be a number or a known landmark.")
+                    continue
+                latitude, longitude = place['latitude'], place['longitude']
+                print(f"Using {place['display_name']} ({latitude:.6f}, {longitude:.6f})")
+                break
 
         # Get and validate longitude
-        while True:
+        while longitude is None:
             try:
-                longitude = float(input(f"Longitude ({self.MARIKINA_BBOX['lon_min']} to {self.MARIKINA_BBOX['lon_max']}): "))
-                if not (self.MARIKINA_BBOX['lon_min'] <= longitude <= self.MARIKINA_BBOX['lon_max']):
-                    print(f"Error: Longitude must be between {self.MARIKINA_BBOX['lon_min']} and {self.MARIKINA_BBOX['lon_max']}.")
+                longitude = float(input(f"Longitude ({self.bbox['lon_min']} to {self.bbox['lon_max']}): "))
+                if not (self.bbox['lon_min'] <= longitude <= self.bbox['lon_max']):
+                    print(f"Error: Longitude must be between {self.bbox['lon_min']} and {self.bbox['lon_max']}.")
                     continue
                 break
             except ValueError:
@@ -290,6 +964,29 @@ class HospitalPredictor:
             
         return latitude, longitude, severity, condition
     
+    def lookup_landmark(self, text):
+        """Find a landmark in the offline geocoder, asking the user to pick if several match."""
+        if self.geocoder is None:
+            return None
+        
+        matches = [
+            place for place in self.geocoder.search(text)
+            if self.bbox['lat_min'] <= place['latitude'] <= self.bbox['lat_max']
+            and self.bbox['lon_min'] <= place['longitude'] <= self.bbox['lon_max']
+        ]
+        if len(matches) <= 1:
+            return matches[0] if matches else None
+        
+        for i, place in enumerate(matches, start=1):
+            print(f"{i}. {place['display_name']}")
+        while True:
+            choice = input(f"Select landmark (1-{len(matches)}, Enter for 1): ").strip()
+            if not choice:
+                return matches[0]
+            if choice.isdigit() and 1 <= int(choice) <= len(matches):
+                return matches[int(choice) - 1]
+            print(f"Please enter a number from 1 to {len(matches)}.")
+    
     def print_results(self, prediction_result):
         """Print prediction results."""
         print(f"\nPredicted hospital ID: {prediction_result['hospital_id']}")
@@ -317,10 +1014,23 @@ class HospitalPredictor:
             
             print(f"EMS base to patient: {time_components['time_to_patient']:.2f} minutes")
             print(f"Patient to hospital: {time_components['time_to_hospital']:.2f} minutes")
+            if self.distance_calculator.deadline is not None:
+                print(f"Routing backends (deadline {self.distance_calculator.deadline * 1000:.0f} ms): "
+                      f"EMS base {prediction_result['ems_base'].get('routing_backend')}, "
+                      f"hospital {prediction_result['routing_backend']}")
         else:
             print("⚠ Using straight-line distance approximations")
             print("  To use real road network, configure an OpenRouteService API key")
     
+    def print_ranking(self, ranking):
+        """Print the ranked hospital alternatives."""
+        print("\nHospital Ranking:")
+        for entry in ranking:
+            eta = f"{entry['eta']:.2f} min to arrival" if entry['eta'] is not None else "no route data"
+            print(f"{entry['rank']}. {entry['hospital_name']} (Level {entry['hospital_level']}) - "
+                  f"{entry['probability']:.0%} confidence, {eta}")
+    
+    @metrics.timed('visualize_route')
     def visualize_route(self, patient_location, prediction_result):
         """Visualize the predicted route."""
         try:
@@ -367,20 +1077,28 @@ def main():
     # API key for OpenRouteService
     ORS_API_KEY = "5b3ce3597851110001cf6248e9e7bf352181406b956089df63e2bb75"
     
-    # Initialize predictor
-    predictor = HospitalPredictor()
+    # Initialize predictor (EMS_MODEL=surrogate serves the distilled model)
+    predictor = HospitalPredictor(model_variant=os.environ.get('EMS_MODEL', 'forest'))
+    
+    # Optional routing budget in seconds per prediction (e.g. EMS_ROUTING_DEADLINE=0.3)
+    routing_deadline = os.environ.get('EMS_ROUTING_DEADLINE')
     
-    # Load models and data
-    if not predictor.load_models_and_data(api_key=ORS_API_KEY):
+    # Load models and data (each stage is profiled with --profile or EMS_PROFILE=1)
+    with profiler.stage('load_models_and_data'):
+        loaded = predictor.load_models_and_data(
+            api_key=ORS_API_KEY, routing_deadline=float(routing_deadline) if routing_deadline else None)
+    if not loaded:
         print("Failed to load required models and data. Exiting.")
         return
     
     # Get user input
     latitude, longitude, severity, condition = predictor.get_user_input()
     patient_location = [latitude, longitude]
+    call_time = datetime.now()
     
     # Find closest EMS base
-    closest_ems_base = predictor.get_closest_ems_base(patient_location)
+    with profiler.stage('get_closest_ems_base'):
+        closest_ems_base = predictor.get_closest_ems_base(patient_location, call_time)
     
     # Display selected EMS base information
     print(f"\nSelected EMS base: {closest_ems_base['base_name']}")
@@ -391,16 +1109,23 @@ def main():
         print("(Using straight-line distance calculation)")
     
     # Get hospital distances
-    hospital_info = predictor.get_hospital_distances(patient_location)
+    with profiler.stage('get_hospital_distances'):
+        transport_time = call_time + timedelta(
+            minutes=predictor.DISPATCH_TIME + closest_ems_base['time'] + predictor.ON_SCENE_TIME)
+        hospital_info = predictor.get_hospital_distances(patient_location, transport_time)
     
-    # Make prediction
-    prediction_result = predictor.predict_hospital(
-        latitude, longitude, severity, condition, closest_ems_base, hospital_info
-    )
+    # Make prediction, with the fallback ranking from the same model pass
+    with profiler.stage('predict_hospital'):
+        prediction_result = predictor.predict_hospital(
+            latitude, longitude, severity, condition, closest_ems_base, hospital_info, call_time=call_time, k=3
+        )
     
     # Print results
     predictor.print_results(prediction_result)
     
+    # Show fallback hospitals in case the recommended one cannot take the patient
+    predictor.print_ranking(prediction_result['ranking'])
+    
     # Ask user if they want to visualize the results
     while True:
         visualize = input("\nDo you want to visualize the route? (y/n): ").lower()
@@ -410,6 +1135,13 @@ def main():
 
     if visualize == 'y':
         predictor.visualize_route(patient_location, prediction_result)
+    
+    # Export stage latencies when metrics are enabled (EMS_METRICS=1)
+    if metrics.enabled:
+        metrics.print_summary()
+        metrics.export(os.environ.get('EMS_METRICS_FILE', './metrics/predict_hospital.prom'))
+    profiler.report('predict_hospital')
+    predictor.close()
 
 
 if __name__ == "__main__":
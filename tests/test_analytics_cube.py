@@ -0,0 +1,77 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utilities.analytics_cube import AnalyticsCube
+
+
+def random_calls(count, seed=0, first_id=0):
+    rng = np.random.default_rng(seed)
+    hospitals = rng.choice([1.0, 2.0, 3.0, np.nan], count)
+    return pd.DataFrame({
+        'patient_id': np.arange(first_id, first_id + count),
+        'Call_Time': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 90 * 24 * 60, count), unit='min'),
+        'ems_base_id': rng.choice([166, 167, 168], count),
+        'hospital_id': hospitals,
+        'severity': rng.choice(['low', 'medium', 'high'], count),
+        'condition': rng.choice(['Fever', 'Fracture', 'Stroke'], count),
+        'response_time_min': rng.gamma(4.0, 6.0, count)
+    })
+
+
+def expected_stats(calls, by):
+    grouped = calls.groupby(by)['response_time_min']
+    expected = grouped.agg(['count', 'mean', 'std']).reset_index()
+    expected['p90'] = grouped.quantile(0.9, interpolation='higher').to_numpy()
+    return expected
+
+
+def test_query_matches_pandas_groupby():
+    calls = random_calls(3000)
+    cube = AnalyticsCube()
+    cube.add(calls.iloc[:1000])
+    cube.add(calls.iloc[1000:])
+
+    result = cube.query(by=['base', 'severity'], where={'hour': list(range(7, 19))}, quantiles=(0.9,))
+
+    daytime = calls[pd.to_datetime(calls['Call_Time']).dt.hour.between(7, 18)].copy()
+    daytime['base'] = daytime['ems_base_id'].astype(str)
+    expected = expected_stats(daytime, ['base', 'severity'])
+    merged = result.merge(expected, on=['base', 'severity'], suffixes=('', '_expected'))
+    assert len(merged) == len(result) == len(expected) == 9
+    np.testing.assert_array_equal(merged['count'], merged['count_expected'])
+    np.testing.assert_allclose(merged['mean'], merged['mean_expected'])
+    np.testing.assert_allclose(merged['std'], merged['std_expected'])
+    # Quantiles come from log buckets 5% wide
+    np.testing.assert_allclose(merged['p90'], merged['p90_expected'], rtol=0.03)
+
+
+def test_missing_hospital_is_its_own_group():
+    calls = random_calls(500, seed=1)
+    cube = AnalyticsCube()
+    cube.add(calls)
+
+    result = cube.query(by=['hospital'])
+
+    counts = calls['hospital_id'].map(lambda value: 'none' if pd.isna(value) else str(int(value))).value_counts()
+    assert dict(zip(result['hospital'], result['count'])) == counts.to_dict()
+    assert cube.query(where={'hospital': 'none'})['count'][0] == counts['none']
+
+
+def test_add_new_skips_calls_already_counted_and_survives_reload(tmp_path):
+    calls = random_calls(400, seed=2)
+    cube = AnalyticsCube()
+    cube.add(calls.iloc[:300])
+    path = str(tmp_path / 'cube.npz')
+    cube.save(path)
+
+    reloaded = AnalyticsCube.load(path)
+    assert reloaded.add_new(calls.iloc[200:]) == 100
+
+    overall = reloaded.query()
+    assert overall['count'][0] == 400
+    assert overall['mean'][0] == pytest.approx(calls['response_time_min'].mean())
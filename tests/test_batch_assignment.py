@@ -0,0 +1,47 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from predict_hospital import DistanceCalculator
+from utilities.batch_assignment import BatchAssigner
+
+
+def random_points(rng, count):
+    return np.column_stack([rng.uniform(14.61, 14.68, count), rng.uniform(121.08, 121.13, count)]).tolist()
+
+
+def brute_force_cost(cost):
+    """Lowest total cost over every way of giving each incident its own unit (or none, if units run out)."""
+    incidents, units = cost.shape
+    if incidents <= units:
+        return min(sum(cost[i, j] for i, j in enumerate(perm)) for perm in itertools.permutations(range(units), incidents))
+    return min(sum(cost[i, j] for j, i in enumerate(perm)) for perm in itertools.permutations(range(incidents), units))
+
+
+@pytest.mark.parametrize('incidents, units', [(4, 4), (3, 5), (6, 3)])
+def test_assignment_is_as_cheap_as_brute_force(incidents, units):
+    rng = np.random.default_rng(incidents * 10 + units)
+    assigner = BatchAssigner(DistanceCalculator())
+    incident_coords, unit_coords = random_points(rng, incidents), random_points(rng, units)
+    severities = rng.choice(['low', 'medium', 'high'], incidents).tolist()
+
+    assignments, unassigned = assigner.assign(incident_coords, severities, unit_coords)
+
+    cost = assigner.build_cost_matrix(incident_coords, severities, unit_coords)[0]
+    total = sum(cost[a['incident_index'], a['unit_index']] for a in assignments)
+    assert total == pytest.approx(brute_force_cost(cost))
+    assert len({a['unit_index'] for a in assignments}) == len(assignments) == min(incidents, units)
+    assert sorted(unassigned + [a['incident_index'] for a in assignments]) == list(range(incidents))
+
+
+def test_high_severity_calls_are_served_first_when_units_run_out():
+    assigner = BatchAssigner(DistanceCalculator())
+    # The low severity call is next to the only unit, the high severity one further away
+    assignments, unassigned = assigner.assign([[14.650, 121.10], [14.670, 121.10]], ['low', 'high'], [[14.651, 121.10]])
+
+    assert [a['incident_index'] for a in assignments] == [1]
+    assert unassigned == [0]
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from predict_hospital import DistanceCalculator, HospitalPredictor
+from utilities.contraction_hierarchy import ContractionHierarchy, synthetic_city
+from utilities.hedged_routing import Backend, HedgedRouter
+
+
+@pytest.fixture(scope='module')
+def city():
+    graph = synthetic_city(900, seed=3)
+    return graph, ContractionHierarchy.build(graph)
+
+
+def test_queries_match_dijkstra(city):
+    graph, ch = city
+    rng = np.random.default_rng(0)
+    sources = rng.integers(len(graph), size=30).tolist()
+    targets = rng.integers(len(graph), size=12).tolist()
+
+    one_to_many = np.array([ch.many_to_many([source], targets)[0][0] for source in sources])
+    many_to_one = np.column_stack([ch.many_to_many(sources, [target])[0][:, 0] for target in targets])
+    for i, source in enumerate(sources):
+        for j, target in enumerate(targets):
+            expected = graph.shortest_path(source, target)
+            expected_minutes = np.inf if expected is None else expected[0]
+            assert one_to_many[i, j] == pytest.approx(expected_minutes)
+            assert many_to_one[i, j] == pytest.approx(expected_minutes)
+            found = ch.query(source, target)
+            assert (found is None) == (expected is None)
+            if found is not None:
+                assert found[0] == pytest.approx(expected[0]) and found[1] == pytest.approx(expected[1])
+
+
+def test_travel_time_matrix_matches_road_graph_routes(city):
+    graph, ch = city
+    rng = np.random.default_rng(1)
+    patients = graph.coords[rng.integers(len(graph), size=5)] + 0.0003
+    sites = graph.coords[rng.integers(len(graph), size=4)]
+
+    for origins, destinations in ((patients, sites), (sites, patients)):
+        km, minutes = ch.travel_time_matrix(origins, destinations)
+        for i, start in enumerate(origins):
+            for j, end in enumerate(destinations):
+                route = graph.route(start, end)
+                if route is None:
+                    assert np.isnan(km[i, j])
+                else:
+                    # Snap legs are measured on slightly different projections
+                    assert km[i, j] == pytest.approx(route[0], abs=1e-3)
+                    assert minutes[i, j] == pytest.approx(route[1], abs=1e-2)
+
+
+class CountingHierarchy:
+    """Wraps a hierarchy and counts its matrix queries."""
+
+    def __init__(self, ch):
+        self.ch = ch
+        self.queries = []
+
+    def travel_time_matrix(self, origins, destinations):
+        self.queries.append((len(origins), len(destinations)))
+        return self.ch.travel_time_matrix(origins, destinations)
+
+    def route(self, start, end):
+        raise AssertionError("per-pair graph route used")
+
+
+def test_prediction_routes_use_one_hierarchy_query(city):
+    graph, ch = city
+    counting = CountingHierarchy(ch)
+    predictor = HospitalPredictor()
+    predictor.distance_calculator = DistanceCalculator(road_graph=counting)
+    sites = graph.coords[:6].tolist()
+    patient = graph.coords[450].tolist()
+
+    routes = predictor._routes(sites, patient, towards_patient=True)
+
+    assert counting.queries == [(6, 1)]
+    assert all(route['backend'] == 'graph' for route in routes)
+
+
+def test_hedged_prediction_routes_use_one_hierarchy_query(city):
+    graph, ch = city
+    counting = CountingHierarchy(ch)
+    calculator = DistanceCalculator(road_graph=counting, deadline=1)
+    patient = graph.coords[450].tolist()
+
+    routes = calculator.route_many([(patient, site) for site in graph.coords[:6].tolist()])
+
+    assert counting.queries == [(1, 6)]
+    assert all(route['backend'] == 'graph' for route in routes)
+
+
+def test_hedged_router_answers_a_batch_backend_in_one_call():
+    calls = []
+
+    def batch(pairs, departure_time):
+        calls.append(len(pairs))
+        return [(1.0, 2.0)] * len(pairs)
+
+    router = HedgedRouter([
+        Backend('graph', lambda s, e, t: pytest.fail("per-pair call"), batch=batch),
+        Backend('haversine', lambda s, e, t: (3.0, 4.0), road_distance=False)
+    ], deadline=1)
+    try:
+        routes = router.route_many([((0, 0), (1, 1))] * 5)
+    finally:
+        router.close()
+
+    assert calls == [5]
+    assert [route['backend'] for route in routes] == ['graph'] * 5
+
+
+def test_road_graph_search_stops_at_the_deadline(city):
+    graph, _ = city
+    far = len(graph) - 1
+
+    assert graph.shortest_path(0, far) is not None
+    assert graph.shortest_path(0, far, deadline=time.perf_counter()) is None
+
+
+def test_hedged_router_passes_its_deadline_to_interruptible_backends():
+    deadlines = []
+
+    def search(start, end, departure_time, deadline):
+        deadlines.append(deadline)
+        return None
+
+    router = HedgedRouter([
+        Backend('graph', search, interruptible=True),
+        Backend('haversine', lambda s, e, t: (3.0, 4.0), road_distance=False)
+    ], deadline=1)
+    try:
+        before = time.perf_counter()
+        routes = router.route_many([((0, 0), (1, 1))] * 2)
+    finally:
+        router.close()
+
+    assert len(deadlines) == 2 and all(before < deadline <= before + 1.01 for deadline in deadlines)
+    assert [route['backend'] for route in routes] == ['haversine'] * 2
+
+
+def test_closing_the_predictor_stops_the_routing_threads(city):
+    graph, _ = city
+    predictor = HospitalPredictor()
+    predictor.distance_calculator = DistanceCalculator(road_graph=graph, deadline=1)
+    predictor.distance_calculator.route_many([(graph.coords[0].tolist(), graph.coords[5].tolist())])
+    router = predictor.distance_calculator._router
+
+    predictor.close()
+
+    assert predictor.distance_calculator._router is None
+    assert router.executor._shutdown
@@ -0,0 +1,84 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from predict_hospital import DistanceCalculator, HospitalPredictor
+from utilities.feature_pipeline import FeaturePipeline
+from utilities.reference_data import load_reference_data
+from utilities.travel_time import SpeedProfile
+
+CONDITIONS = {'low': 'Fever', 'medium': 'Fracture', 'high': 'Stroke'}
+
+
+class RecordingModel:
+    """Stands in for the forest; remembers every model input row."""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+        self.rows = []
+
+    def predict_proba(self, X):
+        self.rows.extend(np.asarray(X))
+        return np.full((len(X), len(self.classes_)), 1 / len(self.classes_))
+
+
+def past_calls(count=40, seed=3):
+    rng = np.random.default_rng(seed)
+    bbox = HospitalPredictor.MARIKINA_BBOX
+    severities = rng.choice(['low', 'medium', 'high'], count)
+    start = datetime(2025, 5, 13, 6, 0)
+    return pd.DataFrame({
+        'latitude': rng.uniform(bbox['lat_min'], bbox['lat_max'], count),
+        'longitude': rng.uniform(bbox['lon_min'], bbox['lon_max'], count),
+        'severity': severities,
+        'condition': [CONDITIONS[severity] for severity in severities],
+        'Call_Time': [(start + timedelta(minutes=int(m))).strftime('%Y-%m-%d %H:%M:%S')
+                      for m in rng.integers(0, 24 * 60, count)]
+    })
+
+
+@pytest.mark.parametrize('speed_profile', [None, SpeedProfile.default()], ids=['average_speed', 'speed_profile'])
+def test_training_and_serving_build_identical_rows(speed_profile):
+    reference = load_reference_data()
+    calls = past_calls()
+    predictor = HospitalPredictor()
+    predictor.feature_pipeline = FeaturePipeline.fit(list(CONDITIONS), list(CONDITIONS.values()))
+    predictor.hospitals = reference.hospital_frame()
+    predictor.ems_bases = reference.base_records()
+    predictor.distance_calculator = DistanceCalculator(speed_profile=speed_profile)
+    predictor.model = RecordingModel(predictor.hospitals['ID'])
+
+    training = predictor.feature_pipeline.from_calls(
+        calls, predictor.distance_calculator, reference.base_coords,
+        predictor.hospitals['location'].tolist(), predictor.hospitals['Level'].to_numpy())
+
+    incidents = [{**call, 'call_time': datetime.strptime(call['Call_Time'], '%Y-%m-%d %H:%M:%S')}
+                 for call in calls.to_dict('records')]
+    for incident in incidents:
+        predictor.predict_for_location(incident['latitude'], incident['longitude'], incident['severity'],
+                                       incident['condition'], call_time=incident['call_time'])
+    single = np.array(predictor.model.rows)
+    predictor.model.rows = []
+    predictor.rank_hospitals_batch(incidents)
+    batch = np.array(predictor.model.rows)
+
+    np.testing.assert_array_equal(single, training)
+    np.testing.assert_array_equal(batch, training)
+
+
+def test_distance_feature_skips_hospitals_below_the_severity_level():
+    pipeline = FeaturePipeline.fit(['low', 'high'], ['Fever', 'Stroke'])
+    calls = pd.DataFrame({'latitude': [14.60, 14.60], 'longitude': [121.10, 121.10], 'severity': ['low', 'high'],
+                          'condition': ['Fever', 'Stroke'], 'Call_Time': ['2025-05-13 08:00:00'] * 2})
+    # The Level 1 hospital is next door, the Level 3 one about 2.2 km north
+    hospitals = [[14.601, 121.10], [14.62, 121.10]]
+
+    X = pipeline.from_calls(calls, DistanceCalculator(), [[14.60, 121.10]], hospitals, [1, 3])
+
+    assert X[0, 4] < 0.2
+    assert X[1, 4] > 2.5
@@ -0,0 +1,49 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utilities.geocoder import CELL_SIZE, OfflineGeocoder
+
+REFERENCE = SimpleNamespace(
+    hospitals=[{'ID': 1, 'Name': 'Amang Rodriguez Memorial Medical Center',
+                'Address': 'Sumulong Hwy, Sto. Niño, Marikina City', 'Latitude': 14.6361025, 'Longitude': 121.0984445,
+                'Level': 3, 'Has ER': 'Yes'}],
+    bases=[{'base_id': 166, 'base_name': '166 Base - CHO Office, Barangay Sto.niño',
+            'latitude': 14.6399746, 'longitude': 121.0965973, 'ambulances': 2, 'rescues': 1}]
+)
+
+
+def geocoder_with(places):
+    geocoder = OfflineGeocoder()
+    for name, latitude, longitude in places:
+        geocoder.add_place(name, latitude, longitude)
+    geocoder.build()
+    return geocoder
+
+
+def test_reference_hospitals_and_bases_are_searchable(tmp_path):
+    geocoder = OfflineGeocoder.from_cache(str(tmp_path), REFERENCE)
+
+    assert [place['kind'] for place in geocoder.search('amang rodriguez')] == ['hospital']
+    assert [place['kind'] for place in geocoder.search('sto nino base')] == ['ems_base']
+
+
+def test_search_tolerates_typos_in_words():
+    geocoder = geocoder_with([('Marikina City Hall', 14.6504, 121.1029), ('Riverbanks Center', 14.6312, 121.0830)])
+
+    assert [place['name'] for place in geocoder.search('Marikna')] == ['Marikina City Hall']
+    assert [place['name'] for place in geocoder.search('marikina hal')] == ['Marikina City Hall']
+    assert geocoder.search('zzqx') == []
+
+
+def test_reverse_scales_the_ring_bound_by_longitude():
+    # At 60 degrees a longitude cell is half as wide as a latitude cell, so the place two
+    # cells east is nearer than the one in the next row north
+    latitude, longitude = 60 + CELL_SIZE / 2, 10 + CELL_SIZE / 2
+    geocoder = geocoder_with([
+        ('North', latitude + 0.8 * CELL_SIZE, longitude),
+        ('East', latitude, longitude + 1.55 * CELL_SIZE),
+    ])
+
+    assert geocoder.reverse(latitude, longitude)['name'] == 'East'
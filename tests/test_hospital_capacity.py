@@ -0,0 +1,79 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from predict_hospital import HospitalPredictor
+from utilities.hospital_capacity import HospitalCapacityTracker
+
+
+def test_waits_follow_the_earliest_free_slot():
+    tracker = HospitalCapacityTracker({1: 2}, service_times={'low': 30, 'high': 60})
+
+    assert tracker.admit(1, 0, 'high') == 0
+    assert tracker.admit(1, 10, 'low') == 0
+    # Both slots busy: the low-severity patient frees one at 40, the other frees at 60
+    assert tracker.expected_wait(1, 20) == 20
+    assert tracker.admit(1, 20, 'low') == 20
+    assert tracker.expected_wait(1, 50) == 10
+    assert tracker.admit(1, 50, 'low') == 10
+    assert tracker.occupancy(1, 65) == 2
+    assert tracker.expected_wait(1, 100) == 0
+
+
+def test_hospital_without_er_never_has_a_slot():
+    tracker = HospitalCapacityTracker.from_hospitals([{'ID': 7, 'Level': 3, 'Has ER': 'No'}])
+
+    assert tracker.expected_wait(7, 0) == float('inf')
+    with pytest.raises(ValueError):
+        tracker.admit(7, 0, 'low')
+
+
+class FixedModel:
+    classes_ = np.array([1, 2])
+
+    def predict_proba(self, X):
+        raise AssertionError("select_by_load must reuse the caller's probabilities")
+
+
+class ProbabilityModel:
+    classes_ = np.array([1, 2])
+
+    def __init__(self, row):
+        self.row = row
+
+    def predict_proba(self, X):
+        return np.array([self.row] * len(X))
+
+
+def test_full_er_sends_the_patient_to_the_next_plausible_hospital():
+    predictor = HospitalPredictor()
+    predictor.capacity_tracker = HospitalCapacityTracker({1: 1, 2: 1}, service_times={'high': 60})
+    predictor.capacity_tracker.admit(1, 0, 'high')
+    hospital_info = [(1, 2.0, 5.0, False), (2, 4.0, 10.0, False)]
+
+    chosen, wait = predictor.select_by_load(FixedModel(), np.array([0.6, 0.4]), 1, hospital_info, 'high', 0, 10)
+
+    assert (chosen, wait) == (2, 0)
+    assert predictor.capacity_tracker.expected_wait(2, 20) > 0
+
+
+def test_load_aware_ranking_leads_with_the_chosen_hospital():
+    predictor = HospitalPredictor()
+    predictor.hospitals = pd.DataFrame({'ID': [1, 2], 'Name': ['Near', 'Far'], 'Level': [3, 3]})
+    predictor.capacity_tracker = HospitalCapacityTracker({1: 1, 2: 1}, service_times={'high': 60})
+    predictor.capacity_tracker.admit(1, 0, 'high')
+    predictor.model = ProbabilityModel([0.6, 0.4])
+    predictor.build_model_input = lambda *args, **kwargs: np.zeros((1, 6))
+    hospital_info = [(1, 2.0, 5.0, False), (2, 4.0, 10.0, False)]
+    base = {'time': 4.0}
+
+    result = predictor.predict_hospital(14.6, 121.1, 'high', 'Stroke', base, hospital_info,
+                                        selection_mode='load_aware', call_time=0, k=2)
+
+    assert result['hospital_id'] == 2
+    assert [entry['hospital_id'] for entry in result['ranking']] == [2, 1]
+    assert [entry['probability'] for entry in result['ranking']] == [0.4, 0.6]
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'datasets', 'hospital'))
+import hospital_data
+
+
+MIXED_PAYLOAD = {'elements': [
+    {'type': 'node', 'id': 1, 'lat': 14.6361, 'lon': 121.0984,
+     'tags': {'amenity': 'hospital', 'name': 'Amang Rodriguez Memorial Medical Center'}},
+    {'type': 'way', 'id': 2, 'center': {'lat': 14.6512, 'lon': 121.1109},
+     'tags': {'healthcare': 'hospital', 'name': 'Garcia General Hospital'}},
+    {'type': 'way', 'id': 3, 'center': {'lat': 14.6400, 'lon': 121.1000},
+     'tags': {'highway': 'primary', 'name': 'FVR Road', 'destination': 'hospital'}},
+    {'type': 'node', 'id': 4, 'lat': 14.6300, 'lon': 121.0900,
+     'tags': {'highway': 'motorway_junction', 'name': 'Diosdado Macapagal Interchange'}},
+    {'type': 'node', 'id': 5, 'lat': 14.6450, 'lon': 121.1050, 'tags': {'amenity': 'restaurant'}},
+    {'type': 'node', 'id': 6, 'lat': 14.6460, 'lon': 121.1060},
+]}
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(hospital_data, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    return tmp_path / 'snapshots'
+
+
+def test_only_hospital_tagged_elements_are_ingested(snapshot_dir):
+    records, diff = hospital_data.ingest_elements(MIXED_PAYLOAD['elements'], 'mixed', hospital_data.parse_hospital)
+
+    assert [record['name'] for record in records] == [
+        'Amang Rodriguez Memorial Medical Center', 'Garcia General Hospital']
+    assert len(diff['added']) == len(MIXED_PAYLOAD['elements'])
+
+
+def test_missing_offline_response_keeps_snapshot(snapshot_dir, tmp_path, monkeypatch):
+    hospital_data.ingest_elements(MIXED_PAYLOAD['elements'], 'hospitals', hospital_data.parse_hospital)
+    before = hospital_data.load_snapshot('hospitals')
+
+    monkeypatch.setattr(hospital_data, 'CACHE_DIR', str(tmp_path / 'empty_cache'))
+    monkeypatch.setattr(sys, 'argv', ['hospital_data.py', '--offline'])
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit) as exit_info:
+        hospital_data.main()
+
+    assert exit_info.value.code != 0
+    assert hospital_data.load_snapshot('hospitals') == before
+    assert not (tmp_path / 'marikina_hospitals.csv').exists()
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utilities.intake_queue import IntakeQueue, QueueFull, ThreadedIntake
+
+
+class SlowPredictor:
+    """Stands in for HospitalPredictor; each batch takes `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def rank_hospitals_batch(self, incidents, k=3):
+        self.batches.append(len(incidents))
+        time.sleep(self.delay)
+        return [{'ranking': [{'hospital_id': i}], 'severity': incident['severity']}
+                for i, incident in enumerate(incidents)]
+
+
+def incident(severity):
+    return {'latitude': 14.64, 'longitude': 121.10, 'severity': severity, 'condition': 'Stroke'}
+
+
+def test_burst_is_batched():
+    async def scenario():
+        queue = IntakeQueue(SlowPredictor(), max_batch=64)
+        results = await asyncio.gather(*(queue.submit(incident('low')) for _ in range(200)))
+        await queue.stop()
+        return queue, results
+
+    queue, results = asyncio.run(scenario())
+    assert len(results) == 200
+    assert queue.stats['batches'] < 200
+
+
+def test_stop_under_load_resolves_every_call():
+    async def scenario():
+        queue = IntakeQueue(SlowPredictor(delay=0.2))
+        tasks = [asyncio.ensure_future(queue.submit(incident('medium'))) for _ in range(300)]
+        await asyncio.sleep(0.02)
+        await queue.stop()
+        done, pending = await asyncio.wait(tasks, timeout=1)
+        return done, pending
+
+    done, pending = asyncio.run(scenario())
+    assert not pending
+    assert all(isinstance(task.exception(), QueueFull) for task in done)
+
+
+def test_threaded_intake_close_unblocks_callers():
+    intake = ThreadedIntake(SlowPredictor(delay=0.2))
+    future = asyncio.run_coroutine_threadsafe(intake.queue.submit(incident('high')), intake.loop)
+    time.sleep(0.05)
+    intake.close()
+    with pytest.raises(QueueFull):
+        future.result(timeout=1)
+
+
+def test_higher_severity_displaces_newest_lower_severity_call():
+    async def scenario():
+        queue = IntakeQueue(SlowPredictor(delay=0.2), max_batch=1, max_pending=2)
+        first = asyncio.ensure_future(queue.submit(incident('low')))
+        await asyncio.sleep(0.05)  # first is now being ranked
+        older = asyncio.ensure_future(queue.submit(incident('low')))
+        newer = asyncio.ensure_future(queue.submit(incident('low')))
+        await asyncio.sleep(0)
+        high = asyncio.ensure_future(queue.submit(incident('high')))
+        await asyncio.wait([first, older, newer, high], timeout=2)
+        await queue.stop()
+        return queue, first, older, newer, high
+
+    queue, first, older, newer, high = asyncio.run(scenario())
+    assert isinstance(newer.exception(), QueueFull)
+    assert older.exception() is None and first.exception() is None
+    assert high.result()['severity'] == 'high'
+    assert queue.stats['shed'] == 1
+
+
+def test_full_queue_rejects_after_timeout():
+    async def scenario():
+        queue = IntakeQueue(SlowPredictor(delay=0.3), max_batch=1, max_pending=1)
+        running = asyncio.ensure_future(queue.submit(incident('high')))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.ensure_future(queue.submit(incident('high')))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull):
+            await queue.submit(incident('high'), timeout=0.05)
+        await asyncio.wait([running, waiting], timeout=2)
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert queue.stats['rejected'] == 1
@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utilities.metrics import Histogram, Metrics
+
+
+def test_disabled_registry_records_nothing():
+    registry = Metrics(enabled=False)
+
+    @registry.timed('stage')
+    def work():
+        return 42
+
+    with registry.timer('block'):
+        registry.increment('calls')
+    registry.observe('stage', 1.0)
+
+    assert work() == 42
+    assert registry.summary() == {'counters': {}, 'stages': {}}
+
+
+def test_counters_and_stage_summaries():
+    registry = Metrics(enabled=True)
+
+    @registry.timed('work')
+    def work():
+        return 'done'
+
+    assert work() == 'done'
+    for value in (0.1, 0.2, 0.3, 0.4):
+        registry.observe('route', value)
+    registry.increment('hits')
+    registry.increment('hits', 2)
+
+    summary = registry.summary()
+    assert summary['counters'] == {'hits': 3}
+    assert summary['stages']['work']['count'] == 1
+    assert summary['stages']['route']['count'] == 4
+    assert summary['stages']['route']['mean'] == 0.25
+    assert summary['stages']['route']['p50'] == 0.3
+    assert summary['stages']['route']['p99'] == 0.4
+
+
+def test_histogram_percentiles_use_the_recent_window():
+    histogram = Histogram(max_samples=3)
+    for value in (100, 1, 2, 3):
+        histogram.observe(value)
+
+    assert histogram.count == 4 and histogram.total == 106
+    assert histogram.percentile(0) == 1 and histogram.percentile(100) == 3
+
+
+def test_export_formats(tmp_path):
+    registry = Metrics(enabled=True)
+    registry.observe('predict_hospital', 0.002)
+    registry.increment('ors_requests')
+
+    registry.export(str(tmp_path / 'out' / 'metrics.prom'))
+    registry.export(str(tmp_path / 'metrics.jsonl'))
+    registry.export(str(tmp_path / 'metrics.jsonl'))
+
+    prometheus = (tmp_path / 'out' / 'metrics.prom').read_text().splitlines()
+    assert 'ems_stage_seconds_count{stage="predict_hospital"} 1' in prometheus
+    assert 'ems_ors_requests_total 1' in prometheus
+    records = [json.loads(line) for line in (tmp_path / 'metrics.jsonl').read_text().splitlines()]
+    assert len(records) == 2 and records[0]['counters'] == {'ors_requests': 1}
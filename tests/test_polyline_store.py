@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utilities.polyline_store import PolylineStore, decode_polyline, encode_polyline, simplify
+
+
+def test_encoding_matches_the_reference_example():
+    points = [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]]
+
+    assert encode_polyline(points) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+    assert decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@') == points
+
+
+def test_round_trip_keeps_points_to_the_precision():
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.uniform(14.6, 14.7, 200), rng.uniform(121.0, 121.2, 200)]).tolist()
+
+    decoded = decode_polyline(encode_polyline(points))
+
+    assert len(decoded) == len(points)
+    np.testing.assert_allclose(decoded, points, atol=0.5e-5 + 1e-12)
+
+
+def test_simplify_drops_points_on_a_straight_line():
+    line = [[14.60 + i * 0.0001, 121.10] for i in range(50)]
+    corner = line + [[14.6049, 121.10 + i * 0.0001] for i in range(1, 30)]
+
+    assert simplify(line) == [line[0], line[-1]]
+    assert simplify(corner) == [corner[0], line[-1], corner[-1]]
+
+
+def test_store_survives_save_and_reload(tmp_path):
+    path = str(tmp_path / 'routes.json')
+    store = PolylineStore(path)
+    points = [[14.60, 121.10], [14.61, 121.11], [14.62, 121.10]]
+    store.put([14.60, 121.10], [14.62, 121.10], points, distance=3200, duration=420)
+    store.save()
+
+    reloaded = PolylineStore(path)
+    route = reloaded.get([14.60, 121.10], [14.62, 121.10])
+
+    assert route['points'] == points
+    assert (route['distance'], route['duration']) == (3200, 420)
+    assert reloaded.get([14.62, 121.10], [14.60, 121.10]) is None
+    assert (reloaded.hits, reloaded.misses) == (1, 1)
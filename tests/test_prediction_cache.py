@@ -0,0 +1,68 @@
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from predict_hospital import HospitalPredictor
+from utilities.prediction_cache import PredictionCache
+
+
+def test_key_snaps_nearby_calls_and_keeps_hours_apart():
+    cache = PredictionCache(cell_size=0.0005)
+
+    assert cache.key(14.65010, 121.10010, 'high', 'Stroke', 8) == cache.key(14.65040, 121.10040, 'high', 'Stroke', 8)
+    assert cache.key(14.65010, 121.10010, 'high', 'Stroke', 8) != cache.key(14.65010, 121.10010, 'high', 'Stroke', 9)
+    assert cache.key(14.65010, 121.10010, 'high', 'Stroke', 8) != cache.key(14.65060, 121.10010, 'high', 'Stroke', 8)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_results_from_an_older_generation_are_not_stored():
+    cache = PredictionCache()
+    generation = cache.generation
+    cache.put('a', 1, generation)
+    cache.invalidate()
+    cache.put('b', 2, generation)
+
+    assert len(cache) == 0
+    assert cache.stale_puts == 1
+    cache.put('b', 2, cache.generation)
+    assert cache.get('b') == 2
+
+
+def test_disabled_cache_stores_nothing():
+    cache = PredictionCache(max_entries=0)
+    cache.put('a', 1)
+
+    assert cache.get('a') is None
+
+
+def test_predictor_reuses_a_prediction_within_the_hour_only():
+    predictor = HospitalPredictor()
+    predictions = []
+    predictor.get_closest_ems_base = lambda location, call_time: {'time': 5.0}
+    predictor.get_hospital_distances = lambda location, transport_time: []
+
+    def predict_hospital(*args, call_time=None, **kwargs):
+        predictions.append(call_time)
+        return {'hospital_id': len(predictions)}
+    predictor.predict_hospital = predict_hospital
+
+    first = predictor.predict_for_location(14.65, 121.10, 'high', 'Stroke', call_time=datetime(2025, 5, 13, 8, 5))
+    same_hour = predictor.predict_for_location(14.65, 121.10, 'high', 'Stroke', call_time=datetime(2025, 5, 13, 8, 50))
+    next_hour = predictor.predict_for_location(14.65, 121.10, 'high', 'Stroke', call_time=datetime(2025, 5, 13, 9, 5))
+    predictor.swap_model(SimpleNamespace(predict_proba=None))
+    after_swap = predictor.predict_for_location(14.65, 121.10, 'high', 'Stroke', call_time=datetime(2025, 5, 13, 8, 5))
+
+    assert [first['hospital_id'], same_hour['hospital_id'], next_hour['hospital_id'], after_swap['hospital_id']] == [1, 1, 2, 3]
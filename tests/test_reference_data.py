@@ -0,0 +1,70 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utilities import reference_data
+from utilities.region_registry import ROOT
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    bases = tmp_path / 'ems_bases.csv'
+    hospitals = tmp_path / 'hospitals.csv'
+    shutil.copy(os.path.join(ROOT, 'datasets', 'ems', 'ems_bases.csv'), bases)
+    shutil.copy(os.path.join(ROOT, 'datasets', 'hospital', 'hospital_dataset (cleaned).csv'), hospitals)
+    monkeypatch.setattr(reference_data, '_loaded', {})
+
+    hashes = []
+    source_hash = reference_data.source_hash
+
+    def counting_hash(*paths):
+        hashes.append(paths)
+        return source_hash(*paths)
+    monkeypatch.setattr(reference_data, 'source_hash', counting_hash)
+
+    def load():
+        return reference_data.load_reference_data(str(bases), str(hospitals), str(tmp_path / 'compiled.pkl'))
+    return load, hospitals, hashes
+
+
+def test_unchanged_sources_are_hashed_once(sources):
+    load, hospitals, hashes = sources
+
+    first = load()
+    assert load() is first and load() is first
+    assert len(hashes) == 1
+
+    # A touch without a change is rehashed once, and the load is kept
+    stat = os.stat(hospitals)
+    os.utime(hospitals, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load() is first
+    assert load() is first
+    assert len(hashes) == 2
+
+
+def test_edited_source_is_recompiled(sources):
+    load, hospitals, hashes = sources
+    first = load()
+
+    text = hospitals.read_text(encoding='utf-8')
+    name = first.hospitals[0]['Name']
+    hospitals.write_text(text.replace(name, name + ' Annex', 1), encoding='utf-8')
+    second = load()
+
+    assert second is not first and second.digest != first.digest
+    assert second.hospitals[0]['Name'] == name + ' Annex'
+    assert len(hashes) == 2
+
+
+def test_new_process_reuses_the_compiled_artifact(sources, monkeypatch):
+    load, _, _ = sources
+    first = load()
+    monkeypatch.setattr(reference_data, '_loaded', {})
+    monkeypatch.setattr(reference_data, 'compile_hospitals', lambda path: pytest.fail("recompiled"))
+
+    second = load()
+
+    assert second is not first and second.hospitals == first.hospitals
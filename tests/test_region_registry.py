@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utilities.region_registry import ROOT, Region, RegionRegistry, point_in_polygon
+
+# An L-shaped region: the square's north-east quarter is cut out
+L_SHAPE = [[0, 0], [0, 2], [1, 2], [1, 1], [2, 1], [2, 0]]
+
+
+@pytest.mark.parametrize('lat, lon, inside', [
+    (0.5, 0.5, True), (0.5, 1.5, True), (1.5, 0.5, True),
+    (1.5, 1.5, False), (2.5, 0.5, False), (-0.1, 1.0, False)
+])
+def test_point_in_concave_polygon(lat, lon, inside):
+    assert point_in_polygon(lat, lon, L_SHAPE) == inside
+    assert Region('l', L_SHAPE).contains(lat, lon) == inside
+
+
+def test_shipped_regions_locate_marikina_calls():
+    registry = RegionRegistry.load(os.path.join(ROOT, 'datasets', 'regions.json'))
+
+    assert registry.locate(14.65, 121.10).name == 'marikina'
+    assert registry.locate(14.55, 121.02) is None
+    # A call outside every region is served by the nearest one
+    assert [region.name for region in registry.candidate_regions(14.55, 121.02)] == ['marikina']
+
+
+def test_calls_near_a_border_also_search_the_neighbour():
+    west = Region('west', [[14.60, 121.00], [14.60, 121.10], [14.70, 121.10], [14.70, 121.00]], neighbors=['east'])
+    east = Region('east', [[14.60, 121.10], [14.60, 121.20], [14.70, 121.20], [14.70, 121.10]], neighbors=['west'])
+    registry = RegionRegistry([west, east], border_distance=1.0)
+
+    assert [region.name for region in registry.candidate_regions(14.65, 121.095)] == ['west', 'east']
+    assert [region.name for region in registry.candidate_regions(14.65, 121.05)] == ['west']
+
+
+def test_unknown_neighbour_is_rejected(tmp_path):
+    path = tmp_path / 'regions.json'
+    path.write_text(json.dumps({'regions': [{'name': 'a', 'polygon': L_SHAPE, 'neighbors': ['b']}]}))
+
+    with pytest.raises(ValueError, match='unknown neighbours: b'):
+        RegionRegistry.load(str(path))
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(ROOT)
+from utilities.shared_tables import SharedArrays
+
+# A worker started on its own, as a serving process would be, that attaches and exits
+WORKER = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+from utilities.shared_tables import SharedArrays
+shared = SharedArrays.attach(json.loads(sys.argv[2]))
+print(float(shared.arrays['values'].sum()))
+"""
+
+
+def test_workers_attach_in_turn_without_unlinking_the_block():
+    values = np.arange(1000, dtype=np.float64)
+    shared = SharedArrays.create({'values': values})
+    try:
+        for _ in range(2):
+            worker = subprocess.run([sys.executable, '-c', WORKER, ROOT, json.dumps(shared.spec)],
+                                    capture_output=True, text=True, timeout=60)
+            assert worker.returncode == 0, worker.stderr
+            assert float(worker.stdout) == values.sum()
+            assert 'leaked' not in worker.stderr
+    finally:
+        shared.close()
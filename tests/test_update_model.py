@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from update_model import OnlineForest, ReplayBuffer
+
+
+def incidents(count, classes, seed):
+    rng = np.random.default_rng(seed)
+    y = rng.choice(classes, count)
+    X = rng.normal(size=(count, 4)) + y[:, None]
+    return X, y
+
+
+def online_forest(trees_per_batch=5, max_trees=10):
+    X, y = incidents(120, [1, 2, 3], seed=0)
+    model = RandomForestClassifier(n_estimators=10, random_state=42).fit(X, y)
+    replay = ReplayBuffer(per_class=20)
+    replay.add(X, y)
+    return OnlineForest(model, replay, trees_per_batch=trees_per_batch, max_trees=max_trees)
+
+
+def test_updates_keep_the_forest_at_max_trees():
+    learner = online_forest()
+    for seed in range(1, 4):
+        learner.partial_fit(*incidents(30, [1, 2, 3], seed))
+
+    assert len(learner.model.estimators_) == 10
+    assert learner.model.n_estimators == 10
+    assert learner.model.predict_proba(incidents(5, [1, 2, 3], seed=9)[0]).shape == (5, 3)
+
+
+def test_unknown_hospital_is_rejected():
+    learner = online_forest()
+    X, y = incidents(30, [1, 2, 4], seed=1)
+
+    with pytest.raises(ValueError, match='not trained on'):
+        learner.partial_fit(X, y)
+    assert len(learner.model.estimators_) == 10
+    assert list(learner.model.classes_) == [1, 2, 3]
+
+
+def test_trees_grown_after_trimming_get_fresh_seeds():
+    learner = online_forest()
+    seeds = []
+    for seed in range(1, 4):
+        learner.partial_fit(*incidents(30, [1, 2, 3], seed))
+        seeds.append({tree.random_state for tree in learner.model.estimators_[-learner.trees_per_batch:]})
+
+    assert seeds[0].isdisjoint(seeds[1]) and seeds[1].isdisjoint(seeds[2])
@@ -6,74 +6,134 @@ from sklearn.metrics import accuracy_score, classification_report, confusion_mat
 import matplotlib.pyplot as plt
 import pickle
 import os
+from predict_hospital import DistanceCalculator, HospitalPredictor
+from utilities.contraction_hierarchy import ContractionHierarchy, CH_PATH
+from utilities.feature_pipeline import FEATURES, FeaturePipeline
+from utilities.profiling import profiler
+from utilities.reference_data import load_reference_data
+from utilities.travel_time import SpeedProfile
 
-# Create models directory if it doesn't exist
-os.makedirs('./models', exist_ok=True)
-os.makedirs('./models/analysis', exist_ok=True)
-
-# Load dataset          
-df = pd.read_csv('./datasets/patient/marikina_patients_ml.csv')
-
-# Select features and target
-X = df[['latitude', 'longitude', 'severity', 'condition', 'distance_to_hospital_km', 'response_time_min']].copy()
-y = df['hospital_id']
-
-# Encode categorical variables
-le_severity = LabelEncoder()
-le_condition = LabelEncoder()
-X['severity'] = le_severity.fit_transform(X['severity'])
-X['condition'] = le_condition.fit_transform(X['condition'])
-
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Train Random Forest model with best parameters from previous runs
-model = RandomForestClassifier(n_estimators=200, max_depth=None, min_samples_split=2, random_state=42)
-model.fit(X_train, y_train)
-
-# Evaluate model
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Model accuracy: {accuracy:.2f}")
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred))
-
-# Feature importance
-feature_importance = pd.DataFrame({
-    'feature': X.columns,
-    'importance': model.feature_importances_
-}).sort_values('importance', ascending=False)
-print("\nFeature Importance:")
-print(feature_importance)
-
-# Cross-validation
-cv_scores = cross_val_score(model, X, y, cv=5, scoring='accuracy')
-print(f"Cross-validation accuracy: {cv_scores.mean():.2f} ± {cv_scores.std():.2f}")
-
-# Save model and encoders
-with open('./models/hospital_prediction_model.pkl', 'wb') as f:
-    pickle.dump(model, f)
-with open('./models/le_severity.pkl', 'wb') as f:
-    pickle.dump(le_severity, f)
-with open('./models/le_condition.pkl', 'wb') as f:
-    pickle.dump(le_condition, f)
-
-# Confusion Matrix
-cm = confusion_matrix(y_test, y_pred)
-plt.figure(figsize=(10, 8))
-disp = ConfusionMatrixDisplay(confusion_matrix=cm)
-disp.plot(xticks_rotation=45)
-plt.title('Hospital Prediction Confusion Matrix')
-plt.tight_layout()
-plt.savefig('./models/analysis/confusion_matrix.png')
-plt.close()
-
-print("Model training complete. Saved as hospital_prediction_model.pkl")
-
-# Calculate model reproduction rate
-df_pred = df.copy()
-df_pred['predicted_hospital_id'] = model.predict(X)
-match_count = (df_pred['hospital_id'] == df_pred['predicted_hospital_id']).sum()
-total_count = len(df_pred)
-match_percentage = (match_count / total_count) * 100
-print(f"\nModel reproduces {match_percentage:.2f}% of the original hospital assignments")
\ No newline at end of file
+
+def feature_sources(reference=None, road_graph_path=CH_PATH):
+    """
+    Distance calculator, base and hospital coordinates and hospital levels, set up as the
+    predictor serves without an ORS key.
+
+    Returns:
+        Tuple of arguments for FeaturePipeline.from_calls after the calls
+    """
+    reference = reference or load_reference_data()
+    road_graph = None
+    if road_graph_path and os.path.exists(road_graph_path):
+        road_graph = ContractionHierarchy.load(road_graph_path)
+    calculator = DistanceCalculator(
+        speed_profile=SpeedProfile.default() if HospitalPredictor.USE_SPEED_PROFILES else None,
+        road_graph=road_graph
+    )
+    hospitals = reference.hospital_frame()
+    return calculator, reference.base_coords, hospitals['location'].tolist(), hospitals['Level'].to_numpy()
+
+
+def encode_features(df, pipeline=None, sources=None):
+    """
+    Build the float32 feature matrix and target with the shared feature pipeline.
+
+    The distance and response time features are recomputed from each call's location,
+    severity and Call_Time by the predictor's own feature path (FeaturePipeline.from_calls),
+    not read from the dataset, whose columns describe the hospital actually chosen.
+
+    Returns:
+        Tuple of (X, y, pipeline); a new pipeline is fitted if none is given
+    """
+    if pipeline is None:
+        pipeline = FeaturePipeline.fit(df['severity'], df['condition'])
+    X = pipeline.from_calls(df, *(sources or feature_sources()))
+    y = df['hospital_id'].to_numpy()
+    return X, y, pipeline
+
+
+def build_model():
+    """Random Forest model with best parameters from previous runs."""
+    return RandomForestClassifier(n_estimators=200, max_depth=None, min_samples_split=2, random_state=42)
+
+
+def train(X_train, y_train):
+    model = build_model()
+    model.fit(X_train, y_train)
+    return model
+
+
+def main():
+    # Create models directory if it doesn't exist
+    os.makedirs('./models', exist_ok=True)
+    os.makedirs('./models/analysis', exist_ok=True)
+
+    # Load dataset (each stage is profiled with --profile or EMS_PROFILE=1)
+    with profiler.stage('load_and_encode'):
+        df = pd.read_csv('./datasets/patient/marikina_patients_ml.csv')
+        X, y, pipeline = encode_features(df)
+
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Train Random Forest model
+    with profiler.stage('train'):
+        model = train(X_train, y_train)
+
+    # Evaluate model
+    with profiler.stage('evaluate'):
+        y_pred = model.predict(X_test)
+        accuracy = accuracy_score(y_test, y_pred)
+        print(f"Model accuracy: {accuracy:.2f}")
+        print("\nClassification Report:")
+        print(classification_report(y_test, y_pred))
+
+        # Feature importance
+        feature_importance = pd.DataFrame({
+            'feature': FEATURES,
+            'importance': model.feature_importances_
+        }).sort_values('importance', ascending=False)
+        print("\nFeature Importance:")
+        print(feature_importance)
+
+    # Cross-validation
+    with profiler.stage('cross_validation'):
+        cv_scores = cross_val_score(model, X, y, cv=5, scoring='accuracy')
+        print(f"Cross-validation accuracy: {cv_scores.mean():.2f} ± {cv_scores.std():.2f}")
+
+    # Save model, feature pipeline and encoders (kept for older predictor versions)
+    with profiler.stage('save_outputs'):
+        with open('./models/hospital_prediction_model.pkl', 'wb') as f:
+            pickle.dump(model, f)
+        pipeline.save('./models/feature_pipeline.json')
+        le_severity = LabelEncoder().fit(pipeline.severity_classes)
+        le_condition = LabelEncoder().fit(pipeline.condition_classes)
+        with open('./models/le_severity.pkl', 'wb') as f:
+            pickle.dump(le_severity, f)
+        with open('./models/le_condition.pkl', 'wb') as f:
+            pickle.dump(le_condition, f)
+
+        # Confusion Matrix
+        cm = confusion_matrix(y_test, y_pred)
+        plt.figure(figsize=(10, 8))
+        disp = ConfusionMatrixDisplay(confusion_matrix=cm)
+        disp.plot(xticks_rotation=45)
+        plt.title('Hospital Prediction Confusion Matrix')
+        plt.tight_layout()
+        plt.savefig('./models/analysis/confusion_matrix.png')
+        plt.close()
+
+    print("Model training complete. Saved as hospital_prediction_model.pkl")
+
+    # Calculate model reproduction rate
+    df_pred = df.copy()
+    df_pred['predicted_hospital_id'] = model.predict(X)
+    match_count = (df_pred['hospital_id'] == df_pred['predicted_hospital_id']).sum()
+    total_count = len(df_pred)
+    match_percentage = (match_count / total_count) * 100
+    print(f"\nModel reproduces {match_percentage:.2f}% of the original hospital assignments")
+    profiler.report('train_model')
+
+
+if __name__ == "__main__":
+    main()
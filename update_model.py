@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from train_model import feature_sources
+from utilities.feature_pipeline import FeaturePipeline
+
+MODEL_PATH = './models/hospital_prediction_model.pkl'
+PIPELINE_PATH = './models/feature_pipeline.json'
+HISTORY_PATH = './datasets/patient/marikina_patients_ml.csv'
+
+# New trees grown per mini-batch, and the most trees kept (oldest are dropped first)
+TREES_PER_BATCH = 20
+MAX_TREES = 300
+
+# Past incidents kept per hospital and mixed into every mini-batch
+REPLAY_PER_CLASS = 200
+
+
+class ReplayBuffer:
+    """Reservoir sample of past incidents per hospital, so every update sees every class."""
+
+    def __init__(self, per_class=REPLAY_PER_CLASS, seed=42):
+        self.per_class = per_class
+        self.rng = np.random.default_rng(seed)
+        self.samples = {}
+        self.seen = {}
+
+    def add(self, X, y):
+        for row, label in zip(X, y):
+            samples = self.samples.setdefault(label, [])
+            self.seen[label] = self.seen.get(label, 0) + 1
+            if len(samples) < self.per_class:
+                samples.append(row)
+            else:
+                slot = self.rng.integers(self.seen[label])
+                if slot < self.per_class:
+                    samples[slot] = row
+
+    def sample(self):
+        X = [row for samples in self.samples.values() for row in samples]
+        y = [label for label, samples in self.samples.items() for _ in samples]
+        return np.array(X), np.array(y)
+
+
+class OnlineForest:
+    """
+    Random Forest updated in mini-batches by growing new trees with warm_start.
+
+    Each update trains TREES_PER_BATCH trees on the new incidents plus a replay sample
+    of older ones, then drops the oldest trees beyond MAX_TREES so the forest tracks
+    recent dispatch behaviour without a full retrain.
+    """
+
+    def __init__(self, model, replay, trees_per_batch=TREES_PER_BATCH, max_trees=MAX_TREES):
+        self.model = model
+        self.replay = replay
+        self.trees_per_batch = trees_per_batch
+        self.max_trees = max_trees
+        self.model.set_params(warm_start=True)
+
+    def partial_fit(self, X, y):
+        # The forest's class list is fixed; a new hospital needs a full retrain (train_model.py)
+        unknown = set(y) - set(self.model.classes_)
+        if unknown:
+            raise ValueError(f"Update has hospitals {sorted(unknown)} the model was not trained on; retrain from scratch")
+
+        X_replay, y_replay = self.replay.sample()
+        X_train = np.vstack([X, X_replay]) if len(X_replay) else X
+        y_train = np.concatenate([y, y_replay]) if len(y_replay) else y
+
+        # New trees must see the same classes as the existing ones
+        missing = set(self.model.classes_) - set(y_train)
+        if missing:
+            raise ValueError(f"Update is missing hospitals {sorted(missing)}; replay buffer not warmed up")
+
+        # warm_start seeds new trees by skipping len(estimators_) draws from random_state, which
+        # stops moving once the forest is trimmed to max_trees; step an integer seed per update
+        seed = self.model.random_state
+        if isinstance(seed, (int, np.integer)):
+            self.model.set_params(random_state=int(seed) + 1)
+
+        self.model.set_params(n_estimators=len(self.model.estimators_) + self.trees_per_batch)
+        self.model.fit(X_train, y_train)
+
+        if len(self.model.estimators_) > self.max_trees:
+            self.model.estimators_ = self.model.estimators_[-self.max_trees:]
+            self.model.set_params(n_estimators=self.max_trees)
+
+        self.replay.add(X, y)
+        return self.model
+
+
+def save_model_atomically(model, path=MODEL_PATH):
+    """Write the model next to path and rename it over the old one, so readers never see a partial file."""
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, 'wb') as f:
+        pickle.dump(model, f)
+    os.replace(temp_path, path)
+
+
+def read_incidents(stream, follow=False, poll_interval=1.0):
+    """Yield completed incidents from a JSON lines stream, waiting for more if follow is set."""
+    while True:
+        line = stream.readline()
+        if not line:
+            if not follow:
+                return
+            time.sleep(poll_interval)
+            continue
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def encode_incidents(incidents, pipeline, sources):
+    """Features for completed incidents, built from their calls as the predictor serves them."""
+    X = pipeline.from_calls(pd.DataFrame(incidents), *sources)
+    y = np.array([incident['hospital_id'] for incident in incidents])
+    return X, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update the hospital model from a stream of completed incidents.')
+    parser.add_argument('stream', nargs='?', default='-',
+                        help='JSON lines file of completed incidents (default: stdin)')
+    parser.add_argument('--batch-size', type=int, default=100, help='incidents per model update')
+    parser.add_argument('--follow', action='store_true', help='keep reading as new incidents are appended')
+    args = parser.parse_args()
+
+    with open(MODEL_PATH, 'rb') as f:
+        model = pickle.load(f)
+    pipeline = FeaturePipeline.load(PIPELINE_PATH)
+    sources = feature_sources()
+
+    # Warm the replay buffer with the training history
+    replay = ReplayBuffer()
+    history = pd.read_csv(HISTORY_PATH).dropna(subset=['hospital_id'])
+    X_history, y_history = encode_incidents(history.to_dict('records'), pipeline, sources)
+    replay.add(X_history, y_history.astype(int))
+
+    learner = OnlineForest(model, replay)
+    stream = sys.stdin if args.stream == '-' else open(args.stream, 'r')
+
+    batch = []
+    updates = 0
+    for incident in read_incidents(stream, follow=args.follow):
+        batch.append(incident)
+        if len(batch) < args.batch_size:
+            continue
+        X, y = encode_incidents(batch, pipeline, sources)
+        learner.partial_fit(X, y)
+        save_model_atomically(learner.model)
+        updates += 1
+        print(f"Update {updates}: {len(batch)} incidents, {len(learner.model.estimators_)} trees")
+        batch = []
+
+    if batch:
+        X, y = encode_incidents(batch, pipeline, sources)
+        learner.partial_fit(X, y)
+        save_model_atomically(learner.model)
+        print(f"Final update: {len(batch)} incidents, {len(learner.model.estimators_)} trees")
+
+
+if __name__ == "__main__":
+    main()
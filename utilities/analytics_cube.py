@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+CALLS_PATH = './datasets/patient/marikina_patients_ml_full.csv'
+CUBE_PATH = './cache/analytics_cube.npz'
+
+# Cube dimensions, in cell-key order
+DIMENSIONS = ['month', 'weekday', 'hour', 'base', 'hospital', 'severity', 'condition']
+
+# Bits per dimension in the int64 cell key; a dimension holds at most 2**bits labels
+KEY_BITS = {'month': 12, 'weekday': 3, 'hour': 5, 'base': 12, 'hospital': 12, 'severity': 4, 'condition': 12}
+KEY_SHIFTS = dict(zip(DIMENSIONS, np.cumsum([0] + [KEY_BITS[d] for d in DIMENSIONS[:-1]]).tolist()))
+
+# Log-bucket quantile sketch: bucket i covers MIN_VALUE * [GAMMA**i, GAMMA**(i+1)) minutes,
+# so quantiles are within about 2.5% of the exact value
+GAMMA = 1.05
+MIN_VALUE = 0.1
+NUM_BUCKETS = int(np.ceil(np.log(10000 / MIN_VALUE) / np.log(GAMMA)))
+
+# Label for incidents without a hospital (no ER-capable hospital found)
+MISSING = 'none'
+
+
+def bucket_of(values):
+    values = np.maximum(np.asarray(values, dtype=float), MIN_VALUE)
+    return np.clip(np.floor(np.log(values / MIN_VALUE) / np.log(GAMMA)).astype(int), 0, NUM_BUCKETS - 1)
+
+
+def bucket_value(buckets):
+    """Representative value of each bucket (geometric midpoint)."""
+    return MIN_VALUE * GAMMA ** (np.asarray(buckets) + 0.5)
+
+
+def _id_label(value):
+    return MISSING if pd.isna(value) else str(int(value))
+
+
+# Turns a distinct raw value of each dimension into its label
+LABELS = {
+    'month': lambda value: f"{value // 100}-{value % 100:02d}",
+    'weekday': str,
+    'hour': str,
+    'base': _id_label,
+    'hospital': _id_label,
+    'severity': lambda value: str(value).lower(),
+    'condition': str
+}
+
+
+def dimension_values(calls):
+    """Raw value per dimension for each call in a DataFrame of calls."""
+    call_time = pd.to_datetime(calls['Call_Time'])
+    return {
+        'month': (call_time.dt.year * 100 + call_time.dt.month).to_numpy(),
+        'weekday': call_time.dt.weekday.to_numpy(),
+        'hour': call_time.dt.hour.to_numpy(),
+        'base': calls['ems_base_id'].to_numpy(),
+        'hospital': calls['hospital_id'].to_numpy(),
+        'severity': calls['severity'].to_numpy(),
+        'condition': calls['condition'].to_numpy()
+    }
+
+
+def _label_order(labels):
+    """Sort numeric labels (hours, IDs) by value and the others alphabetically."""
+    numeric = pd.to_numeric(labels, errors='coerce')
+    return labels if numeric.isna().any() else numeric
+
+
+class AnalyticsCube:
+    """
+    Pre-aggregated response times over month x weekday x hour x base x hospital x
+    severity x condition.
+
+    Only cells that occur are stored. Each has a count, a sum and a sum of squares of
+    response_time_min, plus a log-bucket histogram (a sparse row) for quantiles. New
+    calls are folded in with add(); queries aggregate cells, never raw calls. The
+    patient_id of every call added is kept so that add_new() skips calls already counted.
+    """
+
+    def __init__(self):
+        self.vocab = {dimension: [] for dimension in DIMENSIONS}
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.total = np.zeros(0, dtype=np.float64)
+        self.total_sq = np.zeros(0, dtype=np.float64)
+        self.sketch = sparse.csr_matrix((0, NUM_BUCKETS), dtype=np.int64)
+        self.patient_ids = np.zeros(0, dtype=np.int64)
+        self._lookup = {dimension: {} for dimension in DIMENSIONS}
+        self._order = np.zeros(0, dtype=np.int64)
+
+    def codes(self, dimension, keys=None):
+        """Code of a dimension in each cell key (all cells by default)."""
+        keys = self.keys if keys is None else keys
+        return (keys >> KEY_SHIFTS[dimension]) & ((1 << KEY_BITS[dimension]) - 1)
+
+    def _encode(self, dimension, values):
+        """Codes for a dimension's raw values, extending its vocabulary with new labels."""
+        lookup = self._lookup[dimension]
+        local_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        codes = np.empty(len(uniques), dtype=np.int64)
+        for i, value in enumerate(uniques):
+            label = LABELS[dimension](value)
+            if label not in lookup:
+                if len(lookup) >= 1 << KEY_BITS[dimension]:
+                    raise ValueError(f"Too many {dimension} values for the cube key ({len(lookup)})")
+                lookup[label] = len(self.vocab[dimension])
+                self.vocab[dimension].append(label)
+            codes[i] = lookup[label]
+        return codes[local_codes]
+
+    def add(self, calls):
+        """
+        Fold a DataFrame of calls (the marikina_patients_ml_full.csv columns) into the cube.
+
+        Returns:
+            Number of calls added
+        """
+        calls = calls.dropna(subset=['response_time_min'])
+        if calls.empty:
+            return 0
+        values_by_dimension = dimension_values(calls)
+        keys = np.zeros(len(calls), dtype=np.int64)
+        for dimension in DIMENSIONS:
+            keys |= self._encode(dimension, values_by_dimension[dimension]) << KEY_SHIFTS[dimension]
+        values = calls['response_time_min'].to_numpy(dtype=float)
+
+        # Map the batch's distinct cells to cube rows, appending cells not seen before
+        cells, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        sorted_keys = self.keys[self._order]
+        position = np.minimum(np.searchsorted(sorted_keys, cells), max(len(sorted_keys) - 1, 0))
+        found = (sorted_keys[position] == cells) if len(sorted_keys) else np.zeros(len(cells), dtype=bool)
+        rows = np.empty(len(cells), dtype=np.int64)
+        rows[found] = self._order[position[found]]
+        new_cells = cells[~found]
+        rows[~found] = len(self.keys) + np.arange(len(new_cells))
+
+        if len(new_cells):
+            grow = len(new_cells)
+            self.keys = np.concatenate([self.keys, new_cells])
+            self._order = np.argsort(self.keys, kind='stable')
+            self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.int64)])
+            self.total = np.concatenate([self.total, np.zeros(grow)])
+            self.total_sq = np.concatenate([self.total_sq, np.zeros(grow)])
+            self.sketch = sparse.vstack([self.sketch, sparse.csr_matrix((grow, NUM_BUCKETS), dtype=np.int64)],
+                                        format='csr')
+
+        call_rows = rows[inverse]
+        n = len(self.count)
+        self.count += np.bincount(call_rows, minlength=n)
+        self.total += np.bincount(call_rows, weights=values, minlength=n)
+        self.total_sq += np.bincount(call_rows, weights=values ** 2, minlength=n)
+        self.sketch = self.sketch + sparse.csr_matrix(
+            (np.ones(len(values), dtype=np.int64), (call_rows, bucket_of(values))), shape=(n, NUM_BUCKETS))
+
+        self.patient_ids = np.union1d(self.patient_ids, calls['patient_id'].to_numpy(dtype=np.int64))
+        return len(calls)
+
+    def add_new(self, calls):
+        """Add only the calls whose patient_id is not in the cube yet, including late arrivals."""
+        calls = calls.drop_duplicates(subset='patient_id')
+        calls = calls[~np.isin(calls['patient_id'].to_numpy(dtype=np.int64), self.patient_ids)]
+        return self.add(calls)
+
+    def _mask(self, where):
+        mask = np.ones(len(self.count), dtype=bool)
+        for dimension, wanted in (where or {}).items():
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension {dimension}; expected one of {', '.join(DIMENSIONS)}")
+            if isinstance(wanted, (str, int, np.integer)):
+                wanted = [wanted]
+            lookup = self._lookup[dimension]
+            wanted_codes = [lookup[str(value)] for value in wanted if str(value) in lookup]
+            mask &= np.isin(self.codes(dimension), wanted_codes)
+        return mask
+
+    def query(self, by=(), where=None, quantiles=(0.5, 0.9)):
+        """
+        Response time statistics grouped by some dimensions.
+
+        Args:
+            by: Dimensions to group by, e.g. ['base', 'hour']; empty for one overall row
+            where: Filters as {dimension: value or list of values}, e.g. {'severity': 'high'}
+            quantiles: Quantiles to estimate from the sketches
+
+        Returns:
+            DataFrame with the group labels, count, mean, std and p<q> columns (minutes)
+        """
+        by = list(by)
+        unknown = [dimension for dimension in by if dimension not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown dimensions {', '.join(unknown)}; expected some of {', '.join(DIMENSIONS)}")
+        quantile_columns = [f"p{round(q * 100):d}" for q in quantiles]
+        columns = by + ['count', 'mean', 'std'] + quantile_columns
+
+        mask = self._mask(where)
+        rows = np.flatnonzero(mask)
+        if len(rows) == 0:
+            return pd.DataFrame(columns=columns)
+
+        # Cells fall in the same group when their keys agree on the grouped dimensions
+        group_mask = 0
+        for dimension in by:
+            group_mask |= ((1 << KEY_BITS[dimension]) - 1) << KEY_SHIFTS[dimension]
+        groups, inverse = np.unique(self.keys[rows] & group_mask, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        num_groups = len(groups)
+
+        count = np.bincount(inverse, weights=self.count[rows], minlength=num_groups)
+        total = np.bincount(inverse, weights=self.total[rows], minlength=num_groups)
+        total_sq = np.bincount(inverse, weights=self.total_sq[rows], minlength=num_groups)
+        mean = total / count
+        # Sample standard deviation (ddof=1, as pandas); undefined for a single call
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (total_sq - total ** 2 / count) / (count - 1)
+        std = np.where(count > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+        # Merge the selected cells' sketches per group with one sparse product
+        membership = sparse.csr_matrix((np.ones(len(rows)), (inverse, np.arange(len(rows)))),
+                                       shape=(num_groups, len(rows)))
+        histograms = (membership @ (self.sketch if mask.all() else self.sketch[rows])).toarray()
+        cumulative = np.cumsum(histograms, axis=1)
+
+        result = {dimension: [self.vocab[dimension][code] for code in self.codes(dimension, groups)] for dimension in by}
+        result.update({'count': count.astype(np.int64), 'mean': mean, 'std': std})
+        for q, column in zip(quantiles, quantile_columns):
+            ranks = np.ceil(q * count)[:, None]
+            result[column] = bucket_value((cumulative < ranks).sum(axis=1))
+        result = pd.DataFrame(result, columns=columns)
+        return result.sort_values(by, key=_label_order).reset_index(drop=True) if by else result
+
+    def save(self, path=CUBE_PATH):
+        """Write the cube to a .npz file atomically."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        sketch = self.sketch.tocsr()
+        temp_path = f"{path}.tmp{os.getpid()}.npz"
+        np.savez_compressed(
+            temp_path,
+            vocab=np.array(json.dumps(self.vocab)), patient_ids=self.patient_ids,
+            keys=self.keys, count=self.count, total=self.total, total_sq=self.total_sq,
+            sketch_data=sketch.data, sketch_indices=sketch.indices, sketch_indptr=sketch.indptr
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=CUBE_PATH):
+        cube = cls()
+        with np.load(path) as data:
+            cube.vocab = json.loads(str(data['vocab']))
+            cube.patient_ids = data['patient_ids']
+            cube.keys = data['keys']
+            cube.count = data['count']
+            cube.total = data['total']
+            cube.total_sq = data['total_sq']
+            cube.sketch = sparse.csr_matrix(
+                (data['sketch_data'], data['sketch_indices'], data['sketch_indptr']),
+                shape=(len(cube.count), NUM_BUCKETS))
+        cube._lookup = {dimension: {label: code for code, label in enumerate(labels)}
+                        for dimension, labels in cube.vocab.items()}
+        cube._order = np.argsort(cube.keys, kind='stable')
+        return cube
+
+    @classmethod
+    def load_or_create(cls, path=CUBE_PATH):
+        return cls.load(path) if os.path.exists(path) else cls()
+
+
+def parse_filters(filters):
+    """['severity=high', 'hour=7,8,9'] -> {'severity': ['high'], 'hour': ['7', '8', '9']}"""
+    where = {}
+    for item in filters or []:
+        dimension, _, values = item.partition('=')
+        where[dimension] = values.split(',')
+    return where
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build, update and query the incident analytics cube.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, description in [('build', 'build the cube from scratch'),
+                                 ('update', 'add calls not yet in the cube')]:
+        sub = subparsers.add_parser(command, help=description)
+        sub.add_argument('--calls', default=CALLS_PATH, help='CSV of dispatched calls')
+        sub.add_argument('--cube', default=CUBE_PATH)
+    query = subparsers.add_parser('query', help='response time statistics')
+    query.add_argument('--by', nargs='*', default=[], choices=DIMENSIONS)
+    query.add_argument('--where', nargs='*', help='filters such as severity=high hour=7,8,9')
+    query.add_argument('--cube', default=CUBE_PATH)
+    args = parser.parse_args()
+
+    if args.command in ('build', 'update'):
+        cube = AnalyticsCube() if args.command == 'build' else AnalyticsCube.load_or_create(args.cube)
+        start = time.perf_counter()
+        added = cube.add_new(pd.read_csv(args.calls))
+        cube.save(args.cube)
+        print(f"Added {added} calls in {time.perf_counter() - start:.2f} s; "
+              f"{len(cube.count)} cells, {int(cube.count.sum())} calls in {args.cube}")
+        return
+
+    if not os.path.exists(args.cube):
+        print(f"No cube at {args.cube}; run the build command first.")
+        sys.exit(1)
+    cube = AnalyticsCube.load(args.cube)
+    start = time.perf_counter()
+    result = cube.query(by=args.by, where=parse_filters(args.where))
+    elapsed = time.perf_counter() - start
+    print(result.to_string(index=False, float_format=lambda value: f"{value:.2f}"))
+    print(f"\nQuery took {elapsed * 1000:.1f} ms over {len(cube.count)} cells")
+
+
+if __name__ == "__main__":
+    main()
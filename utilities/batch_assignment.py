@@ -0,0 +1,65 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Higher severity incidents cost more per minute of waiting
+SEVERITY_WEIGHTS = {'low': 1.0, 'medium': 2.0, 'high': 4.0}
+
+# Minutes charged for an incident that stays in the queue for the next window
+UNASSIGNED_PENALTY = 60
+
+
+class BatchAssigner:
+    """Assigns a window of pending incidents to available units in one optimal pass."""
+
+    def __init__(self, distance_calculator, severity_weights=None, unassigned_penalty=UNASSIGNED_PENALTY):
+        self.distance_calculator = distance_calculator
+        self.severity_weights = severity_weights or SEVERITY_WEIGHTS
+        self.unassigned_penalty = unassigned_penalty
+
+    def build_cost_matrix(self, incident_coords, severities, unit_coords):
+        """Build the severity-weighted cost matrix (incidents x units) from travel times."""
+        distances, times, is_road = self.distance_calculator.travel_time_matrix(unit_coords, incident_coords)
+        distances, times, is_road = distances.T, times.T, is_road.T
+        weights = np.array([self.severity_weights[s] for s in severities], dtype=float)[:, None]
+
+        # Every incident is charged the penalty if left unassigned, so assigning it saves
+        # weight * (penalty - travel time). Minimizing this puts high severity calls first
+        # when there are more incidents than units.
+        cost = weights * (times - self.unassigned_penalty)
+        return cost, distances, times, is_road
+
+    def assign(self, incident_coords, severities, unit_coords):
+        """
+        Solve the incident-to-unit assignment for one dispatch window.
+
+        Args:
+            incident_coords: List of [latitude, longitude] for each pending incident
+            severities: Severity ('low', 'medium', 'high') of each incident
+            unit_coords: List of [latitude, longitude] for each available unit
+
+        Returns:
+            Tuple of (assignments, unassigned) where assignments is a list of dicts with
+            incident_index, unit_index, distance, time and is_road_distance, and unassigned is a list of
+            incident indices that must wait for the next window.
+        """
+        if len(incident_coords) != len(severities):
+            raise ValueError("Each incident needs a severity")
+        if len(incident_coords) == 0 or len(unit_coords) == 0:
+            return [], list(range(len(incident_coords)))
+
+        cost, distances, times, is_road = self.build_cost_matrix(incident_coords, severities, unit_coords)
+        incident_idx, unit_idx = linear_sum_assignment(cost)
+
+        assignments = []
+        for i, j in zip(incident_idx, unit_idx):
+            assignments.append({
+                'incident_index': int(i),
+                'unit_index': int(j),
+                'distance': float(distances[i, j]),
+                'time': float(times[i, j]),
+                'is_road_distance': bool(is_road[i, j])
+            })
+
+        assigned = set(int(i) for i in incident_idx)
+        unassigned = [i for i in range(len(incident_coords)) if i not in assigned]
+        return assignments, unassigned
@@ -0,0 +1,447 @@
+import argparse
+import heapq
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utilities.road_graph import RoadGraph, MAX_SNAP_DISTANCE, equirectangular_km
+from utilities.travel_time import FREE_FLOW_SPEED
+
+CH_PATH = './models/road_ch.npz'
+
+# Nodes settled per witness search, and edges per witness path, before a shortcut is
+# added anyway. Missing a witness only costs an unneeded shortcut, never correctness.
+WITNESS_SETTLE_LIMIT = 100
+WITNESS_HOP_LIMIT = 8
+
+INF = float('inf')
+
+
+def _to_csr(num_nodes, edges):
+    """CSR arrays (offsets, targets, minutes, km) from a list of (node, target, minutes, km)."""
+    edges = sorted(edges)
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    for node, _, _, _ in edges:
+        offsets[node + 1] += 1
+    np.cumsum(offsets, out=offsets)
+    targets = np.array([e[1] for e in edges], dtype=np.int64)
+    minutes = np.array([e[2] for e in edges], dtype=np.float64)
+    km = np.array([e[3] for e in edges], dtype=np.float64)
+    return offsets, targets, minutes, km
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over a RoadGraph for fast exact shortest travel times.
+
+    Preprocessing contracts nodes from least to most important, adding shortcut edges
+    that preserve shortest paths. A query then only searches upward in node rank from
+    both ends, which visits a few hundred nodes even on metro-scale graphs. Many-to-many
+    queries share the backward searches through per-node buckets.
+    """
+
+    def __init__(self, coords, rank, forward, backward):
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.rank = np.asarray(rank, dtype=np.int64)
+        self.forward = forward    # CSR upward edges u -> v with rank[v] > rank[u]
+        self.backward = backward  # CSR upward edges v -> u for original u -> v with rank[u] > rank[v]
+        self._forward_lists = self._as_lists(forward)
+        self._backward_lists = self._as_lists(backward)
+        self._tree = None
+        self._buckets = {}
+        self._snapped = {}
+
+    @staticmethod
+    def _as_lists(csr):
+        offsets, targets, minutes, km = csr
+        offsets, targets, minutes, km = offsets.tolist(), targets.tolist(), minutes.tolist(), km.tolist()
+        return [list(zip(targets[offsets[i]:offsets[i + 1]], minutes[offsets[i]:offsets[i + 1]],
+                         km[offsets[i]:offsets[i + 1]]))
+                for i in range(len(offsets) - 1)]
+
+    @classmethod
+    def build(cls, graph, settle_limit=WITNESS_SETTLE_LIMIT, hop_limit=WITNESS_HOP_LIMIT, progress=None):
+        """
+        Contract every node of graph; progress(contracted, total) is called periodically.
+
+        Nodes are contracted in priority order (edge difference plus contracted neighbours
+        plus hierarchy level). Priorities are estimated from witness paths of at most two
+        edges and updated lazily when a node is popped. The witness searches of an actual
+        contraction stop once every target is settled or a settle/hop limit is reached.
+        """
+        n = len(graph)
+        out = [{} for _ in range(n)]
+        inc = [{} for _ in range(n)]
+        for u, edges in enumerate(graph.adjacency):
+            for v, minutes, km in edges:
+                if u != v and (v not in out[u] or minutes < out[u][v][0]):
+                    out[u][v] = (minutes, km)
+                    inc[v][u] = (minutes, km)
+        hierarchy = {(u, v): edge for u in range(n) for v, edge in out[u].items()}
+        deleted_neighbors = [0] * n
+        level = [0] * n
+        contracted = [False] * n
+
+        push, pop = heapq.heappush, heapq.heappop
+
+        def witness_distances(source, avoid, limit, targets):
+            dist = {source: 0.0}
+            queue = [(0.0, 0, source)]
+            settled = 0
+            remaining = len(targets)
+            while queue:
+                d, hops, x = pop(queue)
+                if d > dist[x]:
+                    continue
+                settled += 1
+                if x in targets:
+                    remaining -= 1
+                    if remaining == 0:
+                        break
+                if settled > settle_limit:
+                    break
+                if hops == hop_limit:
+                    continue
+                hops += 1
+                for y, (minutes, _) in out[x].items():
+                    candidate = d + minutes
+                    if candidate <= limit and y != avoid and candidate < dist.get(y, INF):
+                        dist[y] = candidate
+                        push(queue, (candidate, hops, y))
+            return dist
+
+        def two_hop_distances(source, avoid):
+            # Witness paths of at most two edges, without a search queue
+            dist = {}
+            for x, (m1, _) in out[source].items():
+                if x == avoid:
+                    continue
+                if m1 < dist.get(x, INF):
+                    dist[x] = m1
+                for y, (m2, _) in out[x].items():
+                    if m1 + m2 < dist.get(y, INF):
+                        dist[y] = m1 + m2
+            return dist
+
+        def shortcuts_for(v, exact=True):
+            shortcuts = []
+            for u, (m1, k1) in inc[v].items():
+                # A direct edge u -> w no longer than the path through v is a witness already
+                direct = out[u]
+                targets = [(w, m2, k2) for w, (m2, k2) in out[v].items()
+                           if w != u and (w not in direct or direct[w][0] > m1 + m2)]
+                if not targets:
+                    continue
+                if exact:
+                    dist = witness_distances(u, v, m1 + max(m2 for _, m2, _ in targets),
+                                             {w for w, _, _ in targets})
+                else:
+                    dist = two_hop_distances(u, v)
+                for w, m2, k2 in targets:
+                    if dist.get(w, INF) > m1 + m2:
+                        shortcuts.append((u, w, m1 + m2, k1 + k2))
+            return shortcuts
+
+        def priority(shortcuts, v):
+            return len(shortcuts) - len(inc[v]) - len(out[v]) + deleted_neighbors[v] + level[v]
+
+        def estimate(v):
+            return priority(shortcuts_for(v, exact=False), v)
+
+        queue = [(estimate(v), v) for v in range(n)]
+        heapq.heapify(queue)
+        rank = np.zeros(n, dtype=np.int64)
+        order = 0
+        while queue:
+            _, v = heapq.heappop(queue)
+            if contracted[v]:
+                continue
+            # Lazy update: re-estimate and postpone the node if it is no longer the cheapest
+            current = estimate(v)
+            if queue and current > queue[0][0]:
+                heapq.heappush(queue, (current, v))
+                continue
+            shortcuts = shortcuts_for(v)
+
+            rank[v] = order
+            order += 1
+            contracted[v] = True
+            for u, w, minutes, km in shortcuts:
+                if w not in out[u] or minutes < out[u][w][0]:
+                    out[u][w] = (minutes, km)
+                    inc[w][u] = (minutes, km)
+                    hierarchy[(u, w)] = (minutes, km)
+            for u in inc[v]:
+                del out[u][v]
+                deleted_neighbors[u] += 1
+                level[u] = max(level[u], level[v] + 1)
+            for w in out[v]:
+                del inc[w][v]
+                deleted_neighbors[w] += 1
+                level[w] = max(level[w], level[v] + 1)
+            inc[v] = {}
+            out[v] = {}
+            if progress is not None and order % 10000 == 0:
+                progress(order, n)
+
+        forward, backward = [], []
+        for (u, v), (minutes, km) in hierarchy.items():
+            if rank[v] > rank[u]:
+                forward.append((u, v, minutes, km))
+            else:
+                backward.append((v, u, minutes, km))
+        return cls(graph.coords, rank, _to_csr(n, forward), _to_csr(n, backward))
+
+    @classmethod
+    def load(cls, path=CH_PATH):
+        data = np.load(path)
+        forward = tuple(data[f'forward_{name}'] for name in ('offsets', 'targets', 'minutes', 'km'))
+        backward = tuple(data[f'backward_{name}'] for name in ('offsets', 'targets', 'minutes', 'km'))
+        return cls(data['coords'], data['rank'], forward, backward)
+
+    def save(self, path=CH_PATH):
+        arrays = {'coords': self.coords, 'rank': self.rank}
+        for direction, csr in (('forward', self.forward), ('backward', self.backward)):
+            for name, array in zip(('offsets', 'targets', 'minutes', 'km'), csr):
+                arrays[f'{direction}_{name}'] = array
+        np.savez_compressed(path, **arrays)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def _upward(self, source, edges, stall_edges):
+        """
+        Upward search space of source: node -> (minutes, km).
+
+        Stall-on-demand: a node reachable more cheaply through a higher-ranked node already
+        found (via stall_edges, the upward edges of the opposite direction) cannot be on a
+        shortest path, so its edges are not relaxed.
+        """
+        best = {source: (0.0, 0.0)}
+        queue = [(0.0, 0.0, source)]
+        while queue:
+            minutes, km, u = heapq.heappop(queue)
+            if minutes > best[u][0]:
+                continue
+            if any(w in best and best[w][0] + edge_minutes < minutes for w, edge_minutes, _ in stall_edges[u]):
+                continue
+            for v, edge_minutes, edge_km in edges[u]:
+                candidate = minutes + edge_minutes
+                if candidate < best.get(v, (INF,))[0]:
+                    best[v] = (candidate, km + edge_km)
+                    heapq.heappush(queue, (candidate, km + edge_km, v))
+        return best
+
+    def query(self, source, target):
+        """Shortest (minutes, km) from node source to node target, or None if unreachable."""
+        backward = self._upward(target, self._backward_lists, self._forward_lists)
+        best = None
+        for node, (minutes, km) in self._upward(source, self._forward_lists, self._backward_lists).items():
+            if node in backward:
+                total = minutes + backward[node][0]
+                if best is None or total < best[0]:
+                    best = (total, km + backward[node][1])
+        return best
+
+    def many_to_many(self, sources, targets):
+        """
+        Shortest travel times and distances between node lists, via bucket-based search.
+
+        The upward searches of the longer list are kept in per-node buckets and reused, so
+        repeated queries between one patient and the same bases or hospitals, in either
+        direction, only run a single upward search from the patient.
+
+        Returns:
+            Tuple of (minutes, km) arrays of shape (len(sources), len(targets)), inf if unreachable
+        """
+        if len(sources) > len(targets):
+            minutes, km = self._scan(targets, self._buckets_for(tuple(sources), forward=True), len(sources),
+                                     forward=False)
+            return minutes.T, km.T
+        return self._scan(sources, self._buckets_for(tuple(targets), forward=False), len(targets), forward=True)
+
+    def _search_lists(self, forward):
+        """(edges, stall_edges) for an upward search from a source (forward) or a target (backward)."""
+        if forward:
+            return self._forward_lists, self._backward_lists
+        return self._backward_lists, self._forward_lists
+
+    def _scan(self, nodes, buckets, width, forward):
+        """Meet the upward search from each of nodes with the buckets of the other side."""
+        edges, stall_edges = self._search_lists(forward)
+        minutes_out = [[INF] * width for _ in nodes]
+        km_out = [[INF] * width for _ in nodes]
+        for i, node in enumerate(nodes):
+            row_minutes, row_km = minutes_out[i], km_out[i]
+            for meeting, (minutes, km) in self._upward(node, edges, stall_edges).items():
+                for j, other_minutes, other_km in buckets.get(meeting, ()):
+                    total = minutes + other_minutes
+                    if total < row_minutes[j]:
+                        row_minutes[j] = total
+                        row_km[j] = km + other_km
+        return np.array(minutes_out, dtype=float).reshape(len(nodes), width), \
+            np.array(km_out, dtype=float).reshape(len(nodes), width)
+
+    def _buckets_for(self, nodes, forward):
+        """
+        Per node: (index, minutes, km) for every one of nodes whose upward search reaches it,
+        searching forward from sources or backward from targets.
+        """
+        key = (forward, nodes)
+        buckets = self._buckets.get(key)
+        if buckets is None:
+            buckets = {}
+            edges, stall_edges = self._search_lists(forward)
+            for j, node in enumerate(nodes):
+                for meeting, (minutes, km) in self._upward(node, edges, stall_edges).items():
+                    buckets.setdefault(meeting, []).append((j, minutes, km))
+            if len(self._buckets) >= 16:
+                self._buckets.clear()
+            self._buckets[key] = buckets
+        return buckets
+
+    def _projected(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return np.column_stack([points[:, 1] * 111.32 * np.cos(np.radians(self._lat0)), points[:, 0] * 110.57])
+
+    def nearest_nodes(self, points):
+        """Indices of and distances (km) to the nodes nearest each [lat, lon] point."""
+        if self._tree is None:
+            self._lat0 = float(self.coords[:, 0].mean())
+            self._tree = cKDTree(self._projected(self.coords))
+        distances, indices = self._tree.query(self._projected(points))
+        return indices, distances
+
+    def _snap(self, points):
+        """nearest_nodes, remembered for lists of several points such as the bases or hospitals."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(points) == 1:
+            return self.nearest_nodes(points)
+        key = points.tobytes()
+        snapped = self._snapped.get(key)
+        if snapped is None:
+            snapped = self.nearest_nodes(points)
+            if len(self._snapped) >= 16:
+                self._snapped.clear()
+            self._snapped[key] = snapped
+        return snapped
+
+    def travel_time_matrix(self, origins, destinations, max_snap=MAX_SNAP_DISTANCE):
+        """
+        Free-flow road distance (km) and time (minutes) matrices between coordinates.
+
+        Snap legs are driven at residential speed; entries are NaN where a point is off
+        the graph or no path exists.
+        """
+        origin_nodes, origin_snap = self._snap(origins)
+        destination_nodes, destination_snap = self._snap(destinations)
+        minutes, km = self.many_to_many(origin_nodes.tolist(), destination_nodes.tolist())
+
+        snap = origin_snap[:, None] + destination_snap[None, :]
+        km = km + snap
+        minutes = minutes + snap / FREE_FLOW_SPEED[-1] * 60
+        invalid = (~np.isfinite(minutes) | (origin_snap[:, None] > max_snap)
+                   | (destination_snap[None, :] > max_snap))
+        km[invalid] = np.nan
+        minutes[invalid] = np.nan
+        return km, minutes
+
+    def route(self, start, end, max_snap=MAX_SNAP_DISTANCE):
+        """Same interface as RoadGraph.route: (km, free-flow minutes) or None."""
+        km, minutes = self.travel_time_matrix([start], [end], max_snap)
+        if np.isnan(km[0, 0]):
+            return None
+        return float(km[0, 0]), float(minutes[0, 0])
+
+
+def synthetic_city(num_nodes, seed=42):
+    """
+    Grid road graph of about num_nodes jittered intersections 100 m apart, with a primary
+    road every tenth street, a few missing blocks and one-way streets; for tests and benchmarks.
+    """
+    rng = np.random.default_rng(seed)
+    side = max(2, int(round(np.sqrt(num_nodes))))
+    rows, cols = np.divmod(np.arange(side * side), side)
+    coords = np.column_stack([14.60 + rows * 0.0009, 121.07 + cols * 0.0009])
+    coords += rng.normal(0, 0.0001, coords.shape)
+    adjacency = [[] for _ in range(side * side)]
+    for u in range(side * side):
+        r, c = divmod(u, side)
+        for v, arterial in ((u + 1, r % 10 == 0), (u + side, c % 10 == 0)):
+            if (v == u + 1 and c + 1 == side) or v >= side * side or rng.random() < 0.1:
+                continue
+            km = float(equirectangular_km(*coords[u], *coords[v]))
+            minutes = km / FREE_FLOW_SPEED[0 if arterial else -1] * 60
+            direction = rng.random()
+            if direction > 0.05:
+                adjacency[u].append((v, minutes, km))
+            if direction < 0.95:
+                adjacency[v].append((u, minutes, km))
+    return RoadGraph(coords, adjacency)
+
+
+def load_graph(extract=None, synthetic=None):
+    """
+    Road graph from an Overpass JSON extract, a synthetic city of that many nodes, or the
+    cached Overpass responses.
+    """
+    if synthetic:
+        return synthetic_city(synthetic)
+    if extract is None:
+        return RoadGraph.from_cache('./cache')
+    with open(extract, 'r', encoding='utf-8') as f:
+        return RoadGraph.from_overpass(json.load(f)['elements'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and check contraction hierarchies for road routing.')
+    parser.add_argument('command', choices=['build', 'verify', 'bench'])
+    parser.add_argument('--extract', help='Overpass JSON road extract (default: roads in ./cache)')
+    parser.add_argument('--synthetic', type=int, help='use a synthetic grid city of this many nodes instead')
+    parser.add_argument('--output', default=CH_PATH, help='hierarchy file to write or read')
+    parser.add_argument('--queries', type=int, default=200, help='random queries for verify/bench')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        graph = load_graph(args.extract, args.synthetic)
+        print(f"Contracting {len(graph)} nodes...")
+        start = time.perf_counter()
+        ch = ContractionHierarchy.build(graph, progress=lambda done, total: print(f"  {done}/{total}"))
+        ch.save(args.output)
+        print(f"Built in {time.perf_counter() - start:.1f}s: {len(ch.forward[1])} upward and "
+              f"{len(ch.backward[1])} downward edges, saved to {args.output}")
+        return
+
+    ch = ContractionHierarchy.load(args.output)
+    rng = np.random.default_rng(42)
+
+    if args.command == 'verify':
+        graph = load_graph(args.extract, args.synthetic)
+        mismatches = 0
+        for source, target in rng.integers(len(ch), size=(args.queries, 2)):
+            expected = graph.shortest_path(int(source), int(target))
+            found = ch.query(int(source), int(target))
+            if (expected is None) != (found is None) or (expected and abs(expected[0] - found[0]) > 1e-6):
+                mismatches += 1
+        print(f"{args.queries - mismatches}/{args.queries} queries match Dijkstra")
+        sys.exit(1 if mismatches else 0)
+
+    # bench: one patient from and to every base and hospital, as in a prediction
+    patients = ch.coords[rng.integers(len(ch), size=args.queries)]
+    sites = ch.coords[rng.integers(len(ch), size=16)]
+    for label, pairs in (('1x16', [(p[None, :], sites) for p in patients]),
+                         ('16x1', [(sites, p[None, :]) for p in patients])):
+        ch.travel_time_matrix(*pairs[0])
+        start = time.perf_counter()
+        for origins, destinations in pairs:
+            ch.travel_time_matrix(origins, destinations)
+        elapsed = (time.perf_counter() - start) / args.queries
+        print(f"{label} travel_time_matrix on {len(ch)} nodes: {elapsed * 1000:.3f} ms per query")
+
+if __name__ == "__main__":
+    main()
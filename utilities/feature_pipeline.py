@@ -0,0 +1,185 @@
+import json
+from datetime import datetime
+
+import numpy as np
+
+# Model input columns, in order
+FEATURES = ['latitude', 'longitude', 'severity', 'condition', 'distance_to_hospital_km', 'response_time_min']
+
+# Fixed response time components (minutes)
+DISPATCH_TIME = 2
+ON_SCENE_TIME = 10
+HANDOVER_TIME = 5
+
+# Lowest hospital level that takes each severity, as in the dataset generator
+MIN_HOSPITAL_LEVEL = {'low': 1, 'medium': 3, 'high': 3}
+
+
+def response_time(time_to_patient, time_to_hospital):
+    """Total response time in minutes from the two travel legs (scalars or arrays)."""
+    return DISPATCH_TIME + time_to_patient + ON_SCENE_TIME + time_to_hospital + HANDOVER_TIME
+
+
+def eligible_hospitals(severities, hospital_levels):
+    """
+    (incidents, hospitals) mask of the hospitals whose level takes each incident's severity.
+
+    Incidents that no hospital takes may go to any of them.
+    """
+    minimum = np.array([MIN_HOSPITAL_LEVEL.get(str(severity).lower(), 1) for severity in severities])
+    eligible = np.asarray(hospital_levels)[None, :] >= minimum[:, None]
+    eligible[~eligible.any(axis=1)] = True
+    return eligible
+
+
+def minutes_of_day(times):
+    """Minutes since midnight for datetimes or datetime strings (scalars or arrays)."""
+    times = np.asarray(times, dtype='datetime64[us]')
+    return (times - times.astype('datetime64[D]')).astype(np.int64) / 60e6
+
+
+class FeaturePipeline:
+    """
+    Builds the float32 model input matrix for training and serving.
+
+    Categorical columns are encoded by binary search in sorted class arrays, giving the
+    same codes as scikit-learn's LabelEncoder without building a DataFrame per call.
+    """
+
+    def __init__(self, severity_classes, condition_classes):
+        self.severity_classes = np.asarray(sorted(severity_classes))
+        self.condition_classes = np.asarray(sorted(condition_classes))
+
+    @classmethod
+    def fit(cls, severities, conditions):
+        return cls(np.unique(severities), np.unique(conditions))
+
+    @classmethod
+    def from_encoders(cls, le_severity, le_condition):
+        """Create a pipeline matching already fitted LabelEncoders."""
+        return cls(le_severity.classes_, le_condition.classes_)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data['features'] != FEATURES:
+            raise ValueError(f"Pipeline at {path} was saved for features {data['features']}")
+        return cls(data['severity_classes'], data['condition_classes'])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'features': FEATURES,
+                'severity_classes': self.severity_classes.tolist(),
+                'condition_classes': self.condition_classes.tolist()
+            }, f, indent=2)
+
+    @staticmethod
+    def _encode(values, classes, column):
+        values = np.asarray(values)
+        codes = np.searchsorted(classes, values)
+        codes = np.minimum(codes, len(classes) - 1)
+        unknown = classes[codes] != values
+        if unknown.any():
+            raise ValueError(f"Unknown {column} value(s): {sorted(set(values[unknown].tolist()))}")
+        return codes
+
+    def encode_severity(self, severities):
+        return self._encode(severities, self.severity_classes, 'severity')
+
+    def encode_condition(self, conditions):
+        return self._encode(conditions, self.condition_classes, 'condition')
+
+    def transform(self, latitudes, longitudes, severities, conditions, distances_to_hospital, response_times):
+        """Stack raw feature columns into an (n, 6) float32 matrix."""
+        X = np.empty((len(latitudes), len(FEATURES)), dtype=np.float32)
+        X[:, 0] = latitudes
+        X[:, 1] = longitudes
+        X[:, 2] = self.encode_severity(severities)
+        X[:, 3] = self.encode_condition(conditions)
+        X[:, 4] = distances_to_hospital
+        X[:, 5] = response_times
+        return X
+
+    def transform_frame(self, df):
+        """Feature matrix from a DataFrame (or dict of columns) with the raw FEATURES columns."""
+        return self.transform(*(np.asarray(df[column]) for column in FEATURES))
+
+    def from_incidents(self, incidents, distance_calculator, base_coords, hospital_coords, hospital_levels=None):
+        """
+        Feature matrix for raw incidents, with distances from the batch distance engine.
+
+        Incidents are dicts with latitude, longitude, severity, condition and optionally
+        call_time (a datetime, default now). See from_calls for how the features are built.
+
+        Returns:
+            Tuple of (X, routes) where routes holds the base and hospital distance/time
+            matrices, their road (True) / straight-line fallback (False) masks, the index of
+            the closest base and closest eligible hospital for each incident
+        """
+        now = datetime.now()
+        return self._from_columns(
+            [incident['latitude'] for incident in incidents],
+            [incident['longitude'] for incident in incidents],
+            [incident['severity'] for incident in incidents],
+            [incident['condition'] for incident in incidents],
+            minutes_of_day([incident.get('call_time') or now for incident in incidents]),
+            distance_calculator, base_coords, hospital_coords, hospital_levels
+        )
+
+    def from_calls(self, calls, distance_calculator, base_coords, hospital_coords, hospital_levels=None):
+        """
+        Feature matrix for a DataFrame of past calls (latitude, longitude, severity,
+        condition and Call_Time columns), built exactly as served by from_incidents.
+
+        The closest base (by travel time) leaving at the call time gives the time to patient.
+        The closest hospital (by distance) whose level takes the severity gives the distance
+        feature and the transport time, timed at the hour the transport leaves the scene.
+        """
+        X, _ = self._from_columns(
+            np.asarray(calls['latitude']), np.asarray(calls['longitude']),
+            np.asarray(calls['severity']), np.asarray(calls['condition']),
+            minutes_of_day(np.asarray(calls['Call_Time'])),
+            distance_calculator, base_coords, hospital_coords, hospital_levels
+        )
+        return X
+
+    def _from_columns(self, latitudes, longitudes, severities, conditions, call_minutes,
+                      distance_calculator, base_coords, hospital_coords, hospital_levels):
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        patient_coords = np.column_stack([latitudes, longitudes])
+        rows = np.arange(len(latitudes))
+
+        base_km, base_min, base_road = distance_calculator.travel_time_matrix(
+            patient_coords, base_coords, (call_minutes // 60).astype(np.int64))
+        closest_base = base_min.argmin(axis=1)
+        time_to_patient = base_min[rows, closest_base]
+
+        transport_minutes = call_minutes + DISPATCH_TIME + time_to_patient + ON_SCENE_TIME
+        hospital_km, hospital_min, hospital_road = distance_calculator.travel_time_matrix(
+            patient_coords, hospital_coords, (transport_minutes // 60).astype(np.int64))
+        if hospital_levels is None:
+            closest_hospital = hospital_km.argmin(axis=1)
+        else:
+            eligible = eligible_hospitals(severities, hospital_levels)
+            closest_hospital = np.where(eligible, hospital_km, np.inf).argmin(axis=1)
+
+        X = self.transform(
+            latitudes, longitudes, severities, conditions,
+            hospital_km[rows, closest_hospital],
+            response_time(time_to_patient, hospital_min[rows, closest_hospital])
+        )
+        routes = {
+            'base_km': base_km,
+            'base_min': base_min,
+            'base_road': base_road,
+            'hospital_km': hospital_km,
+            'hospital_min': hospital_min,
+            'hospital_road': hospital_road,
+            'closest_base': closest_base,
+            'closest_hospital': closest_hospital,
+            'time_to_patient': time_to_patient
+        }
+        return X, routes
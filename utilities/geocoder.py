@@ -0,0 +1,239 @@
+import glob
+import json
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+from math import radians, cos
+
+# Reverse geocoding grid cell size in degrees (about 550m)
+CELL_SIZE = 0.005
+
+# Minimum trigram similarity for a fuzzy match
+MIN_SIMILARITY = 0.3
+
+# Importance of hospitals and EMS bases from the reference data, above any cached result
+REFERENCE_IMPORTANCE = 2.0
+
+
+def max_edits(word):
+    """Typos tolerated in a query word: one, or two in words of seven letters or more."""
+    return 1 if len(word) < 7 else 2
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation so 'Sto. Niño' matches 'sto nino'."""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text.lower()).split())
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class OfflineGeocoder:
+    """
+    Forward and reverse geocoding over cached Nominatim and Overpass results.
+
+    Names are indexed by sorted word list (prefix search, with an edit distance fallback
+    per word) and by trigrams (typo tolerant search). Coordinates are indexed in a grid
+    for nearest-place lookup.
+    """
+
+    def __init__(self):
+        self.places = []
+        self.words = []  # sorted (word, place index) pairs
+        self.vocabulary = {}  # word -> place indexes
+        self.trigram_index = {}
+        self.grid = {}
+        self._names = set()
+
+    @classmethod
+    def from_cache(cls, cache_dir='./cache', reference=None):
+        """
+        Build the index from every cached Nominatim and Overpass JSON file, plus the
+        hospitals and EMS bases of reference (a ReferenceData) if given.
+        """
+        geocoder = cls()
+        if reference is not None:
+            geocoder.add_reference_data(reference)
+        for path in sorted(glob.glob(os.path.join(cache_dir, '*.json'))):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, list):
+                geocoder.add_nominatim_results(data)
+            elif isinstance(data, dict) and 'elements' in data:
+                geocoder.add_overpass_elements(data['elements'])
+        geocoder.build()
+        return geocoder
+
+    def add_place(self, name, latitude, longitude, display_name=None, kind=None, importance=0.0):
+        """Add a named place; repeated names keep the first (most important) entry."""
+        key = normalize(name)
+        if not key or key in self._names:
+            return
+        self._names.add(key)
+        self.places.append({
+            'name': name,
+            'display_name': display_name or name,
+            'latitude': float(latitude),
+            'longitude': float(longitude),
+            'kind': kind,
+            'importance': importance,
+            'key': key
+        })
+
+    def add_reference_data(self, reference):
+        """Add the hospitals and EMS bases; add them first so their names take precedence."""
+        for hospital in reference.hospitals:
+            self.add_place(hospital['Name'], hospital['Latitude'], hospital['Longitude'],
+                           display_name=f"{hospital['Name']}, {hospital['Address']}", kind='hospital',
+                           importance=REFERENCE_IMPORTANCE)
+        for base in reference.bases:
+            self.add_place(base['base_name'], base['latitude'], base['longitude'], kind='ems_base',
+                           importance=REFERENCE_IMPORTANCE)
+
+    def add_nominatim_results(self, results):
+        for result in sorted(results, key=lambda r: -float(r.get('importance', 0))):
+            self.add_place(
+                result.get('name') or result['display_name'].split(',')[0],
+                result['lat'], result['lon'],
+                display_name=result.get('display_name'),
+                kind=f"{result.get('class')}/{result.get('type')}",
+                importance=float(result.get('importance', 0))
+            )
+
+    def add_overpass_elements(self, elements):
+        """Add named nodes, and named ways at the centroid of all their nodes."""
+        nodes = {e['id']: (e['lat'], e['lon']) for e in elements if e['type'] == 'node' and 'lat' in e}
+        way_points = {}
+        for element in elements:
+            name = element.get('tags', {}).get('name')
+            if not name:
+                continue
+            if element['type'] == 'node' and 'lat' in element:
+                self.add_place(name, element['lat'], element['lon'], kind='node')
+            elif element['type'] == 'way':
+                points = [nodes[node_id] for node_id in element.get('nodes', []) if node_id in nodes]
+                if points:
+                    kind = element['tags'].get('highway', 'way')
+                    way_points.setdefault((name, kind), []).extend(points)
+            elif 'center' in element:
+                self.add_place(name, element['center']['lat'], element['center']['lon'], kind=element['type'])
+
+        for (name, kind), points in way_points.items():
+            latitude = sum(p[0] for p in points) / len(points)
+            longitude = sum(p[1] for p in points) / len(points)
+            self.add_place(name, latitude, longitude, kind=kind)
+
+    def build(self):
+        """Build the word, trigram and grid indexes after all places are added."""
+        self.words = []
+        self.vocabulary = {}
+        self.trigram_index = {}
+        self.grid = {}
+        for index, place in enumerate(self.places):
+            for word in set(place['key'].split()):
+                self.words.append((word, index))
+                self.vocabulary.setdefault(word, set()).add(index)
+            for gram in trigrams(place['key']):
+                self.trigram_index.setdefault(gram, set()).add(index)
+            self.grid.setdefault(self._cell(place['latitude'], place['longitude']), []).append(index)
+        self.words.sort()
+
+    def _prefix_matches(self, prefix):
+        matches = set()
+        position = bisect_left(self.words, (prefix, -1))
+        while position < len(self.words) and self.words[position][0].startswith(prefix):
+            matches.add(self.words[position][1])
+            position += 1
+        return matches
+
+    def _typo_matches(self, word):
+        """Places with a word within max_edits(word) edits of word."""
+        limit = max_edits(word)
+        matches = set()
+        for known, indexes in self.vocabulary.items():
+            if edit_distance(word, known, limit) <= limit:
+                matches |= indexes
+        return matches
+
+    def search(self, query, limit=5):
+        """
+        Find places by name.
+
+        Every word in the query must be a prefix of a word in the place name, or a word
+        of the name with a typo or two; if nothing matches that way, places are ranked by
+        trigram similarity instead.
+
+        Returns:
+            List of place dicts, best match first
+        """
+        key = normalize(query)
+        if not key:
+            return []
+
+        candidates = None
+        for word in key.split():
+            matches = self._prefix_matches(word) or self._typo_matches(word)
+            candidates = matches if candidates is None else candidates & matches
+        if candidates:
+            ranked = sorted(candidates, key=lambda i: (
+                self.places[i]['key'] != key,
+                -self.places[i]['importance'],
+                len(self.places[i]['key'])
+            ))
+            return [self.places[i] for i in ranked[:limit]]
+
+        query_grams = trigrams(key)
+        counts = {}
+        for gram in query_grams:
+            for index in self.trigram_index.get(gram, ()):
+                counts[index] = counts.get(index, 0) + 1
+        scored = []
+        for index, shared in counts.items():
+            similarity = shared / (len(query_grams) + len(trigrams(self.places[index]['key'])) - shared)
+            if similarity >= MIN_SIMILARITY:
+                scored.append((similarity, index))
+        scored.sort(key=lambda s: -s[0])
+        return [self.places[i] for _, i in scored[:limit]]
+
+    def _cell(self, latitude, longitude):
+        return int(latitude // CELL_SIZE), int(longitude // CELL_SIZE)
+
+    def reverse(self, latitude, longitude, max_rings=4):
+        """Return the nearest known place to a coordinate, or None if none is close."""
+        row, col = self._cell(latitude, longitude)
+        scale = cos(radians(latitude))
+        best, best_distance = None, float('inf')
+        for ring in range(max_rings + 1):
+            for d_row in range(-ring, ring + 1):
+                for d_col in range(-ring, ring + 1):
+                    if max(abs(d_row), abs(d_col)) != ring:
+                        continue
+                    for index in self.grid.get((row + d_row, col + d_col), ()):
+                        place = self.places[index]
+                        distance = (place['latitude'] - latitude) ** 2 + ((place['longitude'] - longitude) * scale) ** 2
+                        if distance < best_distance:
+                            best, best_distance = place, distance
+            # Anything in a further ring is at least `ring` cells away; cells are narrower
+            # east-west once longitude is scaled, so that is the bound
+            if best is not None and best_distance ** 0.5 <= ring * CELL_SIZE * scale:
+                break
+        return best
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from utilities.metrics import metrics
+
+# Default routing budget per prediction (seconds)
+DEFAULT_DEADLINE = 0.3
+
+# Remote answers remembered for the cache backend
+MEMORY_SIZE = 10000
+
+# Remote requests queued or running at once, across all route_many calls
+MAX_IN_FLIGHT = 32
+
+
+class Backend:
+    """
+    One way of answering a route query.
+
+    func(start, end, departure_time) returns (distance_km, minutes) or None. Remote
+    backends run in the router's thread pool; local ones are answered inline while
+    the deadline allows. A local backend may also give batch(pairs, departure_time),
+    returning one answer per pair, to answer a whole route_many call in one query.
+    An interruptible local func also takes deadline (a time.perf_counter() value) and
+    returns None once its search runs past it, so one slow search cannot overrun the budget.
+    """
+
+    def __init__(self, name, func, remote=False, road_distance=True, batch=None, interruptible=False):
+        self.name = name
+        self.func = func
+        self.remote = remote
+        self.road_distance = road_distance
+        self.batch = batch
+        self.interruptible = interruptible
+
+
+class HedgedRouter:
+    """
+    Answers route queries from several backends within a deadline.
+
+    Backends are given best first. Remote requests for every pair start at once (up to
+    max_in_flight outstanding; pairs beyond that skip the remote backend), local backends
+    are answered meanwhile, and at the deadline (or as soon as every remote request is
+    done) each pair takes the best backend that has answered. Local backends other than
+    the last are skipped once the deadline has passed; the last one always answers.
+    Remote answers arriving after the deadline are remembered and served by the 'cache'
+    backend next time.
+    """
+
+    def __init__(self, backends, deadline=DEFAULT_DEADLINE, max_workers=8, memory_size=MEMORY_SIZE,
+                 max_in_flight=MAX_IN_FLIGHT):
+        self.backends = backends
+        self.deadline = deadline
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='routing')
+        self.memory = OrderedDict()
+        self.memory_size = memory_size
+        self.memory_lock = threading.Lock()
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def remember(self, key, answer):
+        # Called from routing threads as late answers arrive
+        with self.memory_lock:
+            self.memory[key] = answer
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+
+    def recall(self, key):
+        with self.memory_lock:
+            return self.memory.get(key)
+
+    def route_many(self, pairs, departure_time=None, deadline=None, keys=None):
+        """
+        Route every (start, end) pair within one shared deadline.
+
+        Args:
+            keys: Optional memory key per pair; remote answers are remembered under it
+
+        Returns:
+            List of dicts with distance, time, is_road_distance and the winning backend
+        """
+        deadline_at = time.perf_counter() + (self.deadline if deadline is None else deadline)
+        answers = [{} for _ in pairs]
+        futures = {}
+
+        for i, (start, end) in enumerate(pairs):
+            for backend in self.backends:
+                if backend.remote:
+                    if not self.in_flight.acquire(blocking=False):
+                        metrics.increment('routing_remote_skipped')
+                        continue
+                    future = self.executor.submit(backend.func, start, end, departure_time)
+                    future.add_done_callback(lambda _: self.in_flight.release())
+                    futures[future] = (i, backend.name)
+                    if keys is not None:
+                        future.add_done_callback(self._remember_callback(keys[i]))
+
+        fallback = self.backends[-1]
+        for backend in self.backends:
+            if backend.batch is not None and not backend.remote and time.perf_counter() < deadline_at:
+                for answer, batch_answer in zip(answers, self._call_batch(backend, pairs, departure_time)):
+                    answer[backend.name] = batch_answer
+        for i, (start, end) in enumerate(pairs):
+            for backend in self.backends:
+                if backend.remote or backend.name in answers[i]:
+                    continue
+                if backend is not fallback and time.perf_counter() >= deadline_at:
+                    metrics.increment(f'routing_{backend.name}_skipped')
+                    continue
+                deadline = deadline_at if backend.interruptible and backend is not fallback else None
+                answers[i][backend.name] = self._call(backend, start, end, departure_time, deadline)
+
+        pending = set(futures)
+        while pending:
+            remaining = deadline_at - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, name = futures[future]
+                try:
+                    answers[i][name] = future.result()
+                except Exception:
+                    metrics.increment(f'routing_{name}_errors')
+                    answers[i][name] = None
+        for future in pending:
+            future.cancel()
+            metrics.increment('routing_deadline_misses')
+
+        return [self._best(answer) for answer in answers]
+
+    def _remember_callback(self, key):
+        def callback(future):
+            if not future.cancelled() and future.exception() is None and future.result() is not None:
+                self.remember(key, future.result())
+        return callback
+
+    def _call(self, backend, start, end, departure_time, deadline=None):
+        try:
+            if deadline is not None:
+                return backend.func(start, end, departure_time, deadline)
+            return backend.func(start, end, departure_time)
+        except Exception:
+            metrics.increment(f'routing_{backend.name}_errors')
+            return None
+
+    def _call_batch(self, backend, pairs, departure_time):
+        try:
+            return backend.batch(pairs, departure_time)
+        except Exception:
+            metrics.increment(f'routing_{backend.name}_errors')
+            return [None] * len(pairs)
+
+    def _best(self, answers):
+        for backend in self.backends:
+            answer = answers.get(backend.name)
+            if answer is not None:
+                metrics.increment(f'routing_{backend.name}_wins')
+                distance, minutes = answer
+                return {
+                    'distance': distance,
+                    'time': minutes,
+                    'is_road_distance': backend.road_distance,
+                    'backend': backend.name
+                }
+        raise RuntimeError("No routing backend answered; the last backend must always answer")
+
+    def close(self):
+        """Stop the routing threads; requests still queued are cancelled."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
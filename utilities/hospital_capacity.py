@@ -0,0 +1,80 @@
+import heapq
+from datetime import datetime
+
+# ER slots assumed per hospital level (the hospital dataset has no bed counts)
+DEFAULT_ER_SLOTS = {1: 3, 2: 5, 3: 8}
+
+# Minutes an ER slot stays occupied per patient, by severity
+DEFAULT_SERVICE_TIME = {'low': 45, 'medium': 120, 'high': 240}
+
+
+def to_minutes(t):
+    """Convert a datetime or a number of minutes to minutes on a common clock."""
+    if isinstance(t, datetime):
+        return t.timestamp() / 60
+    return float(t)
+
+
+class HospitalCapacityTracker:
+    """
+    Tracks ER occupancy per hospital over simulated time.
+
+    Each hospital keeps a min-heap with one entry per ER slot holding the time that
+    slot becomes free, so admitting a patient and looking up the expected wait are
+    O(log slots) and O(1) respectively.
+    """
+
+    def __init__(self, capacities, service_times=None):
+        self.capacities = dict(capacities)
+        self.service_times = service_times or DEFAULT_SERVICE_TIME
+        self.slots = {}
+        self.reset()
+
+    @classmethod
+    def from_hospitals(cls, hospitals, slots_per_level=None, service_times=None):
+        """Create a tracker from hospital records or a DataFrame with ID/Level/Has ER columns."""
+        slots_per_level = slots_per_level or DEFAULT_ER_SLOTS
+        records = hospitals.to_dict('records') if hasattr(hospitals, 'to_dict') else hospitals
+
+        capacities = {}
+        for hospital in records:
+            hospital_id = hospital.get('ID', hospital.get('id'))
+            level = int(hospital.get('Level', hospital.get('level', 1)))
+            has_er = str(hospital.get('Has ER', hospital.get('has_er', 'Yes'))).lower() == 'yes'
+            capacities[hospital_id] = slots_per_level.get(level, 1) if has_er else 0
+        return cls(capacities, service_times)
+
+    def reset(self):
+        """Mark every ER slot as free."""
+        self.slots = {hospital_id: [float('-inf')] * capacity
+                      for hospital_id, capacity in self.capacities.items()}
+
+    def expected_wait(self, hospital_id, arrival_time):
+        """Minutes a patient arriving at arrival_time would wait for a free ER slot."""
+        slots = self.slots.get(hospital_id)
+        if not slots:
+            return float('inf')
+        return max(0.0, slots[0] - to_minutes(arrival_time))
+
+    def admit(self, hospital_id, arrival_time, severity=None, service_time=None):
+        """
+        Admit a patient into the earliest free ER slot.
+
+        Returns:
+            Minutes the patient waits before a slot is available
+        """
+        slots = self.slots.get(hospital_id)
+        if not slots:
+            raise ValueError(f"Hospital {hospital_id} has no ER capacity")
+        if service_time is None:
+            service_time = self.service_times[severity]
+
+        arrival = to_minutes(arrival_time)
+        start = max(arrival, slots[0])
+        heapq.heapreplace(slots, start + service_time)
+        return start - arrival
+
+    def occupancy(self, hospital_id, at_time):
+        """Number of ER slots busy at the given time."""
+        now = to_minutes(at_time)
+        return sum(1 for free_at in self.slots.get(hospital_id, []) if free_at > now)
@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utilities.metrics import metrics
+
+# Lower value is served first; unknown severities are treated as low
+SEVERITY_PRIORITY = {'high': 0, 'medium': 1, 'low': 2}
+
+# Defaults: wait up to 5 ms to fill a batch of at most 256 calls, hold at most 2048 calls
+MAX_BATCH = 256
+MAX_WAIT = 0.005
+MAX_PENDING = 2048
+
+
+class QueueFull(Exception):
+    """The intake queue is overloaded and could not take (or keep) a call."""
+
+
+def priority_of(incident):
+    return SEVERITY_PRIORITY.get(str(incident.get('severity', '')).lower(), len(SEVERITY_PRIORITY) - 1)
+
+
+class IntakeQueue:
+    """
+    Collects incoming calls for a few milliseconds and ranks them as one batch.
+
+    Calls are served by severity, then by arrival. Each batch goes through
+    HospitalPredictor.rank_hospitals_batch in a worker thread, so calls arriving while
+    a batch runs are collected into the next, larger batch. When max_pending calls
+    are waiting, a new call displaces the newest waiting call of lower severity (which
+    fails with QueueFull); otherwise it waits for room, up to its timeout.
+    """
+
+    def __init__(self, predictor, k=3, max_batch=MAX_BATCH, max_wait=MAX_WAIT, max_pending=MAX_PENDING):
+        self.predictor = predictor
+        self.k = k
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.pending = []
+        self.sequence = itertools.count()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='intake')
+        self.stats = {'calls': 0, 'batches': 0, 'shed': 0, 'rejected': 0}
+        self._arrived = None
+        self._room = None
+        self._worker = None
+        self._in_flight = []
+
+    async def start(self):
+        """Start the batching loop on the running event loop."""
+        if self._worker is None:
+            self._arrived = asyncio.Event()
+            self._room = asyncio.Condition()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop batching. Calls still waiting, and those in the batch being ranked, fail
+        with QueueFull; returns once the running batch has finished in its thread.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for _, _, _, future, _ in self._in_flight + self.pending:
+            if not future.done():
+                future.set_exception(QueueFull("Intake queue stopped"))
+        self._in_flight = []
+        self.pending.clear()
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown, True)
+
+    async def submit(self, incident, timeout=None):
+        """
+        Rank hospitals for one call.
+
+        Args:
+            incident: Dict with latitude, longitude, severity and condition
+            timeout: Seconds to wait for room when the queue is full (None waits indefinitely)
+
+        Returns:
+            The call's result from rank_hospitals_batch (closest 'ems_base' and 'ranking')
+        """
+        await self.start()
+        priority = priority_of(incident)
+        if len(self.pending) >= self.max_pending and not self._shed(priority):
+            try:
+                async with self._room:
+                    await asyncio.wait_for(
+                        self._room.wait_for(lambda: len(self.pending) < self.max_pending), timeout)
+            except asyncio.TimeoutError:
+                self.stats['rejected'] += 1
+                metrics.increment('intake_rejected')
+                raise QueueFull(f"{len(self.pending)} calls waiting")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.pending, (priority, next(self.sequence), incident, future, time.perf_counter()))
+        self.stats['calls'] += 1
+        self._arrived.set()
+        return await future
+
+    def _shed(self, priority):
+        """Drop the newest waiting call with a lower severity than priority, if any."""
+        if not self.pending:
+            return False
+        victim = max(self.pending, key=lambda entry: (entry[0], entry[1]))
+        if victim[0] <= priority:
+            return False
+        self.pending.remove(victim)
+        heapq.heapify(self.pending)
+        victim[3].set_exception(QueueFull("Displaced by a higher severity call"))
+        self.stats['shed'] += 1
+        metrics.increment('intake_shed')
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            # Give a burst a moment to fill the batch
+            if len(self.pending) < self.max_batch:
+                await asyncio.sleep(self.max_wait)
+
+            batch = [heapq.heappop(self.pending) for _ in range(min(self.max_batch, len(self.pending)))]
+            if not self.pending:
+                self._arrived.clear()
+            async with self._room:
+                self._room.notify_all()
+
+            batch = [entry for entry in batch if not entry[3].done()]
+            if not batch:
+                continue
+            incidents = [entry[2] for entry in batch]
+            started = time.perf_counter()
+            self._in_flight = batch
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.predictor.rank_hospitals_batch, incidents, self.k)
+            except Exception as e:
+                self._in_flight = []
+                for entry in batch:
+                    if not entry[3].done():
+                        entry[3].set_exception(e)
+                continue
+            # Left set on cancellation so that stop() can fail the batch's calls
+            self._in_flight = []
+
+            self.stats['batches'] += 1
+            metrics.observe('intake_batch_size', len(batch))
+            metrics.observe('intake_batch', time.perf_counter() - started)
+            for entry, result in zip(batch, results):
+                metrics.observe('intake_queue_wait', started - entry[4])
+                if not entry[3].done():
+                    entry[3].set_result(result)
+
+
+class ThreadedIntake:
+    """
+    An IntakeQueue on its own event loop thread, for callers that are not async.
+
+    Calling the object with an incident blocks until its batch has been ranked.
+    """
+
+    def __init__(self, predictor, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='intake-loop', daemon=True)
+        self.thread.start()
+        self.queue = IntakeQueue(predictor, **kwargs)
+        asyncio.run_coroutine_threadsafe(self.queue.start(), self.loop).result()
+
+    def __call__(self, incident, timeout=None):
+        return asyncio.run_coroutine_threadsafe(self.queue.submit(incident, timeout), self.loop).result()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.queue.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
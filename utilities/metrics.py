@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+
+# Number of most recent samples kept per histogram for percentile estimates
+MAX_SAMPLES = 10000
+
+_NULL_TIMER = nullcontext()
+
+
+class Histogram:
+    """Keeps count, sum and a window of recent samples for percentile estimates."""
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) of the recent samples."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class _Timer:
+    """Context manager recording elapsed seconds into a histogram."""
+
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Lightweight registry of counters and latency histograms.
+
+    When disabled, timer() hands back a shared no-op context manager and timed()
+    functions call straight through, so instrumented code pays almost nothing.
+    Enable with the EMS_METRICS=1 environment variable or Metrics(enabled=True).
+    """
+
+    def __init__(self, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get('EMS_METRICS', '').lower() in ('1', 'true', 'yes')
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def timer(self, name):
+        """Time a block of code as stage `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name):
+        """Decorator timing every call of a function as stage `name`."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Timer(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def increment(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def summary(self):
+        """Return counters and per-stage count, mean, p50 and p99 (seconds)."""
+        with self._lock:
+            stages = {}
+            for name, histogram in self.histograms.items():
+                stages[name] = {
+                    'count': histogram.count,
+                    'sum': histogram.total,
+                    'mean': histogram.total / histogram.count if histogram.count else 0.0,
+                    'p50': histogram.percentile(50),
+                    'p99': histogram.percentile(99)
+                }
+            return {'counters': dict(self.counters), 'stages': stages}
+
+    def write_prometheus(self, path):
+        """Write all metrics in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = []
+        if summary['stages']:
+            lines.append('# HELP ems_stage_seconds Latency of instrumented stages in seconds')
+            lines.append('# TYPE ems_stage_seconds summary')
+            for name, stage in sorted(summary['stages'].items()):
+                lines.append(f'ems_stage_seconds{{stage="{name}",quantile="0.5"}} {stage["p50"]}')
+                lines.append(f'ems_stage_seconds{{stage="{name}",quantile="0.99"}} {stage["p99"]}')
+                lines.append(f'ems_stage_seconds_sum{{stage="{name}"}} {stage["sum"]}')
+                lines.append(f'ems_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+        for name, value in sorted(summary['counters'].items()):
+            lines.append(f'# TYPE ems_{name}_total counter')
+            lines.append(f'ems_{name}_total {value}')
+
+        _ensure_parent_dir(path)
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def write_jsonl(self, path):
+        """Append one JSON line with a timestamped snapshot of all metrics."""
+        record = {'timestamp': time.time(), **self.summary()}
+        _ensure_parent_dir(path)
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def export(self, path):
+        """Write metrics to path, as JSON lines for .jsonl files and Prometheus text otherwise."""
+        if path.endswith('.jsonl'):
+            self.write_jsonl(path)
+        else:
+            self.write_prometheus(path)
+
+    def print_summary(self):
+        summary = self.summary()
+        print("\nStage Latency (ms):")
+        for name, stage in sorted(summary['stages'].items()):
+            print(f"• {name}: p50 {stage['p50'] * 1000:.2f}, p99 {stage['p99'] * 1000:.2f} ({stage['count']} calls)")
+        for name, value in sorted(summary['counters'].items()):
+            print(f"• {name}: {value}")
+
+
+def _ensure_parent_dir(path):
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+
+
+# Shared registry used by the predictor and distance calculator
+metrics = Metrics()
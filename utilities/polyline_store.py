@@ -0,0 +1,160 @@
+import json
+import os
+from math import cos, radians
+
+import numpy as np
+
+# Default location of the route geometry store
+STORE_PATH = './cache/routes.json'
+
+# Douglas-Peucker tolerance in meters; points closer than this to the simplified line are dropped
+DEFAULT_TOLERANCE = 5.0
+
+# Decimal places of the encoded polyline (5 = about 1m, as used by Google and ORS)
+PRECISION = 5
+
+
+def encode_polyline(points, precision=PRECISION):
+    """Encode [[lat, lon], ...] with the Google encoded polyline algorithm."""
+    factor = 10 ** precision
+    output = []
+    prev_lat = prev_lon = 0
+    for lat, lon in points:
+        lat, lon = int(round(lat * factor)), int(round(lon * factor))
+        for delta in (lat - prev_lat, lon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                output.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            output.append(chr(value + 63))
+        prev_lat, prev_lon = lat, lon
+    return ''.join(output)
+
+
+def decode_polyline(text, precision=PRECISION):
+    """Decode an encoded polyline back into [[lat, lon], ...]."""
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+    while index < len(text):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(text[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append([lat / factor, lon / factor])
+    return points
+
+
+def simplify(points, tolerance=DEFAULT_TOLERANCE):
+    """
+    Douglas-Peucker simplification of a [[lat, lon], ...] line.
+
+    Points are projected to local meters (equirectangular) so tolerance is in meters.
+    Uses an explicit stack instead of recursion so long routes cannot hit the recursion limit.
+    """
+    if len(points) < 3 or tolerance <= 0:
+        return [list(p) for p in points]
+
+    coords = np.asarray(points, dtype=float)
+    xy = np.column_stack([
+        coords[:, 1] * 111320 * cos(radians(coords[:, 0].mean())),
+        coords[:, 0] * 110540
+    ])
+
+    keep = np.zeros(len(coords), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(coords) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = xy[first], xy[last]
+        segment = end - start
+        length = np.hypot(*segment)
+        inner = xy[first + 1:last] - start
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        farthest = int(distances.argmax())
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return coords[keep].tolist()
+
+
+def route_key(start, end):
+    """Store key for a directed origin/destination pair, rounded to about 1m."""
+    return f"{float(start[0]):.5f},{float(start[1]):.5f}|{float(end[0]):.5f},{float(end[1]):.5f}"
+
+
+class PolylineStore:
+    """
+    Local store of simplified route geometries as encoded polylines, keyed by origin/destination.
+
+    The store is a single JSON file loaded on first use and rewritten atomically on save.
+    """
+
+    def __init__(self, path=STORE_PATH, tolerance=DEFAULT_TOLERANCE):
+        self.path = path
+        self.tolerance = tolerance
+        self.routes = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        if self.routes is None:
+            self.routes = {}
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    self.routes = json.load(f)
+        return self.routes
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def __len__(self):
+        return len(self._load())
+
+    def get(self, start, end):
+        """Stored route as a dict with 'points' ([[lat, lon], ...]), or None if not stored."""
+        entry = self._load().get(route_key(start, end))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {**entry, 'points': decode_polyline(entry['polyline'])}
+
+    def put(self, start, end, points, distance=None, duration=None):
+        """Simplify and store a route geometry; returns the simplified points."""
+        simplified = simplify(points, self.tolerance)
+        self._load()[route_key(start, end)] = {
+            'polyline': encode_polyline(simplified),
+            'distance': distance,
+            'duration': duration,
+            'tolerance': self.tolerance
+        }
+        return simplified
+
+    def save(self):
+        if self.routes is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp{os.getpid()}"
+        with open(temp_path, 'w') as f:
+            json.dump(self.routes, f)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+from math import floor
+
+# Default grid (degrees, about 55m) that incident locations are snapped to
+DEFAULT_CELL_SIZE = 0.0005
+
+# Default number of cached predictions
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class PredictionCache:
+    """
+    Size-bounded LRU memo of predictions keyed by (snapped location, severity, condition,
+    hour of day).
+
+    Calls from the same building or block in the same hour share a grid cell and reuse
+    one prediction; the hour is part of the key because travel times depend on it.
+    The cache must be invalidated whenever the model or hospital table changes. Each
+    invalidation starts a new generation, and put() drops values computed in an older
+    one, so a miss still in flight during a model swap cannot store a stale result.
+    max_entries=0 disables caching.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cell_size=DEFAULT_CELL_SIZE):
+        if max_entries < 0:
+            raise ValueError("max_entries must not be negative")
+        self.max_entries = max_entries
+        self.cell_size = cell_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+        self.stale_puts = 0
+
+    def key(self, latitude, longitude, severity, condition, hour):
+        return (floor(latitude / self.cell_size), floor(longitude / self.cell_size), severity, condition, hour)
+
+    def get(self, key):
+        """Cached value for key, or None. Counts a hit or a miss."""
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        """Store value, unless it was computed in a generation that has since been invalidated."""
+        if not self.max_entries:
+            return
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                self.stale_puts += 1
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the model or hospital table is reloaded."""
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+            self.generation += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'cell_size': self.cell_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'stale_puts': self.stale_puts
+        }
@@ -0,0 +1,330 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import nullcontext
+from functools import wraps
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+# Rows kept in the summary for top functions and top allocators
+TOP_N = 15
+
+# Frames kept by tracemalloc per allocation, enough to see the calling loop
+TRACE_FRAMES = 5
+
+# The sampler snapshots a stage's allocations again once its memory growth is this much
+# above the growth at its last snapshot (and at least PEAK_MIN_STEP bytes more), so the
+# kept snapshot is within about 10% of the stage's peak
+PEAK_GROWTH = 1.1
+PEAK_MIN_STEP = 2 ** 20
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+OUTPUT_DIR = './metrics/profile'
+
+_NULL_STAGE = nullcontext()
+
+# The profiler's own snapshots are left out of the allocation reports
+_SNAPSHOT_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+
+
+def profiling_requested(argv=None):
+    """True when --profile is on the command line or EMS_PROFILE is set."""
+    argv = sys.argv if argv is None else argv
+    return '--profile' in argv or os.environ.get('EMS_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def source_label(filename, lineno):
+    """file:line relative to the package, or to site-packages / the standard library."""
+    path = os.path.abspath(filename)
+    if path.startswith(ROOT + os.sep):
+        path = os.path.relpath(path, ROOT)
+    else:
+        for marker in ('site-packages', 'dist-packages', f"python{sys.version_info[0]}.{sys.version_info[1]}"):
+            head, found, tail = path.rpartition(os.sep + marker + os.sep)
+            if found:
+                path = tail
+                break
+    return f"{path}:{lineno}"
+
+
+def collapse(frame):
+    """Collapsed stack for a frame, root first, ending with the line being executed."""
+    labels = []
+    leaf = frame
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    labels.append(f"{os.path.basename(leaf.f_code.co_filename)}:{leaf.f_lineno}")
+    return ';'.join(labels)
+
+
+class StageProfile:
+    """What was recorded for one stage: wall time, cProfile stats and memory."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_bytes = 0
+        self.stats = None
+        self.allocations = Counter()
+
+    def add_stats(self, profile):
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+
+
+class _Stage:
+    """
+    Context manager profiling a block of code as one stage.
+
+    Allocations are reported as they stood at the stage's peak: the sampler thread
+    snapshots traces whenever the stage's memory growth climbs PEAK_GROWTH above its
+    last snapshot, so temporaries freed before the stage ends are still counted.
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        profiler = self.profiler
+        with profiler._lock:
+            profiler._busy = True
+            parent = profiler._stack[-1] if profiler._stack else None
+            if parent is not None:
+                parent.cprofile.disable()
+            # reset_peak() below would drop the peak the open stages reached so far
+            profiler._fold_peak()
+            profiler._stack.append(self)
+
+            self.snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            self.start_bytes = tracemalloc.get_traced_memory()[0]
+            self.peak = self.start_bytes
+            self.peak_snapshot = None
+            self.snapshot_growth = 0
+            self.cprofile = cProfile.Profile()
+            profiler._busy = False
+        self.start = time.perf_counter()
+        self.cprofile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cprofile.disable()
+        elapsed = time.perf_counter() - self.start
+        profiler = self.profiler
+        with profiler._lock:
+            profiler._busy = True
+            profiler._fold_peak()
+            at_peak = self.peak_snapshot
+            if at_peak is None:
+                # Too short for the sampler to catch its peak; fall back to its end state
+                at_peak = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            growth = at_peak.compare_to(self.snapshot, 'lineno')
+
+            stage = profiler.stage_profile(self.name)
+            stage.calls += 1
+            stage.seconds += elapsed
+            stage.peak_bytes = max(stage.peak_bytes, self.peak)
+            stage.add_stats(self.cprofile)
+            for stat in growth:
+                if stat.size_diff > 0:
+                    frame = stat.traceback[0]
+                    stage.allocations[source_label(frame.filename, frame.lineno)] += stat.size_diff
+
+            profiler._stack.pop()
+            if profiler._stack:
+                profiler._stack[-1].cprofile.enable()
+            profiler._busy = False
+        return False
+
+
+class Profiler:
+    """
+    CPU and memory profiling per stage, off unless asked for.
+
+    Each stage records cProfile stats, the tracemalloc peak and the allocations held at
+    that peak.
+    While any stage is open, a sampler thread records collapsed stacks of the profiled
+    thread, which report() writes as a flamegraph-compatible .folded file. When
+    disabled, stage() hands back a shared no-op context manager.
+    Enable with --profile on the command line, EMS_PROFILE=1 or Profiler(enabled=True).
+    """
+
+    def __init__(self, enabled=None, interval=SAMPLE_INTERVAL):
+        if enabled is None:
+            enabled = profiling_requested()
+        self.enabled = enabled
+        self.interval = interval
+        self.stages = {}
+        self.stacks = Counter()
+        self._stack = []
+        self._busy = False
+        self._lock = threading.Lock()
+        self._thread_id = None
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def stage_profile(self, name):
+        if name not in self.stages:
+            self.stages[name] = StageProfile(name)
+        return self.stages[name]
+
+    def stage(self, name):
+        """Profile a block of code as stage `name`."""
+        if not self.enabled:
+            return _NULL_STAGE
+        self._start()
+        return _Stage(self, name)
+
+    def profiled(self, name):
+        """Decorator profiling every call of a function as stage `name`."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _start(self):
+        if self._sampler is not None:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name='profiler-sampler', daemon=True)
+        self._sampler.start()
+
+    def _fold_peak(self):
+        """Credit the peak since the last reset to every open stage, then reset it."""
+        _, peak = tracemalloc.get_traced_memory()
+        for stage in self._stack:
+            stage.peak = max(stage.peak, peak)
+        tracemalloc.reset_peak()
+
+    def _snapshot_peak(self):
+        """Snapshot traces for the open stages whose memory has grown past their last snapshot."""
+        current, _ = tracemalloc.get_traced_memory()
+        growing = []
+        for stage in self._stack:
+            growth = current - stage.start_bytes
+            if growth > max(stage.snapshot_growth * PEAK_GROWTH, stage.snapshot_growth + PEAK_MIN_STEP):
+                growing.append((stage, growth))
+        if growing:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            for stage, growth in growing:
+                stage.peak_snapshot = snapshot
+                stage.snapshot_growth = growth
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            stack = self._stack
+            if not stack or self._busy:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                stages = ';'.join(f"[{s.name}]" for s in list(stack))
+                self.stacks[f"{stages};{collapse(frame)}"] += 1
+            with self._lock:
+                if self._stack and not self._busy:
+                    self._snapshot_peak()
+
+    def stop(self):
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        tracemalloc.stop()
+
+    def top_functions(self, name, limit=TOP_N):
+        """Text table of the stage's functions by cumulative time."""
+        stats = self.stages[name].stats
+        if stats is None:
+            return ''
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def summary(self):
+        """Per-stage calls, seconds, peak MB and top allocating source lines (MB held at the peak)."""
+        return {
+            name: {
+                'calls': stage.calls,
+                'seconds': stage.seconds,
+                'peak_mb': stage.peak_bytes / 2 ** 20,
+                'top_allocators': [(line, size / 2 ** 20) for line, size in stage.allocations.most_common(TOP_N)]
+            }
+            for name, stage in self.stages.items()
+        }
+
+    def print_summary(self):
+        print("\nProfile (per stage):")
+        for name, stage in self.summary().items():
+            print(f"• {name}: {stage['seconds']:.2f} s, peak {stage['peak_mb']:.1f} MB ({stage['calls']} calls)")
+            for line, size in stage['top_allocators'][:5]:
+                print(f"    {size:8.2f} MB  {line}")
+
+    def report(self, run_name, output_dir=OUTPUT_DIR):
+        """
+        Stop sampling and write the profile of this run.
+
+        Writes <run_name>.folded (collapsed stacks for flamegraph.pl or speedscope),
+        <run_name>.<stage>.pstats (for snakeviz or pstats) and <run_name>.txt with the
+        top functions and allocators per stage.
+
+        Returns:
+            The path of the text summary, or None when profiling is disabled
+        """
+        if not self.enabled:
+            return None
+        self.stop()
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, run_name)
+
+        with open(f"{base}.folded", 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        lines = []
+        summary = self.summary()
+        for name, stage in self.stages.items():
+            if stage.stats is not None:
+                stage.stats.dump_stats(f"{base}.{name}.pstats")
+            info = summary[name]
+            lines.append(f"== {name}: {info['seconds']:.3f} s over {info['calls']} calls, "
+                         f"peak {info['peak_mb']:.1f} MB")
+            lines.append("Top allocators (MB held at the peak):")
+            lines.extend(f"  {size:10.3f}  {line}" for line, size in info['top_allocators'])
+            lines.append(self.top_functions(name))
+
+        with open(f"{base}.txt", 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        self.print_summary()
+        print(f"\nProfile written to {base}.txt, {base}.folded and {base}.<stage>.pstats")
+        return f"{base}.txt"
+
+
+# Shared profiler for the generator, trainer and predictor entry points
+profiler = Profiler()
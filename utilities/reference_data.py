@@ -0,0 +1,183 @@
+import hashlib
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+BASES_PATH = './datasets/ems/ems_bases.csv'
+HOSPITALS_PATH = './datasets/hospital/hospital_dataset (cleaned).csv'
+ARTIFACT_DIR = './cache/reference'
+
+# Bump when the compiled layout changes so old artifacts are rebuilt
+ARTIFACT_VERSION = 1
+
+BASE_COLUMNS = ['base_id', 'base_name', 'latitude', 'longitude', 'ambulances', 'rescues']
+HOSPITAL_COLUMNS = ['ID', 'Name', 'Address', 'Latitude', 'Longitude', 'Level', 'Has ER']
+
+# Source column spellings normalized on compile
+COLUMN_ALIASES = {'Longtitude': 'Longitude'}
+
+# Sanity bounds for coordinates (Philippines)
+LAT_RANGE = (4.0, 22.0)
+LON_RANGE = (116.0, 127.0)
+
+# Last load per source pair, with the size and mtime of its sources at that load
+_loaded = {}
+_lock = threading.Lock()
+
+
+def source_hash(*paths):
+    """SHA-1 over the contents of the source files."""
+    digest = hashlib.sha1(str(ARTIFACT_VERSION).encode())
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def source_stamp(*paths):
+    """Size and modification time of the source files; cheap to compare before hashing."""
+    stamp = []
+    for path in paths:
+        stat = os.stat(path)
+        stamp.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(stamp)
+
+
+def _check_coordinates(df, lat_column, lon_column, name):
+    bad = ~(df[lat_column].between(*LAT_RANGE) & df[lon_column].between(*LON_RANGE))
+    if bad.any():
+        raise ValueError(f"{name} with coordinates out of range: {df.loc[bad].iloc[:, 0].tolist()}")
+
+
+def compile_bases(path):
+    bases = pd.read_csv(path)
+    missing = [column for column in BASE_COLUMNS if column not in bases.columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+    bases = bases[BASE_COLUMNS]
+    if bases['base_id'].duplicated().any():
+        raise ValueError(f"{path} has duplicate base_id values")
+    if (bases[['ambulances', 'rescues']] < 0).any().any():
+        raise ValueError(f"{path} has negative vehicle counts")
+    _check_coordinates(bases, 'latitude', 'longitude', 'EMS bases')
+    bases = bases.astype({'base_id': int, 'latitude': float, 'longitude': float, 'ambulances': int, 'rescues': int})
+    return bases.to_dict('records')
+
+
+def compile_hospitals(path):
+    hospitals = pd.read_csv(path).rename(columns=COLUMN_ALIASES)
+    missing = [column for column in HOSPITAL_COLUMNS if column not in hospitals.columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+    hospitals = hospitals[HOSPITAL_COLUMNS]
+    if hospitals['ID'].duplicated().any():
+        raise ValueError(f"{path} has duplicate hospital IDs")
+    if not hospitals['Level'].isin([1, 2, 3]).all():
+        raise ValueError(f"{path} has hospital levels outside 1-3")
+    if not hospitals['Has ER'].isin(['Yes', 'No']).all():
+        raise ValueError(f"{path} has 'Has ER' values other than Yes/No")
+    _check_coordinates(hospitals, 'Latitude', 'Longitude', 'Hospitals')
+    return hospitals.astype({'ID': int, 'Latitude': float, 'Longitude': float, 'Level': int}).to_dict('records')
+
+
+class ReferenceData:
+    """
+    Validated EMS bases (with their fleet) and hospitals, shared by every script.
+
+    Coordinates are also kept as [lat, lon] arrays.
+    """
+
+    def __init__(self, bases, hospitals, digest=None):
+        self.bases = bases
+        self.hospitals = hospitals
+        self.digest = digest
+        self.base_coords = np.array([[b['latitude'], b['longitude']] for b in bases], dtype=float)
+        self.hospital_coords = np.array([[h['Latitude'], h['Longitude']] for h in hospitals], dtype=float)
+
+    @property
+    def fleet(self):
+        """Ambulances per base_id."""
+        return {base['base_id']: base['ambulances'] for base in self.bases}
+
+    @property
+    def rescues(self):
+        """Rescue vehicles per base_id."""
+        return {base['base_id']: base['rescues'] for base in self.bases}
+
+    def base_records(self):
+        """EMS bases as base_id, base_name, latitude and longitude dicts."""
+        return [{key: base[key] for key in ('base_id', 'base_name', 'latitude', 'longitude')} for base in self.bases]
+
+    def hospital_frame(self):
+        """Hospital table with a [lat, lon] 'location' column, as used by the predictor."""
+        frame = pd.DataFrame(self.hospitals, columns=HOSPITAL_COLUMNS)
+        frame['location'] = self.hospital_coords.tolist()
+        return frame
+
+    def hospital_records(self):
+        """Hospitals as lowercase id/level/has_er dicts with a location, as used by the generator."""
+        return [{
+            'id': h['ID'],
+            'Name': h['Name'],
+            'Address': h['Address'],
+            'level': h['Level'],
+            'location': [h['Latitude'], h['Longitude']],
+            'has_er': h['Has ER']
+        } for h in self.hospitals]
+
+
+def artifact_path_for(bases_path, hospitals_path):
+    """Compiled artifact location for a pair of source files (one per region)."""
+    key = hashlib.sha1(f"{os.path.abspath(bases_path)}|{os.path.abspath(hospitals_path)}".encode()).hexdigest()
+    return os.path.join(ARTIFACT_DIR, f"{key[:12]}.pkl")
+
+
+def load_reference_data(bases_path=None, hospitals_path=None, artifact_path=None):
+    """
+    Reference data for the given sources, compiling them only when they have changed.
+
+    The compiled artifact is reused while the SHA-1 of the source files matches, and
+    each process keeps the last load per source pair in memory. The sources are only
+    hashed again when their size or modification time has changed since that load.
+    """
+    bases_path = bases_path or BASES_PATH
+    hospitals_path = hospitals_path or HOSPITALS_PATH
+    artifact_path = artifact_path or artifact_path_for(bases_path, hospitals_path)
+    key = (bases_path, hospitals_path)
+    stamp = source_stamp(bases_path, hospitals_path)
+
+    with _lock:
+        cached, cached_stamp = _loaded.get(key, (None, None))
+        if cached is not None and cached_stamp == stamp:
+            return cached
+
+    digest = source_hash(bases_path, hospitals_path)
+    with _lock:
+        if cached is not None and cached.digest == digest:
+            # Touched but unchanged
+            _loaded[key] = (cached, stamp)
+            return cached
+
+        data = None
+        if os.path.exists(artifact_path):
+            try:
+                with open(artifact_path, 'rb') as f:
+                    compiled = pickle.load(f)
+                if compiled.get('digest') == digest:
+                    data = ReferenceData(compiled['bases'], compiled['hospitals'], digest)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                data = None
+
+        if data is None:
+            data = ReferenceData(compile_bases(bases_path), compile_hospitals(hospitals_path), digest)
+            os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+            temp_path = f"{artifact_path}.tmp{os.getpid()}"
+            with open(temp_path, 'wb') as f:
+                pickle.dump({'digest': digest, 'bases': data.bases, 'hospitals': data.hospitals}, f)
+            os.replace(temp_path, artifact_path)
+
+        _loaded[key] = (data, stamp)
+        return data
@@ -0,0 +1,201 @@
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from math import cos, radians, sqrt
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from predict_hospital import HospitalPredictor
+
+REGIONS_PATH = './datasets/regions.json'
+
+# Calls this close (km) to a region border are also predicted in the neighbouring regions
+BORDER_DISTANCE = 1.0
+
+
+def point_in_polygon(lat, lon, polygon):
+    """Ray casting test for a point against a polygon given as [[lat, lon], ...]."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            crossing = lon_i + (lat - lat_i) / (lat_j - lat_i) * (lon_j - lon_i)
+            if lon < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+def distance_to_segment(lat, lon, a, b):
+    """Distance (km) from a point to the segment a-b, on a local flat projection."""
+    scale = cos(radians(lat))
+    px, py = lon * scale * 111.32, lat * 110.57
+    ax, ay = a[1] * scale * 111.32, a[0] * 110.57
+    bx, by = b[1] * scale * 111.32, b[0] * 110.57
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length))
+    return sqrt((px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2)
+
+
+class Region:
+    """One city shard: its service polygon, data files and neighbouring regions."""
+
+    def __init__(self, name, polygon, paths=None, neighbors=None, shared_tables=None):
+        self.name = name
+        self.polygon = [list(map(float, point)) for point in polygon]
+        self.paths = paths or {}
+        self.neighbors = neighbors or []
+        self.shared_tables = shared_tables
+        lats = [point[0] for point in self.polygon]
+        lons = [point[1] for point in self.polygon]
+        self.bbox = {'lat_min': min(lats), 'lat_max': max(lats), 'lon_min': min(lons), 'lon_max': max(lons)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data['polygon'], data.get('paths'), data.get('neighbors'), data.get('shared_tables'))
+
+    def contains(self, lat, lon):
+        bbox = self.bbox
+        if not (bbox['lat_min'] <= lat <= bbox['lat_max'] and bbox['lon_min'] <= lon <= bbox['lon_max']):
+            return False
+        return point_in_polygon(lat, lon, self.polygon)
+
+    def border_distance(self, lat, lon):
+        """Distance (km) from the point to the nearest edge of the region polygon."""
+        edges = zip(self.polygon, self.polygon[1:] + self.polygon[:1])
+        return min(distance_to_segment(lat, lon, a, b) for a, b in edges)
+
+
+class RegionRegistry:
+    """
+    Routes calls to per-region predictors, loading each region's data on first use.
+
+    At most max_loaded predictors are kept in memory; the least recently used one is
+    dropped when another region has to be loaded.
+    """
+
+    def __init__(self, regions, api_key=None, model_variant='forest', max_loaded=None,
+                 border_distance=BORDER_DISTANCE):
+        self.regions = OrderedDict((region.name, region) for region in regions)
+        self.api_key = api_key
+        self.model_variant = model_variant
+        self.max_loaded = max_loaded
+        self.border_distance = border_distance
+        self.predictors = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=REGIONS_PATH, **kwargs):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        regions = [Region.from_dict(region) for region in data['regions']]
+        for region in regions:
+            unknown = [name for name in region.neighbors if name not in {r.name for r in regions}]
+            if unknown:
+                raise ValueError(f"Region {region.name} has unknown neighbours: {', '.join(unknown)}")
+        return cls(regions, **kwargs)
+
+    def locate(self, lat, lon):
+        """Region containing the point, or None if it is outside every region."""
+        return next((region for region in self.regions.values() if region.contains(lat, lon)), None)
+
+    def nearest(self, lat, lon, max_distance=None):
+        """Regions sorted by border distance, optionally only those within max_distance km."""
+        distances = [(0.0 if region.contains(lat, lon) else region.border_distance(lat, lon), region)
+                     for region in self.regions.values()]
+        distances.sort(key=lambda item: item[0])
+        return [region for distance, region in distances if max_distance is None or distance <= max_distance]
+
+    def predictor(self, name):
+        """
+        The region's HospitalPredictor, loading its models and data on first use.
+
+        The registry lock only guards lookups and inserts; a region is loaded outside it,
+        once, while other callers asking for the same region wait for that load.
+        """
+        with self.lock:
+            predictor = self.predictors.get(name)
+            if predictor is not None:
+                self.predictors.move_to_end(name)
+                return predictor
+            loading = self.loading.get(name)
+            owner = loading is None
+            if owner:
+                loading = self.loading[name] = Future()
+
+        if not owner:
+            return loading.result()
+
+        try:
+            predictor = self._load(name)
+        except BaseException as e:
+            with self.lock:
+                del self.loading[name]
+            loading.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.loading[name]
+            self.predictors[name] = predictor
+            if self.max_loaded is not None and len(self.predictors) > self.max_loaded:
+                _, evicted = self.predictors.popitem(last=False)
+                # Its shared tables are left attached: calls already holding the evicted
+                # predictor may still be reading them, and they are released with it
+                evicted.stop_model_watcher()
+        loading.set_result(predictor)
+        return predictor
+
+    def close(self):
+        """Close every loaded predictor; call when the registry is no longer serving."""
+        with self.lock:
+            predictors, self.predictors = list(self.predictors.values()), OrderedDict()
+        for predictor in predictors:
+            predictor.close()
+
+    def _load(self, name):
+        region = self.regions[name]
+        predictor = HospitalPredictor(model_variant=self.model_variant, bbox=region.bbox, paths=region.paths)
+        if not predictor.load_models_and_data(api_key=self.api_key, shared_tables=region.shared_tables):
+            raise RuntimeError(f"Failed to load models and data for region {name}")
+        return predictor
+
+    def candidate_regions(self, lat, lon):
+        """
+        Regions to search for a call: its own region plus any neighbour whose border is
+        within border_distance. A call outside every region goes to the nearest region.
+        """
+        home = self.locate(lat, lon)
+        if home is None:
+            nearest = self.nearest(lat, lon)
+            return nearest[:1]
+        candidates = [home]
+        for name in home.neighbors:
+            neighbor = self.regions[name]
+            if neighbor.border_distance(lat, lon) <= self.border_distance:
+                candidates.append(neighbor)
+        return candidates
+
+    def predict(self, lat, lon, severity, condition):
+        """
+        Predict with each candidate region's model and keep the fastest total response.
+
+        Returns:
+            The prediction result of the chosen region, with its 'region' name added
+        """
+        best = None
+        for region in self.candidate_regions(lat, lon):
+            result = dict(self.predictor(region.name).predict_for_location(lat, lon, severity, condition))
+            result['region'] = region.name
+            if best is None or result['time_components']['total_time'] < best['time_components']['total_time']:
+                best = result
+        if best is None:
+            raise ValueError("No regions configured")
+        return best
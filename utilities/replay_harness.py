@@ -0,0 +1,222 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from predict_hospital import HospitalPredictor
+from utilities.intake_queue import ThreadedIntake
+
+CALLS_PATH = './datasets/patient/marikina_patients_ml_full.csv'
+
+
+class InProcessTarget:
+    """
+    Runs the prediction path of a local HospitalPredictor, through its prediction cache if
+    enabled. Routes are timed at the call's recorded Call_Time, not at replay time.
+    """
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+
+    def __call__(self, call):
+        result = self.predictor.predict_for_location(
+            call['latitude'], call['longitude'], call['severity'], call['condition'],
+            call_time=call['Call_Time'].to_pydatetime()
+        )
+        return int(result['hospital_id'])
+
+
+class IntakeTarget:
+    """Submits each call to a micro-batching intake queue in front of a local HospitalPredictor."""
+
+    def __init__(self, predictor, **kwargs):
+        self.intake = ThreadedIntake(predictor, **kwargs)
+
+    def __call__(self, call):
+        incident = {key: call[key] for key in ('latitude', 'longitude', 'severity', 'condition')}
+        incident['call_time'] = call['Call_Time'].to_pydatetime()
+        return int(self.intake(incident)['ranking'][0]['hospital_id'])
+
+    def close(self):
+        self.intake.close()
+
+
+class HttpTarget:
+    """Posts each call as JSON to a prediction service that answers with a hospital_id."""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def __call__(self, call):
+        payload = {key: call[key] for key in ('latitude', 'longitude', 'severity', 'condition')}
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return int(response.json()['hospital_id'])
+
+
+def load_calls(path=CALLS_PATH, limit=None):
+    calls = pd.read_csv(path)
+    calls['Call_Time'] = pd.to_datetime(calls['Call_Time'])
+    calls = calls.sort_values('Call_Time', kind='stable')
+    if limit:
+        calls = calls.head(limit)
+    return calls.to_dict('records')
+
+
+def replay(calls, target, concurrency=4, speedup=60.0):
+    """
+    Replay calls through target, paced by their Call_Time.
+
+    Args:
+        calls: Call records sorted by Call_Time
+        target: Callable taking a call record and returning the predicted hospital ID
+        concurrency: Number of calls processed at the same time
+        speedup: How many times faster than real time to replay; 0 sends calls back to back
+
+    Returns:
+        Tuple of (per-call dicts with latency, schedule lag, predicted and recorded
+        hospital, total wall time in seconds)
+    """
+    results = [None] * len(calls)
+    first_call = calls[0]['Call_Time'] if calls else None
+    start = time.perf_counter()
+
+    def run(index, scheduled):
+        call = calls[index]
+        began = time.perf_counter()
+        try:
+            predicted, error = target(call), None
+        except Exception as e:
+            predicted, error = None, str(e)
+        finished = time.perf_counter()
+        results[index] = {
+            'patient_id': int(call['patient_id']),
+            'latency': finished - began,
+            'lag': began - scheduled,
+            'predicted_hospital_id': predicted,
+            'recorded_hospital_id': None if pd.isna(call['hospital_id']) else int(call['hospital_id']),
+            'error': error
+        }
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index, call in enumerate(calls):
+            offset = 0.0
+            if speedup:
+                offset = (call['Call_Time'] - first_call).total_seconds() / speedup
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(run, index, start + offset)
+
+    return results, time.perf_counter() - start
+
+
+def summarize(calls, wall_time):
+    """Throughput, latency percentiles (ms) and divergence from the recorded hospitals."""
+    completed = [r for r in calls if r['error'] is None]
+    latencies = np.array([r['latency'] for r in completed]) * 1000
+    lags = np.array([r['lag'] for r in calls]) * 1000
+    compared = [r for r in completed if r['recorded_hospital_id'] is not None]
+    diverged = sum(1 for r in compared if r['predicted_hospital_id'] != r['recorded_hospital_id'])
+
+    return {
+        'calls': len(calls),
+        'errors': len(calls) - len(completed),
+        'wall_time_s': wall_time,
+        'throughput_per_s': len(completed) / wall_time if wall_time else 0.0,
+        'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        'latency_p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        'schedule_lag_p99_ms': float(np.percentile(lags, 99)) if len(lags) else 0.0,
+        'divergence_pct': diverged / len(compared) * 100 if compared else 0.0
+    }
+
+
+def compare_decisions(results, path):
+    """Count calls whose prediction differs from a previously saved replay."""
+    with open(path) as f:
+        previous = {int(k): v for k, v in json.load(f).items()}
+    return sum(1 for r in results
+               if r['patient_id'] in previous and previous[r['patient_id']] != r['predicted_hospital_id'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay historical calls through the hospital predictor.')
+    parser.add_argument('--calls', default=CALLS_PATH, help='CSV of historical calls')
+    parser.add_argument('--limit', type=int, help='only replay the first N calls')
+    parser.add_argument('--speedup', type=float, default=60.0, help='replay speed-up factor (0 = no pacing)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--url', help='replay against a prediction service instead of in-process')
+    parser.add_argument('--model', default='forest', choices=list(HospitalPredictor.MODEL_PATHS),
+                        help='serving model for in-process replays')
+    parser.add_argument('--cache', action='store_true',
+                        help='serve repeated calls from the prediction cache (decisions may differ)')
+    parser.add_argument('--intake', action='store_true',
+                        help='batch concurrent calls through the intake queue (rank_hospitals_batch)')
+    parser.add_argument('--max-wait', type=float, default=5.0, help='intake batching window in ms')
+    parser.add_argument('--save-decisions', help='write predicted hospital per patient_id to this JSON file')
+    parser.add_argument('--compare-decisions', help='report calls whose decision differs from this JSON file')
+    args = parser.parse_args()
+
+    calls = load_calls(args.calls, args.limit)
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        predictor = HospitalPredictor(model_variant=args.model)
+        if not predictor.load_models_and_data():
+            print("Failed to load required models and data. Exiting.")
+            return
+        if not args.cache:
+            predictor.prediction_cache.max_entries = 0
+        if args.intake:
+            target = IntakeTarget(predictor, max_wait=args.max_wait / 1000)
+        else:
+            target = InProcessTarget(predictor)
+
+    print(f"Replaying {len(calls)} calls at {args.speedup}x with concurrency {args.concurrency}...")
+    # The predictor prints progress for every call; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        results, wall_time = replay(calls, target, concurrency=args.concurrency, speedup=args.speedup)
+    if isinstance(target, IntakeTarget):
+        target.close()
+    if not args.url:
+        predictor.close()
+
+    summary = summarize(results, wall_time)
+    print("\n=== Replay Results ===")
+    for key, value in summary.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+    if isinstance(target, IntakeTarget):
+        stats = target.intake.queue.stats
+        print(f"intake_batches: {stats['batches']} (mean size {stats['calls'] / max(stats['batches'], 1):.1f}, "
+              f"{stats['shed']} shed, {stats['rejected']} rejected)")
+    elif args.cache and not args.url:
+        cache = predictor.prediction_cache.stats()
+        print(f"prediction_cache_hit_rate: {cache['hit_rate'] * 100:.2f}% "
+              f"({cache['hits']} hits, {cache['evictions']} evictions)")
+
+    if args.compare_decisions:
+        changed = compare_decisions(results, args.compare_decisions)
+        print(f"decisions_changed: {changed}")
+    if args.save_decisions:
+        with open(args.save_decisions, 'w') as f:
+            json.dump({r['patient_id']: r['predicted_hospital_id'] for r in results}, f)
+        print(f"Decisions saved to {args.save_decisions}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import heapq
+import json
+import os
+import time
+
+import numpy as np
+
+from utilities.travel_time import ROAD_CLASSES, FREE_FLOW_SPEED
+
+# Points further than this (km) from the nearest road node are not routed on the graph
+MAX_SNAP_DISTANCE = 0.3
+
+# OSM highway values mapped onto the speed profile road classes
+HIGHWAY_CLASSES = {
+    'motorway': 'primary',
+    'trunk': 'primary',
+    'primary': 'primary',
+    'secondary': 'secondary',
+    'tertiary': 'tertiary',
+    'unclassified': 'residential',
+    'residential': 'residential',
+    'living_street': 'residential',
+    'service': 'residential'
+}
+
+ONEWAY_VALUES = {'yes', '1', 'true'}
+
+
+def road_class_of(tags):
+    """Speed profile road class index for an OSM way, or None if it is not drivable."""
+    highway = tags.get('highway', '')
+    if highway.endswith('_link'):
+        highway = highway[:-len('_link')]
+    road_class = HIGHWAY_CLASSES.get(highway)
+    return None if road_class is None else ROAD_CLASSES.index(road_class)
+
+
+def equirectangular_km(lat1, lon1, lat2, lon2):
+    """Fast distance approximation (km), accurate to well under 1% at city scale."""
+    x = np.radians(lon2 - lon1) * np.cos(np.radians((lat1 + lat2) / 2))
+    y = np.radians(lat2 - lat1)
+    return 6371 * np.sqrt(x * x + y * y)
+
+
+class RoadGraph:
+    """
+    Directed road graph built from cached Overpass way/node elements.
+
+    Edges carry length (km) and free-flow travel time (minutes) from the road class of
+    their way, so routes work fully offline.
+    """
+
+    def __init__(self, coords, adjacency, node_ids=None):
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.adjacency = adjacency  # per node: list of (target, minutes, km)
+        self.node_ids = node_ids if node_ids is not None else list(range(len(self.coords)))
+
+    @classmethod
+    def from_overpass(cls, elements):
+        positions = {e['id']: (e['lat'], e['lon']) for e in elements if e['type'] == 'node' and 'lat' in e}
+        index = {}
+        coords = []
+        adjacency = []
+
+        def node(osm_id):
+            if osm_id not in index:
+                index[osm_id] = len(coords)
+                coords.append(positions[osm_id])
+                adjacency.append([])
+            return index[osm_id]
+
+        for element in elements:
+            if element['type'] != 'way':
+                continue
+            tags = element.get('tags', {})
+            road_class = road_class_of(tags)
+            if road_class is None:
+                continue
+            oneway = tags.get('oneway', '')
+            forward = oneway != '-1'
+            backward = oneway == '-1' or (oneway not in ONEWAY_VALUES and tags.get('junction') != 'roundabout')
+            speed = FREE_FLOW_SPEED[road_class]
+
+            way_nodes = [n for n in element.get('nodes', []) if n in positions]
+            for a, b in zip(way_nodes, way_nodes[1:]):
+                u, v = node(a), node(b)
+                km = float(equirectangular_km(*coords[u], *coords[v]))
+                minutes = km / speed * 60
+                if forward:
+                    adjacency[u].append((v, minutes, km))
+                if backward:
+                    adjacency[v].append((u, minutes, km))
+
+        node_ids = [None] * len(index)
+        for osm_id, i in index.items():
+            node_ids[i] = osm_id
+        return cls(coords, adjacency, node_ids)
+
+    @classmethod
+    def from_cache(cls, cache_dir='./cache'):
+        """Build the graph from every cached Overpass response that contains roads."""
+        elements = []
+        if os.path.isdir(cache_dir):
+            for name in sorted(os.listdir(cache_dir)):
+                if not name.endswith('.json'):
+                    continue
+                with open(os.path.join(cache_dir, name), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict) and any(
+                        e.get('type') == 'way' and 'highway' in e.get('tags', {}) for e in data.get('elements', [])):
+                    elements.extend(data['elements'])
+        return cls.from_overpass(elements)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def nearest_node(self, point):
+        """Index of and distance (km) to the graph node nearest to [lat, lon]."""
+        if not len(self.coords):
+            return None, float('inf')
+        distances = equirectangular_km(point[0], point[1], self.coords[:, 0], self.coords[:, 1])
+        index = int(distances.argmin())
+        return index, float(distances[index])
+
+    def shortest_path(self, source, target, deadline=None):
+        """
+        Dijkstra on travel time. Returns (minutes, km) or None if target is unreachable.
+
+        With a deadline (a time.perf_counter() value) the search gives up, returning None,
+        once it has passed.
+        """
+        best = {source: 0.0}
+        lengths = {source: 0.0}
+        queue = [(0.0, source)]
+        while queue:
+            minutes, u = heapq.heappop(queue)
+            if u == target:
+                return minutes, lengths[u]
+            if minutes > best[u]:
+                continue
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            for v, edge_minutes, edge_km in self.adjacency[u]:
+                candidate = minutes + edge_minutes
+                if candidate < best.get(v, float('inf')):
+                    best[v] = candidate
+                    lengths[v] = lengths[u] + edge_km
+                    heapq.heappush(queue, (candidate, v))
+        return None
+
+    def route(self, start, end, max_snap=MAX_SNAP_DISTANCE, deadline=None):
+        """
+        Free-flow road distance (km) and time (minutes) between two [lat, lon] points.
+
+        Both points are snapped to their nearest node and the snap legs are driven at
+        residential speed. Returns None when either point is off the graph, no path exists
+        or the search runs past deadline (see shortest_path).
+        """
+        source, source_km = self.nearest_node(start)
+        target, target_km = self.nearest_node(end)
+        if source is None or source_km > max_snap or target_km > max_snap:
+            return None
+        path = self.shortest_path(source, target, deadline)
+        if path is None:
+            return None
+        snap_km = source_km + target_km
+        minutes, km = path
+        return km + snap_km, minutes + snap_km / FREE_FLOW_SPEED[-1] * 60
@@ -0,0 +1,211 @@
+import argparse
+import json
+import math
+import os
+import sys
+import webbrowser
+
+import folium
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'datasets', 'patient'))
+
+import generate_patient_ml as generator
+from utilities.polyline_store import PolylineStore
+
+TRIPS_PATH = './datasets/patient/marikina_patients_ml_full.csv'
+OUTPUT_PATH = './utilities/route_export'
+
+# Leg roles counted on every segment, with their map colors
+ROLES = {'to_patient': 'red', 'actual': 'blue', 'predicted': 'purple'}
+
+
+def load_trips(path=TRIPS_PATH, decisions=None, limit=None):
+    """
+    Historical trips with their recorded hospital and, optionally, a predicted one.
+
+    Args:
+        path: Patient CSV with patient_id, coordinates, hospital_id and ems_base_id
+        decisions: Optional JSON file of predicted hospital per patient_id, as written by
+            replay_harness.py --save-decisions
+        limit: Only keep the first N trips
+    """
+    trips = pd.read_csv(path).dropna(subset=['hospital_id'])
+    if limit:
+        trips = trips.head(limit)
+    predicted = {}
+    if decisions:
+        with open(decisions, 'r') as f:
+            predicted = {int(k): v for k, v in json.load(f).items()}
+    trips = trips.to_dict('records')
+    for trip in trips:
+        trip['predicted_hospital_id'] = predicted.get(int(trip['patient_id']))
+    return trips
+
+
+def _point_key(point):
+    return round(float(point[0]), 5), round(float(point[1]), 5)
+
+
+class SegmentCollector:
+    """
+    Deduplicates route segments shared by many trips.
+
+    Leg geometries come only from the local polyline store; a leg missing from the store
+    is drawn as a straight line, so export time never depends on routing requests.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.segments = {}
+        self.cached_legs = 0
+        self.fallback_legs = 0
+
+    def add_leg(self, start, end, role):
+        stored = self.store.get(start, end)
+        if stored is not None:
+            points = stored['points']
+            self.cached_legs += 1
+        else:
+            points = [start, end]
+            self.fallback_legs += 1
+
+        keys = [_point_key(point) for point in points]
+        for a, b in zip(keys, keys[1:]):
+            if a == b:
+                continue
+            segment = self.segments.setdefault(tuple(sorted((a, b))), dict.fromkeys(ROLES, 0))
+            segment[role] += 1
+
+    def features(self):
+        for (a, b), counts in self.segments.items():
+            yield {
+                'type': 'Feature',
+                'geometry': {'type': 'LineString', 'coordinates': [[a[1], a[0]], [b[1], b[0]]]},
+                'properties': {**counts, 'trips': sum(counts.values())}
+            }
+
+
+def build_collection(trips, store, bases=None, hospitals=None):
+    """
+    Build one GeoJSON FeatureCollection for all trips.
+
+    Contains a LineString per unique segment with how many legs of each role use it, and a
+    Point per EMS base and hospital with its trip counts.
+    """
+    bases = {base['base_id']: base for base in (bases or generator.EMS_BASES)}
+    hospitals = {hospital['id']: hospital for hospital in (hospitals or generator.hospitals)}
+    collector = SegmentCollector(store)
+    base_trips = dict.fromkeys(bases, 0)
+    hospital_trips = {hospital_id: {'actual': 0, 'predicted': 0} for hospital_id in hospitals}
+
+    for trip in trips:
+        patient = [trip['latitude'], trip['longitude']]
+        base = bases.get(trip['ems_base_id'])
+        if base is not None:
+            collector.add_leg([base['latitude'], base['longitude']], patient, 'to_patient')
+            base_trips[base['base_id']] += 1
+
+        actual = int(trip['hospital_id'])
+        collector.add_leg(patient, hospitals[actual]['location'], 'actual')
+        hospital_trips[actual]['actual'] += 1
+
+        predicted = trip.get('predicted_hospital_id')
+        if predicted is not None and int(predicted) != actual:
+            collector.add_leg(patient, hospitals[int(predicted)]['location'], 'predicted')
+            hospital_trips[int(predicted)]['predicted'] += 1
+
+    features = list(collector.features())
+    for base_id, base in bases.items():
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [base['longitude'], base['latitude']]},
+            'properties': {'kind': 'ems_base', 'id': base_id, 'name': base['base_name'], 'trips': base_trips[base_id]}
+        })
+    for hospital_id, hospital in hospitals.items():
+        lat, lon = hospital['location']
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {'kind': 'hospital', 'id': hospital_id, 'name': hospital['Name'], **hospital_trips[hospital_id]}
+        })
+
+    return {
+        'type': 'FeatureCollection',
+        'features': features,
+        'properties': {
+            'trips': len(trips),
+            'segments': len(collector.segments),
+            'cached_legs': collector.cached_legs,
+            'fallback_legs': collector.fallback_legs
+        }
+    }
+
+
+def segment_style(feature):
+    """Color a segment by its most common role and widen it with the number of trips."""
+    counts = {role: feature['properties'][role] for role in ROLES}
+    role = max(counts, key=counts.get)
+    return {
+        'color': ROLES[role],
+        'weight': 1 + 1.5 * math.log1p(feature['properties']['trips']),
+        'opacity': 0.6
+    }
+
+
+def render_map(collection):
+    """Lightweight map: one GeoJSON layer for all segments plus circle markers for sites."""
+    lines = [f for f in collection['features'] if f['geometry']['type'] == 'LineString']
+    sites = [f for f in collection['features'] if f['geometry']['type'] == 'Point']
+    lats = [f['geometry']['coordinates'][1] for f in sites]
+    lons = [f['geometry']['coordinates'][0] for f in sites]
+
+    m = folium.Map(location=[sum(lats) / len(lats), sum(lons) / len(lons)], zoom_start=13, tiles="OpenStreetMap")
+    folium.GeoJson({'type': 'FeatureCollection', 'features': lines}, name="Routes",
+                   style_function=segment_style).add_to(m)
+
+    for site in sites:
+        lon, lat = site['geometry']['coordinates']
+        props = site['properties']
+        if props['kind'] == 'ems_base':
+            popup = f"{props['name']}<br>Trips: {props['trips']}"
+            color = 'red'
+        else:
+            popup = f"{props['name']}<br>Actual: {props['actual']}<br>Predicted: {props['predicted']}"
+            color = 'green'
+        folium.CircleMarker(location=[lat, lon], radius=6, color=color, fill=True, popup=popup).add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export many historical trips as one GeoJSON file and map.')
+    parser.add_argument('--trips', default=TRIPS_PATH, help='patient CSV with recorded assignments')
+    parser.add_argument('--decisions', help='JSON of predicted hospital per patient_id (replay_harness.py --save-decisions)')
+    parser.add_argument('--limit', type=int, default=500, help='number of trips to export (0 = all)')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='output path without extension')
+    parser.add_argument('--open', action='store_true', help='open the map in a web browser')
+    args = parser.parse_args()
+
+    trips = load_trips(args.trips, args.decisions, args.limit)
+    collection = build_collection(trips, PolylineStore())
+
+    with open(f"{args.output}.geojson", 'w') as f:
+        json.dump(collection, f)
+    map_file = f"{args.output}.html"
+    render_map(collection).save(map_file)
+
+    stats = collection['properties']
+    print(f"Exported {stats['trips']} trips as {stats['segments']} unique segments "
+          f"({stats['cached_legs']} legs from the route store, {stats['fallback_legs']} straight-line)")
+    print(f"GeoJSON: {args.output}.geojson")
+    print(f"Map: {map_file}")
+    if args.open:
+        webbrowser.open('file://' + os.path.realpath(map_file))
+
+
+if __name__ == "__main__":
+    main()
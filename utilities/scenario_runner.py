@@ -0,0 +1,218 @@
+import argparse
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'datasets', 'patient'))
+
+import generate_patient_ml as generator
+from predict_hospital import DistanceCalculator
+from utilities.feature_pipeline import DISPATCH_TIME, ON_SCENE_TIME, HANDOVER_TIME
+from utilities.shared_tables import CELL_SIZE, SharedArrays, build_distance_tables, grid_cell
+from utilities.travel_time import road_distance_estimate
+
+SEVERITIES = ['low', 'medium', 'high']
+MIN_LEVEL = np.array([1, 3, 3])
+
+# Read-only views of the parent's shared memory tables, attached once per worker process
+_shared = None
+_tables = None
+
+
+def scenario_tables(bbox=generator.MARIKINA_BBOX, cell_size=CELL_SIZE):
+    """
+    Precompute road-corrected distances from every grid cell to every base and hospital.
+
+    Returns:
+        Dict of read-only NumPy arrays shared by all simulations
+    """
+    base_coords = [[b['latitude'], b['longitude']] for b in generator.EMS_BASES]
+    hospital_coords = [h['location'] for h in generator.hospitals]
+    tables = build_distance_tables(DistanceCalculator(), bbox, base_coords, hospital_coords, cell_size)
+    tables['base_km'] = road_distance(tables['base_km'])
+    tables['hospital_km'] = road_distance(tables['hospital_km'])
+    tables['base_ids'] = np.array([b['base_id'] for b in generator.EMS_BASES])
+    tables['hospital_level'] = np.array([h['level'] for h in generator.hospitals])
+    for array in tables.values():
+        array.setflags(write=False)
+    return tables
+
+
+def road_distance(direct_distance):
+    """The generator's straight-line to road distance correction, as float32."""
+    return road_distance_estimate(direct_distance).astype(np.float32)
+
+
+def simulate(scenario, seed, tables):
+    """
+    Run one seeded dispatch simulation.
+
+    Calls arrive at random intervals and take the closest free ambulance, or wait for the
+    first one to come back. Patients go to the closest hospital of the required level
+    (low severity prefers Level 1 hospitals 70% of the time), as in the dataset generator.
+
+    Returns:
+        Dict of float32 arrays: wait, arrival (call to EMS on scene) and response minutes
+    """
+    rng = np.random.default_rng(seed)
+    n = scenario['num_calls']
+    bbox = generator.MARIKINA_BBOX
+    low, high = scenario['call_interval']
+    call_times = np.cumsum(rng.integers(low, high, n)).astype(float)
+    weights = scenario['severity_weights']
+    severities = rng.choice(3, n, p=[weights[s] for s in SEVERITIES])
+    cells = grid_cell(tables, rng.uniform(bbox['lat_min'], bbox['lat_max'], n),
+                      rng.uniform(bbox['lon_min'], bbox['lon_max'], n))
+    prefer_level_1 = rng.random(n) < 0.7
+
+    base_index = {base_id: i for i, base_id in enumerate(tables['base_ids'])}
+    unit_base = np.array([base_index[base_id] for base_id, count in scenario['fleet'].items() for _ in range(count)])
+    unit_free = np.zeros(len(unit_base))
+    levels = tables['hospital_level']
+    start_hour = generator.START_TIME.hour + generator.START_TIME.minute / 60
+    profile = generator.SPEED_PROFILE
+
+    def travel_time(distance, hour):
+        if generator.USE_SPEED_PROFILES:
+            return profile.travel_time(distance, hour)
+        return distance / generator.AVERAGE_SPEED * 60
+
+    waits = np.zeros(n, dtype=np.float32)
+    arrivals = np.zeros(n, dtype=np.float32)
+    responses = np.zeros(n, dtype=np.float32)
+    for i in range(n):
+        call_time = call_times[i]
+        departure = max(call_time, unit_free.min())
+        distances = np.where(unit_free <= departure, tables['base_km'][cells[i], unit_base], np.inf)
+        unit = int(distances.argmin())
+        time_to_patient = travel_time(distances[unit], int(start_hour + departure / 60))
+
+        eligible = levels >= MIN_LEVEL[severities[i]]
+        if severities[i] == 0 and prefer_level_1[i] and (levels == 1).any():
+            eligible = levels == 1
+        distance_to_hospital = tables['hospital_km'][cells[i]][eligible].min()
+        transport_start = departure + DISPATCH_TIME + time_to_patient + ON_SCENE_TIME
+        time_to_hospital = travel_time(distance_to_hospital, int(start_hour + transport_start / 60))
+
+        busy_until = transport_start + time_to_hospital + HANDOVER_TIME
+        unit_free[unit] = busy_until
+        waits[i] = departure - call_time
+        arrivals[i] = waits[i] + DISPATCH_TIME + time_to_patient
+        responses[i] = busy_until - call_time
+
+    return {'wait': waits, 'arrival': arrivals, 'response': responses}
+
+
+def _init_worker(spec):
+    global _shared, _tables
+    _shared = SharedArrays.attach(spec)
+    _tables = _shared.arrays
+
+
+def _run_task(task):
+    scenario_index, scenario, seed = task
+    return scenario_index, simulate(scenario, seed, _tables)
+
+
+def build_scenarios(fleets, call_intervals, severity_mixes, num_calls):
+    """Cartesian product of fleet configurations, call rates and severity mixes."""
+    scenarios = []
+    for (fleet_name, fleet), interval, (mix_name, mix) in itertools.product(
+            fleets.items(), call_intervals, severity_mixes.items()):
+        scenarios.append({
+            'name': f"{fleet_name} | every {interval[0]}-{interval[1]} min | {mix_name}",
+            'fleet': fleet,
+            'call_interval': interval,
+            'severity_weights': mix,
+            'num_calls': num_calls
+        })
+    return scenarios
+
+
+def run_scenarios(scenarios, runs=20, workers=None, seed=42):
+    """
+    Run every scenario `runs` times across a process pool and aggregate the results.
+
+    Returns:
+        DataFrame with one row per scenario and response-time distribution statistics
+    """
+    shared = SharedArrays.create(scenario_tables())
+    tasks = [(i, scenario, seed + run) for i, scenario in enumerate(scenarios) for run in range(runs)]
+    collected = {i: [] for i in range(len(scenarios))}
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared.spec,)) as executor:
+            for scenario_index, result in executor.map(_run_task, tasks, chunksize=max(1, len(tasks) // 64)):
+                collected[scenario_index].append(result)
+    finally:
+        shared.close()
+
+    rows = []
+    for i, scenario in enumerate(scenarios):
+        results = collected[i]
+        arrival = np.concatenate([r['arrival'] for r in results])
+        response = np.concatenate([r['response'] for r in results])
+        wait = np.concatenate([r['wait'] for r in results])
+        run_means = [r['arrival'].mean() for r in results]
+        rows.append({
+            'scenario': scenario['name'],
+            'ambulances': sum(scenario['fleet'].values()),
+            'runs': len(results),
+            'arrival_mean': arrival.mean(),
+            'arrival_mean_std': np.std(run_means),
+            'arrival_p50': np.percentile(arrival, 50),
+            'arrival_p90': np.percentile(arrival, 90),
+            'arrival_p99': np.percentile(arrival, 99),
+            'response_p50': np.percentile(response, 50),
+            'response_p90': np.percentile(response, 90),
+            'wait_mean': wait.mean(),
+            'calls_waiting_pct': (wait > 0).mean() * 100
+        })
+    return pd.DataFrame(rows)
+
+
+def default_sweep():
+    """Current fleet, one extra ambulance per base, and the fleet without a second unit."""
+    fleets = {'current': dict(generator.DEFAULT_FLEET)}
+    for base_id in generator.DEFAULT_FLEET:
+        fleet = dict(generator.DEFAULT_FLEET)
+        fleet[base_id] += 1
+        fleets[f"+1 at {base_id}"] = fleet
+    fleets['one per base'] = {base_id: 1 for base_id in generator.DEFAULT_FLEET}
+
+    call_intervals = [(5, 15), (2, 8)]
+    severity_mixes = {
+        'normal mix': generator.SEVERITY_WEIGHTS,
+        'surge mix': {'low': 0.3, 'medium': 0.3, 'high': 0.4}
+    }
+    return fleets, call_intervals, severity_mixes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo fleet sizing over EMS dispatch scenarios.')
+    parser.add_argument('--runs', type=int, default=20, help='seeded simulations per scenario')
+    parser.add_argument('--calls', type=int, default=2000, help='calls per simulation')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='./datasets/ems/scenario_results.csv')
+    args = parser.parse_args()
+
+    fleets, call_intervals, severity_mixes = default_sweep()
+    scenarios = build_scenarios(fleets, call_intervals, severity_mixes, args.calls)
+    print(f"Running {len(scenarios)} scenarios x {args.runs} runs...")
+
+    results = run_scenarios(scenarios, runs=args.runs, workers=args.workers, seed=args.seed)
+    results = results.sort_values('arrival_p90')
+    results.to_csv(args.output, index=False)
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
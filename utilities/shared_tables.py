@@ -0,0 +1,202 @@
+import json
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Byte alignment of each array inside the shared block
+ALIGNMENT = 64
+
+# Grid resolution (degrees, about 55m) of the precomputed distance tables
+CELL_SIZE = 0.0005
+
+
+def open_untracked(name):
+    """
+    Open an existing shared memory block without handing it to this process's resource
+    tracker, which would unlink it when the process exits. Only the creator unlinks it.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 opening a block always registers it with the tracker
+        handle = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(handle._name, 'shared_memory')
+        return handle
+
+
+class SharedArrays:
+    """
+    A set of NumPy arrays packed into one shared memory block or memory-mapped file.
+
+    The parent process calls create() once; workers call attach(spec) and get read-only
+    zero-copy views, so memory stays flat as the number of workers grows.
+    """
+
+    def __init__(self, arrays, spec, handle=None, owner=False):
+        self.arrays = arrays
+        self.spec = spec
+        self._handle = handle
+        self._owner = owner
+        self._owner_handle = None
+
+    @classmethod
+    def create(cls, arrays, path=None):
+        """
+        Pack arrays into shared memory, or into the file at path if given.
+
+        Returns:
+            SharedArrays owned by the caller; pass .spec (picklable) to workers
+        """
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            layout[name] = {'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.str}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        size = max(offset, 1)
+
+        if path is None:
+            handle = shared_memory.SharedMemory(create=True, size=size)
+            buffer = handle.buf
+            spec = {'shm_name': handle.name, 'layout': layout}
+        else:
+            handle = np.memmap(path, dtype=np.uint8, mode='w+', shape=(size,))
+            buffer = handle
+            spec = {'path': os.path.abspath(path), 'size': size, 'layout': layout}
+            with open(path + '.json', 'w') as f:
+                json.dump(spec, f)
+
+        for name, array in arrays.items():
+            entry = layout[name]
+            view = np.ndarray(entry['shape'], dtype=entry['dtype'], buffer=buffer, offset=entry['offset'])
+            view[...] = array
+
+        if path is None:
+            # The owner serves from its own (tracked) handle rather than attaching again
+            shared = cls(cls._views(layout, buffer), spec, handle)
+        else:
+            handle.flush()
+            shared = cls.attach(spec)
+        shared._owner_handle = handle
+        shared._owner = True
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        """Attach to arrays created by another process; spec may also be a .json spec path."""
+        if isinstance(spec, str):
+            with open(spec) as f:
+                spec = json.load(f)
+
+        if 'shm_name' in spec:
+            handle = open_untracked(spec['shm_name'])
+            buffer = handle.buf
+        else:
+            handle = np.memmap(spec['path'], dtype=np.uint8, mode='r', shape=(spec['size'],))
+            buffer = handle
+        return cls(cls._views(spec['layout'], buffer), spec, handle)
+
+    @staticmethod
+    def _views(layout, buffer):
+        arrays = {}
+        for name, entry in layout.items():
+            view = np.ndarray(entry['shape'], dtype=entry['dtype'], buffer=buffer, offset=entry['offset'])
+            view.flags.writeable = False
+            arrays[name] = view
+        return arrays
+
+    def close(self):
+        """Detach this process; the owner also frees the shared block."""
+        self.arrays = {}
+        if isinstance(self._handle, shared_memory.SharedMemory):
+            self._handle.close()
+            if self._owner:
+                self._owner_handle.unlink()
+        self._handle = None
+
+
+def flatten_forest(model):
+    """
+    Flatten a fitted scikit-learn forest (or single tree) into plain node arrays.
+
+    Node indices are global across trees; leaves have left == -1 and value holds the
+    normalized class probabilities of each node.
+    """
+    estimators = getattr(model, 'estimators_', [model])
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        roots.append(offset)
+        features.append(tree.feature.astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        lefts.append(np.where(left >= 0, left + offset, -1))
+        rights.append(np.where(right >= 0, right + offset, -1))
+        value = tree.value[:, 0, :].astype(np.float32)
+        values.append(value / value.sum(axis=1, keepdims=True))
+        offset += tree.node_count
+
+    return {
+        'forest_feature': np.concatenate(features),
+        'forest_threshold': np.concatenate(thresholds),
+        'forest_left': np.concatenate(lefts),
+        'forest_right': np.concatenate(rights),
+        'forest_value': np.concatenate(values),
+        'forest_roots': np.array(roots, dtype=np.int32),
+        'forest_classes': np.asarray(model.classes_)
+    }
+
+
+class FlatForestModel:
+    """Predicts from flattened forest arrays with the same interface as the scikit-learn model."""
+
+    def __init__(self, arrays):
+        self.feature = arrays['forest_feature']
+        self.threshold = arrays['forest_threshold']
+        self.left = arrays['forest_left']
+        self.right = arrays['forest_right']
+        self.value = arrays['forest_value']
+        self.roots = arrays['forest_roots']
+        self.classes_ = arrays['forest_classes']
+
+    def predict_proba(self, X):
+        # scikit-learn compares float32 features against the split thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        active = self.left[nodes] >= 0
+        while active.any():
+            current = nodes[active]
+            goes_left = X[np.broadcast_to(rows, nodes.shape)[active], self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(goes_left, self.left[current], self.right[current])
+            active = self.left[nodes] >= 0
+        return self.value[nodes].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def build_distance_tables(distance_calculator, bbox, base_coords, hospital_coords, cell_size=CELL_SIZE):
+    """Straight-line distances (km) from the center of every grid cell to every base and hospital."""
+    rows = int(np.ceil((bbox['lat_max'] - bbox['lat_min']) / cell_size))
+    cols = int(np.ceil((bbox['lon_max'] - bbox['lon_min']) / cell_size))
+    lat = bbox['lat_min'] + (np.arange(rows) + 0.5) * cell_size
+    lon = bbox['lon_min'] + (np.arange(cols) + 0.5) * cell_size
+    centers = np.column_stack([np.repeat(lat, cols), np.tile(lon, rows)])
+    return {
+        'base_km': distance_calculator.haversine_matrix(centers, base_coords).astype(np.float32),
+        'hospital_km': distance_calculator.haversine_matrix(centers, hospital_coords).astype(np.float32),
+        'grid': np.array([bbox['lat_min'], bbox['lon_min'], cell_size, rows, cols])
+    }
+
+
+def grid_cell(arrays, latitude, longitude):
+    """Index of the distance table row covering a coordinate (or arrays of coordinates)."""
+    lat_min, lon_min, cell_size, rows, cols = arrays['grid']
+    row = np.clip(np.floor_divide(np.asarray(latitude) - lat_min, cell_size).astype(int), 0, int(rows) - 1)
+    col = np.clip(np.floor_divide(np.asarray(longitude) - lon_min, cell_size).astype(int), 0, int(cols) - 1)
+    cell = row * int(cols) + col
+    return int(cell) if np.ndim(cell) == 0 else cell
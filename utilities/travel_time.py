@@ -0,0 +1,112 @@
+import numpy as np
+from datetime import datetime
+
+ROAD_CLASSES = ['primary', 'secondary', 'tertiary', 'residential']
+
+# Free-flow speed per road class (km/h)
+FREE_FLOW_SPEED = [50, 40, 35, 25]
+
+# How strongly each road class slows down in traffic (1 = fully affected)
+CONGESTION_SENSITIVITY = [1.0, 0.9, 0.8, 0.5]
+
+# Fraction of free-flow speed on a fully affected road for each hour of the day,
+# with the Marikina morning (7-9) and evening (17-19) rush hours
+HOURLY_CONGESTION = [
+    1.00, 1.00, 1.00, 1.00, 1.00, 0.95,  # 00:00 - 05:00
+    0.80, 0.60, 0.55, 0.70, 0.80, 0.80,  # 06:00 - 11:00
+    0.75, 0.80, 0.80, 0.75, 0.65, 0.55,  # 12:00 - 17:00
+    0.50, 0.60, 0.75, 0.85, 0.90, 0.95   # 18:00 - 23:00
+]
+
+# Straight-line trips shorter than these distances (km) are assumed to mostly use
+# residential, tertiary and secondary roads respectively, longer trips primary roads
+ROAD_CLASS_DISTANCES = [1, 3, 5]
+
+# The same thresholds for road distances, which run about 1.3 times the straight line
+ROAD_CLASS_ROAD_DISTANCES = [1.3, 4, 6.5]
+
+# Road distance per straight-line km for trips shorter than each ROAD_CLASS_DISTANCES
+# threshold and beyond, as in the dataset generator
+DETOUR_FACTORS = [1.4, 1.35, 1.3, 1.25]
+
+
+def road_distance_estimate(direct_distance):
+    """Expected road distance (km) for straight-line distance(s), as the dataset generator assumes."""
+    direct_distance = np.asarray(direct_distance, dtype=float)
+    factor = np.select([direct_distance < limit for limit in ROAD_CLASS_DISTANCES],
+                       DETOUR_FACTORS[:-1], default=DETOUR_FACTORS[-1])
+    return direct_distance * factor
+
+
+def hour_of(t):
+    """Hour of day for a datetime, an hour number or array of hours, or now if None."""
+    if t is None:
+        return datetime.now().hour
+    if isinstance(t, datetime):
+        return t.hour
+    return np.asarray(t, dtype=np.int64) % 24
+
+
+class SpeedProfile:
+    """
+    Per road class, per hour of day travel speeds stored as a compact float32 array.
+
+    All lookups accept scalars or NumPy arrays, so a whole batch of trips is
+    evaluated with a few array operations.
+    """
+
+    def __init__(self, speeds, road_classes=None):
+        self.speeds = np.asarray(speeds, dtype=np.float32)  # shape (road classes, 24)
+        self.road_classes = list(road_classes or ROAD_CLASSES)
+        if self.speeds.shape != (len(self.road_classes), 24):
+            raise ValueError("Speed profile must have one row of 24 hourly speeds per road class")
+        self.free_flow = self.speeds.max(axis=1)
+
+    @classmethod
+    def default(cls):
+        """Marikina profile built from free-flow speeds and the hourly congestion curve."""
+        congestion = np.array(HOURLY_CONGESTION, dtype=np.float32)
+        sensitivity = np.array(CONGESTION_SENSITIVITY, dtype=np.float32)[:, None]
+        factors = 1 - (1 - congestion[None, :]) * sensitivity
+        return cls(np.array(FREE_FLOW_SPEED, dtype=np.float32)[:, None] * factors)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['speeds'], [str(c) for c in data['road_classes']])
+
+    def save(self, path):
+        np.savez(path, speeds=self.speeds, road_classes=np.array(self.road_classes))
+
+    def road_class_index(self, road_class):
+        return self.road_classes.index(road_class)
+
+    def road_class_for_distance(self, distance_km):
+        """Guess the dominant road class of a trip from its straight-line length."""
+        return self._road_class(distance_km, ROAD_CLASS_DISTANCES)
+
+    def road_class_for_road_distance(self, distance_km):
+        """Guess the dominant road class of a trip from its routed road length."""
+        return self._road_class(distance_km, ROAD_CLASS_ROAD_DISTANCES)
+
+    def _road_class(self, distance_km, thresholds):
+        # Distances past the last threshold map to the first (fastest) class
+        index = np.searchsorted(thresholds, distance_km, side='right')
+        return (len(thresholds) - index) % len(self.road_classes)
+
+    def speed(self, hour, road_class_index):
+        """Speed in km/h for the given hour(s) and road class index(es)."""
+        return self.speeds[road_class_index, hour_of(hour)]
+
+    def travel_time(self, distance_km, hour=None, road_class_index=None):
+        """Travel time in minutes, vectorized over distances and hours."""
+        distance_km = np.asarray(distance_km, dtype=np.float64)
+        if road_class_index is None:
+            road_class_index = self.road_class_for_distance(distance_km)
+        minutes = distance_km / self.speed(hour, road_class_index) * 60
+        return float(minutes) if minutes.ndim == 0 else minutes
+
+    def congestion_factor(self, hour=None, road_class_index=0):
+        """How much longer than free-flow a trip takes at the given hour."""
+        factor = self.free_flow[road_class_index] / self.speed(hour, road_class_index)
+        return float(factor) if np.ndim(factor) == 0 else factor
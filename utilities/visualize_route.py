@@ -1,11 +1,27 @@
 import folium
 import webbrowser
 import os
+import sys
 import json
 import requests
 
-def get_route_geometry(start, end, api_key):
-    """Get the detailed route geometry between two points"""
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utilities.polyline_store import PolylineStore, DEFAULT_TOLERANCE
+
+def get_route_geometry(start, end, api_key, store=None):
+    """
+    Get the simplified route geometry between two points as [[lat, lon], ...].
+    
+    Routes are looked up in the polyline store first; only missing routes are fetched
+    from ORS, simplified and added to the store.
+    """
+    if store is not None:
+        stored = store.get(start, end)
+        if stored is not None:
+            return stored['points']
+    if not api_key:
+        return None
+    
     base_url = "https://api.openrouteservice.org/v2/directions/driving-car/geojson"
     
     # Format coordinates for ORS API (lon,lat format)
@@ -23,7 +39,14 @@ def get_route_geometry(start, end, api_key):
     try:
         response = requests.post(base_url, headers=headers, json=data)
         if response.status_code == 200:
-            return response.json()
+            feature = response.json()['features'][0]
+            points = [[lat, lon] for lon, lat in feature['geometry']['coordinates']]
+            if store is None:
+                return points
+            summary = feature['properties'].get('summary', {})
+            points = store.put(start, end, points, summary.get('distance'), summary.get('duration'))
+            store.save()
+            return points
         else:
             print(f"API error getting route geometry: {response.status_code}")
             return None
@@ -49,6 +72,7 @@ def visualize_ems_route(route_data):
     dispatch_time = route_data.get('dispatch_time', 2)
     on_scene_time = route_data.get('on_scene_time', 10)
     api_key = route_data['api_key']
+    store = PolylineStore(tolerance=route_data.get('route_tolerance', DEFAULT_TOLERANCE))
     
     # Create map centered between the three points
     all_points = [ems_base, patient_location, hospital_coords]
@@ -89,17 +113,14 @@ def visualize_ems_route(route_data):
     )
     
     # Try to get EMS to Patient route
-    ems_to_patient_route = get_route_geometry(ems_base, patient_location, api_key)
+    ems_to_patient_route = get_route_geometry(ems_base, patient_location, api_key, store)
     if ems_to_patient_route:
-        # Add the GeoJSON to the map
-        folium.GeoJson(
-            ems_to_patient_route,
-            name="EMS to Patient",
-            style_function=lambda x: {
-                "color": "red",
-                "weight": 4,
-                "opacity": 0.8
-            },
+        # Add the simplified road geometry to the map
+        folium.PolyLine(
+            locations=ems_to_patient_route,
+            color="red",
+            weight=4,
+            opacity=0.8,
             tooltip=tooltip_ems_to_patient
         ).add_to(m)
     else:
@@ -113,17 +134,14 @@ def visualize_ems_route(route_data):
         ).add_to(m)
     
     # Try to get Patient to Hospital route
-    patient_to_hospital_route = get_route_geometry(patient_location, hospital_coords, api_key)
+    patient_to_hospital_route = get_route_geometry(patient_location, hospital_coords, api_key, store)
     if patient_to_hospital_route:
-        # Add the GeoJSON to the map
-        folium.GeoJson(
-            patient_to_hospital_route,
-            name="Patient to Hospital",
-            style_function=lambda x: {
-                "color": "blue",
-                "weight": 4,
-                "opacity": 0.8
-            },
+        # Add the simplified road geometry to the map
+        folium.PolyLine(
+            locations=patient_to_hospital_route,
+            color="blue",
+            weight=4,
+            opacity=0.8,
             tooltip=tooltip_patient_to_hospital
         ).add_to(m)
     else: